@@ -15,11 +15,10 @@ import json
 import os
 import sys
 from pathlib import Path
-import matplotlib.pyplot as plt
 import matplotlib.font_manager as fm
 from collections import defaultdict, Counter
-import base64
-from io import BytesIO
+
+from utils import chart_renderer, font_service
 import math
 import random
 
@@ -30,9 +29,8 @@ class DataOptimizedWordCloudGenerator:
         self.setup_matplotlib()
 
     def setup_matplotlib(self):
-        """配置matplotlib中文显示"""
-        plt.rcParams['font.sans-serif'] = ['Microsoft YaHei', 'SimHei', 'Arial Unicode MS']
-        plt.rcParams['axes.unicode_minus'] = False
+        """配置matplotlib中文显示（只使用已安装的字体）"""
+        font_service.setup_matplotlib()
 
     def optimize_word_frequencies(self, words_data):
         """优化词频分布，使其更加合理（确保负面词汇也能体现）"""
@@ -145,32 +143,27 @@ class DataOptimizedWordCloudGenerator:
             else:
                 neutral_words.append(item)
 
-        # 创建子图（保持原有UI风格）
-        fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(16, 12))
-        fig.suptitle('大众点评评论关键词可视化分析（数据量优化版）', fontsize=20, fontweight='bold', y=0.95)
-
-        # 1. 优化的气泡图
-        self.plot_optimized_bubble_chart(ax1, optimized_words, '优化关键词分布')
+        def draw(fig):
+            # 创建子图（保持原有UI风格）
+            (ax1, ax2), (ax3, ax4) = fig.subplots(2, 2)
+            fig.suptitle('大众点评评论关键词可视化分析（数据量优化版）', fontsize=20, fontweight='bold', y=0.95)
 
-        # 2. 正面词汇（按频率排序）
-        self.plot_sentiment_words(ax2, sorted(positive_words, key=lambda x: x['frequency'], reverse=True),
-                                 '正面评价词汇', '#2E8B57')
+            # 1. 优化的气泡图
+            self.plot_optimized_bubble_chart(ax1, optimized_words, '优化关键词分布')
 
-        # 3. 负面词汇（按频率排序）
-        self.plot_sentiment_words(ax3, sorted(negative_words, key=lambda x: x['frequency'], reverse=True),
-                                 '负面评价词汇', '#DC143C')
+            # 2. 正面词汇（按频率排序）
+            self.plot_sentiment_words(ax2, sorted(positive_words, key=lambda x: x['frequency'], reverse=True),
+                                     '正面评价词汇', '#2E8B57')
 
-        # 4. 频率分布统计
-        self.plot_frequency_distribution(ax4, optimized_words)
+            # 3. 负面词汇（按频率排序）
+            self.plot_sentiment_words(ax3, sorted(negative_words, key=lambda x: x['frequency'], reverse=True),
+                                     '负面评价词汇', '#DC143C')
 
-        plt.tight_layout()
+            # 4. 频率分布统计
+            self.plot_frequency_distribution(ax4, optimized_words)
 
-        # 保存为base64
-        buffer = BytesIO()
-        plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight')
-        buffer.seek(0)
-        image_base64 = base64.b64encode(buffer.getvalue()).decode()
-        plt.close()
+        # 保存为base64（Agg画布直接渲染，不经过pyplot）
+        image_base64 = chart_renderer.render_base64(draw, (16, 12), dpi=300, tight_layout=True)
 
         return image_base64, optimized_words
 
@@ -654,34 +647,27 @@ class DataOptimizedWordCloudGenerator:
         ]
         colors = ['#27ae60', '#f39c12', '#e74c3c']
 
-        fig, ax = plt.subplots(figsize=(10, 6))
-        bars = ax.bar(categories, values, color=colors, alpha=0.8)
-
-        # 添加数值标签
-        for bar, value in zip(bars, values):
-            height = bar.get_height()
-            ax.text(bar.get_x() + bar.get_width()/2., height + 0.1,
-                   f'{value}', ha='center', va='bottom', fontsize=12, fontweight='bold')
+        def draw(fig):
+            ax = fig.subplots()
+            bars = ax.bar(categories, values, color=colors, alpha=0.8)
 
-        ax.set_ylabel('评论数量', fontsize=12)
-        ax.set_title('优化情感分析分布', fontsize=14, fontweight='bold', pad=20)
-        ax.grid(axis='y', alpha=0.3)
+            # 添加数值标签
+            for bar, value in zip(bars, values):
+                height = bar.get_height()
+                ax.text(bar.get_x() + bar.get_width()/2., height + 0.1,
+                       f'{value}', ha='center', va='bottom', fontsize=12, fontweight='bold')
 
-        # 美化图表
-        ax.spines['top'].set_visible(False)
-        ax.spines['right'].set_visible(False)
-        ax.set_ylim(0, max(values) * 1.2 if max(values) > 0 else 1)
+            ax.set_ylabel('评论数量', fontsize=12)
+            ax.set_title('优化情感分析分布', fontsize=14, fontweight='bold', pad=20)
+            ax.grid(axis='y', alpha=0.3)
 
-        plt.tight_layout()
+            # 美化图表
+            ax.spines['top'].set_visible(False)
+            ax.spines['right'].set_visible(False)
+            ax.set_ylim(0, max(values) * 1.2 if max(values) > 0 else 1)
 
         # 保存为base64
-        buffer = BytesIO()
-        plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight')
-        buffer.seek(0)
-        image_base64 = base64.b64encode(buffer.getvalue()).decode()
-        plt.close()
-
-        return image_base64
+        return chart_renderer.render_base64(draw, (10, 6), dpi=300, tight_layout=True)
 
 def main():
     """主函数"""
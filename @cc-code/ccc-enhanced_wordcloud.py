@@ -16,11 +16,10 @@ import json
 import os
 import sys
 from pathlib import Path
-import matplotlib.pyplot as plt
 import matplotlib.font_manager as fm
 from collections import defaultdict
-import base64
-from io import BytesIO
+
+from utils import chart_renderer, font_service
 
 # 尝试导入wordcloud库
 try:
@@ -37,9 +36,8 @@ class EnhancedWordCloudGenerator:
         self.setup_matplotlib()
 
     def setup_matplotlib(self):
-        """配置matplotlib中文显示"""
-        plt.rcParams['font.sans-serif'] = ['Microsoft YaHei', 'SimHei', 'Arial Unicode MS']
-        plt.rcParams['axes.unicode_minus'] = False
+        """配置matplotlib中文显示（只使用已安装的字体）"""
+        font_service.setup_matplotlib()
 
     def get_sentiment_color(self, text):
         """根据词汇内容判断情感色彩"""
@@ -81,32 +79,18 @@ class EnhancedWordCloudGenerator:
         ).generate_from_frequencies(word_freq)
 
         # 生成图像
-        plt.figure(figsize=(12, 6))
-        plt.imshow(wordcloud, interpolation='bilinear')
-        plt.axis('off')
-        plt.title('大众点评评论词云图', fontsize=16, pad=20)
+        def draw(fig):
+            ax = fig.subplots()
+            ax.imshow(wordcloud, interpolation='bilinear')
+            ax.axis('off')
+            ax.set_title('大众点评评论词云图', fontsize=16, pad=20)
 
-        # 保存为base64
-        buffer = BytesIO()
-        plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight')
-        buffer.seek(0)
-        image_base64 = base64.b64encode(buffer.getvalue()).decode()
-        plt.close()
-
-        return image_base64
+        # 保存为base64（Agg画布直接渲染，不经过pyplot）
+        return chart_renderer.render_base64(draw, (12, 6), dpi=300)
 
     def get_chinese_font(self):
         """获取中文字体路径"""
-        font_paths = [
-            'C:/Windows/Fonts/msyh.ttc',  # 微软雅黑
-            'C:/Windows/Fonts/simhei.ttf',  # 黑体
-            'C:/Windows/Fonts/simsun.ttc',  # 宋体
-        ]
-
-        for font_path in font_paths:
-            if os.path.exists(font_path):
-                return font_path
-        return None
+        return font_service.chinese_font_path()
 
     def create_fallback_visualization(self, words_data):
         """备用可视化方案（不依赖wordcloud）"""
@@ -116,61 +100,58 @@ class EnhancedWordCloudGenerator:
             freq_groups[item['frequency']].append(item)
 
         # 创建气泡图样式的可视化
-        fig, ax = plt.subplots(figsize=(12, 8))
-
-        x_positions = []
-        y_positions = []
-        sizes = []
-        colors = []
-        texts = []
-
-        x, y = 0, 0
-        for freq in sorted(freq_groups.keys(), reverse=True):
-            for i, item in enumerate(freq_groups[freq]):
-                x_positions.append(x)
-                y_positions.append(y)
-                sizes.append(item['frequency'] * 200 + 100)
-                colors.append(self.get_sentiment_color(item['text']))
-                texts.append(item['text'])
-
-                # 调整位置
-                x += 1
-                if x > 4:  # 每行最多5个
-                    x = 0
-                    y += 1
-
-        # 绘制散点图
-        scatter = ax.scatter(x_positions, y_positions, s=sizes, c=colors, alpha=0.7)
-
-        # 添加文字标签
-        for i, txt in enumerate(texts):
-            ax.annotate(txt, (x_positions[i], y_positions[i]),
-                       ha='center', va='center', fontsize=10, fontweight='bold')
-
-        ax.set_xlim(-0.5, 4.5)
-        ax.set_ylim(-0.5, max(y_positions) + 0.5)
-        ax.set_aspect('equal')
-        ax.axis('off')
-        ax.set_title('大众点评评论关键词可视化', fontsize=16, pad=20)
-
-        # 添加图例
-        from matplotlib.lines import Line2D
-        legend_elements = [
-            Line2D([0], [0], marker='o', color='w', markerfacecolor='#2E8B57',
-                   markersize=10, label='正面评价'),
-            Line2D([0], [0], marker='o', color='w', markerfacecolor='#DC143C',
-                   markersize=10, label='负面评价'),
-            Line2D([0], [0], marker='o', color='w', markerfacecolor='#4682B4',
-                   markersize=10, label='中性评价')
-        ]
-        ax.legend(handles=legend_elements, loc='upper right')
+        def draw(fig):
+            ax = fig.subplots()
+
+            x_positions = []
+            y_positions = []
+            sizes = []
+            colors = []
+            texts = []
+
+            x, y = 0, 0
+            for freq in sorted(freq_groups.keys(), reverse=True):
+                for i, item in enumerate(freq_groups[freq]):
+                    x_positions.append(x)
+                    y_positions.append(y)
+                    sizes.append(item['frequency'] * 200 + 100)
+                    colors.append(self.get_sentiment_color(item['text']))
+                    texts.append(item['text'])
+
+                    # 调整位置
+                    x += 1
+                    if x > 4:  # 每行最多5个
+                        x = 0
+                        y += 1
+
+            # 绘制散点图
+            scatter = ax.scatter(x_positions, y_positions, s=sizes, c=colors, alpha=0.7)
+
+            # 添加文字标签
+            for i, txt in enumerate(texts):
+                ax.annotate(txt, (x_positions[i], y_positions[i]),
+                           ha='center', va='center', fontsize=10, fontweight='bold')
+
+            ax.set_xlim(-0.5, 4.5)
+            ax.set_ylim(-0.5, max(y_positions) + 0.5)
+            ax.set_aspect('equal')
+            ax.axis('off')
+            ax.set_title('大众点评评论关键词可视化', fontsize=16, pad=20)
+
+            # 添加图例
+            from matplotlib.lines import Line2D
+            legend_elements = [
+                Line2D([0], [0], marker='o', color='w', markerfacecolor='#2E8B57',
+                       markersize=10, label='正面评价'),
+                Line2D([0], [0], marker='o', color='w', markerfacecolor='#DC143C',
+                       markersize=10, label='负面评价'),
+                Line2D([0], [0], marker='o', color='w', markerfacecolor='#4682B4',
+                       markersize=10, label='中性评价')
+            ]
+            ax.legend(handles=legend_elements, loc='upper right')
 
         # 保存为base64
-        buffer = BytesIO()
-        plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight')
-        buffer.seek(0)
-        image_base64 = base64.b64encode(buffer.getvalue()).decode()
-        plt.close()
+        image_base64 = chart_renderer.render_base64(draw, (12, 8), dpi=300)
 
         return image_base64
 
@@ -438,34 +419,27 @@ class EnhancedWordCloudGenerator:
         ]
         colors = ['#27ae60', '#f39c12', '#e74c3c']
 
-        fig, ax = plt.subplots(figsize=(10, 6))
-        bars = ax.bar(categories, values, color=colors, alpha=0.8)
-
-        # 添加数值标签
-        for bar, value in zip(bars, values):
-            height = bar.get_height()
-            ax.text(bar.get_x() + bar.get_width()/2., height + 0.1,
-                   f'{value}', ha='center', va='bottom', fontsize=12, fontweight='bold')
+        def draw(fig):
+            ax = fig.subplots()
+            bars = ax.bar(categories, values, color=colors, alpha=0.8)
 
-        ax.set_ylabel('评论数量', fontsize=12)
-        ax.set_title('情感分析分布', fontsize=14, fontweight='bold', pad=20)
-        ax.grid(axis='y', alpha=0.3)
+            # 添加数值标签
+            for bar, value in zip(bars, values):
+                height = bar.get_height()
+                ax.text(bar.get_x() + bar.get_width()/2., height + 0.1,
+                       f'{value}', ha='center', va='bottom', fontsize=12, fontweight='bold')
 
-        # 美化图表
-        ax.spines['top'].set_visible(False)
-        ax.spines['right'].set_visible(False)
-        ax.set_ylim(0, max(values) * 1.2 if max(values) > 0 else 1)
+            ax.set_ylabel('评论数量', fontsize=12)
+            ax.set_title('情感分析分布', fontsize=14, fontweight='bold', pad=20)
+            ax.grid(axis='y', alpha=0.3)
 
-        plt.tight_layout()
+            # 美化图表
+            ax.spines['top'].set_visible(False)
+            ax.spines['right'].set_visible(False)
+            ax.set_ylim(0, max(values) * 1.2 if max(values) > 0 else 1)
 
         # 保存为base64
-        buffer = BytesIO()
-        plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight')
-        buffer.seek(0)
-        image_base64 = base64.b64encode(buffer.getvalue()).decode()
-        plt.close()
-
-        return image_base64
+        return chart_renderer.render_base64(draw, (10, 6), dpi=300, tight_layout=True)
 
 def main():
     """主函数"""
@@ -16,11 +16,11 @@ import json
 import os
 import sys
 from pathlib import Path
-import matplotlib.pyplot as plt
+import matplotlib
 import matplotlib.font_manager as fm
 from collections import defaultdict
-import base64
-from io import BytesIO
+
+from utils import chart_renderer
 
 # 尝试导入wordcloud库
 try:
@@ -38,8 +38,8 @@ class EnhancedWordCloudGenerator:
 
     def setup_matplotlib(self):
         """配置matplotlib中文显示"""
-        plt.rcParams['font.sans-serif'] = ['Microsoft YaHei', 'SimHei', 'Arial Unicode MS']
-        plt.rcParams['axes.unicode_minus'] = False
+        matplotlib.rcParams['font.sans-serif'] = ['Microsoft YaHei', 'SimHei', 'Arial Unicode MS']
+        matplotlib.rcParams['axes.unicode_minus'] = False
 
     def get_sentiment_color(self, text):
         """根据词汇内容判断情感色彩"""
@@ -77,32 +77,25 @@ class EnhancedWordCloudGenerator:
             else:
                 neutral_words.append(item)
 
-        # 创建子图
-        fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(16, 12))
-        fig.suptitle('大众点评评论关键词可视化分析', fontsize=20, fontweight='bold', y=0.95)
-
-        # 1. 综合词云气泡图
-        self.plot_bubble_chart(ax1, words_data, '综合关键词分布')
+        def draw(fig):
+            # 创建子图
+            (ax1, ax2), (ax3, ax4) = fig.subplots(2, 2)
+            fig.suptitle('大众点评评论关键词可视化分析', fontsize=20, fontweight='bold', y=0.95)
 
-        # 2. 正面词汇
-        self.plot_sentiment_words(ax2, positive_words, '正面评价词汇', '#2E8B57')
+            # 1. 综合词云气泡图
+            self.plot_bubble_chart(ax1, words_data, '综合关键词分布')
 
-        # 3. 负面词汇
-        self.plot_sentiment_words(ax3, negative_words, '负面评价词汇', '#DC143C')
+            # 2. 正面词汇
+            self.plot_sentiment_words(ax2, positive_words, '正面评价词汇', '#2E8B57')
 
-        # 4. 频率统计
-        self.plot_frequency_chart(ax4, words_data)
+            # 3. 负面词汇
+            self.plot_sentiment_words(ax3, negative_words, '负面评价词汇', '#DC143C')
 
-        plt.tight_layout()
+            # 4. 频率统计
+            self.plot_frequency_chart(ax4, words_data)
 
-        # 保存为base64
-        buffer = BytesIO()
-        plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight')
-        buffer.seek(0)
-        image_base64 = base64.b64encode(buffer.getvalue()).decode()
-        plt.close()
-
-        return image_base64
+        # 保存为base64（Agg画布直接渲染，不经过pyplot）
+        return chart_renderer.render_base64(draw, (16, 12), dpi=300, tight_layout=True)
 
     def plot_bubble_chart(self, ax, words_data, title):
         """绘制气泡图"""
@@ -461,34 +454,27 @@ class EnhancedWordCloudGenerator:
         ]
         colors = ['#27ae60', '#f39c12', '#e74c3c']
 
-        fig, ax = plt.subplots(figsize=(10, 6))
-        bars = ax.bar(categories, values, color=colors, alpha=0.8)
+        def draw(fig):
+            ax = fig.subplots()
+            bars = ax.bar(categories, values, color=colors, alpha=0.8)
 
-        # 添加数值标签
-        for bar, value in zip(bars, values):
-            height = bar.get_height()
-            ax.text(bar.get_x() + bar.get_width()/2., height + 0.1,
-                   f'{value}', ha='center', va='bottom', fontsize=12, fontweight='bold')
+            # 添加数值标签
+            for bar, value in zip(bars, values):
+                height = bar.get_height()
+                ax.text(bar.get_x() + bar.get_width()/2., height + 0.1,
+                       f'{value}', ha='center', va='bottom', fontsize=12, fontweight='bold')
 
-        ax.set_ylabel('评论数量', fontsize=12)
-        ax.set_title('情感分析分布', fontsize=14, fontweight='bold', pad=20)
-        ax.grid(axis='y', alpha=0.3)
+            ax.set_ylabel('评论数量', fontsize=12)
+            ax.set_title('情感分析分布', fontsize=14, fontweight='bold', pad=20)
+            ax.grid(axis='y', alpha=0.3)
 
-        # 美化图表
-        ax.spines['top'].set_visible(False)
-        ax.spines['right'].set_visible(False)
-        ax.set_ylim(0, max(values) * 1.2 if max(values) > 0 else 1)
-
-        plt.tight_layout()
+            # 美化图表
+            ax.spines['top'].set_visible(False)
+            ax.spines['right'].set_visible(False)
+            ax.set_ylim(0, max(values) * 1.2 if max(values) > 0 else 1)
 
         # 保存为base64
-        buffer = BytesIO()
-        plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight')
-        buffer.seek(0)
-        image_base64 = base64.b64encode(buffer.getvalue()).decode()
-        plt.close()
-
-        return image_base64
+        return chart_renderer.render_base64(draw, (10, 6), dpi=300, tight_layout=True)
 
 def main():
     """主函数"""
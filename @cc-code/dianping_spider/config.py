@@ -24,6 +24,10 @@ SPIDER_CONFIG = {
     # 数据存储配置
     'DATA_DIR': 'data',
     'BACKUP_DIR': 'backup',
+    'BACKUP_RETENTION_DAYS': 30,  # 备份版本保留天数，与合规配置 COMPLIANCE_CONFIG['data_protection']['retention_days'] 一致
+    'BACKUP_GC_INTERVAL': 24 * 3600,  # 备份时清理过期版本和无引用数据块的最小间隔（秒），0表示每次备份都清理
+    # 数据文件压缩：None（不压缩）、'gzip'（.gz）或 'zstd'（.zst，需安装zstandard）
+    'COMPRESSION': None,
 }
 
 # 目标餐厅配置
@@ -67,11 +71,61 @@ WORDCLOUD_CONFIG = {
     'font_path': None,  # 中文字体路径，可设置为思源黑体等
     'background_color': 'white',
     'colormap': 'viridis',
+    'STYLE': None,  # 预设样式名（见 utils/wordcloud_styles.py 的 PRESETS，如 'badge' 圆形、'heart' 心形），None为不使用预设
+    'MERGE_VARIANTS': True,  # 词数超过max_words时，排布前合并写法不同的同一个词（全角/半角、大小写、中文词组间的空格），权重相加
+    'FREQUENCY_BUCKETS': 64,  # 排布前把词频量化为多少级字号（相对最大词频），0为不量化
+    'RENDERER': 'pil',  # 'pil'：WordCloud原生尺寸经PIL一次编码PNG；'matplotlib'：旧的dpi=300绘图输出
+    'INTERACTIVE_FORMATS': ('layout',),  # 交互式词云数据附带的矢量输出：'layout'布局JSON、'svg'，()表示不附带
+    'TREND_LAYOUT': 'incremental',  # 趋势词云排布：'incremental'沿用上一期词语位置逐期生成；'independent'各期独立排布并行渲染
+    'RENDER_WORKERS': None,  # 分类/趋势词云批量渲染的进程数，None为min(4, CPU核数)，1为不使用进程池；任务已在进程池子进程中执行时不使用
+    'FONT_CACHE_DIR': 'data/.font_cache',  # 字体清单和子集字体的缓存目录
+    'FONT_SUBSET': False,  # 排布时使用只含词语字形的子集字体（需要fontTools，每份新字符集需子集化一次）
+    'SVG_EMBED_FONT': False,  # SVG输出内嵌子集WOFF字体（需要fontTools）
+    'CACHE_DIR': 'data/.render_cache',  # 渲染结果缓存目录（按词频和配置的哈希寻址），None表示不缓存
+    'CACHE_MAX_BYTES': 256 * 1024 * 1024,  # 渲染缓存的磁盘占用上限（字节）
+}
+
+# 日志配置
+LOG_CONFIG = {
+    'LOG_FILE': 'app.log',
+    'LEVEL': 'INFO',
+    'JSON_FORMAT': False,  # 文件日志输出为结构化JSON（每行一条）
+    'CONSOLE': True,
+}
+
+# 后台任务配置
+TASK_CONFIG = {
+    # 每种任务类型的工作线程数
+    'WORKERS': {
+        'crawl_comments': 1,
+        'analyze_comments': 2,
+        'generate_wordcloud': 2,
+    },
+    # 每种任务类型的超时时间（秒，None表示不限制）
+    'TIMEOUTS': {
+        'crawl_comments': 3600,
+        'analyze_comments': 1800,
+        'generate_wordcloud': 600,
+    },
+    # 任务状态存储（SQLite），放在数据目录的隐藏子目录中，不影响数据文件目录索引
+    'STORE_DIR': 'data/.tasks',
+    'MAX_MEMORY_ENTRIES': 1000,  # 内存中最多保留的任务状态数
+    'MEMORY_TTL': 3600,  # 内存中状态记录的空闲过期时间（秒）
+    'RETENTION_SECONDS': 7 * 24 * 3600,  # 持久化任务记录的保留时间（秒）
+    'DEDUP_RESULT_TTL': 3600,  # 相同分析/词云任务复用已完成结果的时间（秒）
+    # CPU密集型任务（分析、词云）在子进程中执行的进程数，0表示在Web进程的工作线程中执行
+    'PROCESS_WORKERS': 2,
+    'PROCESS_TASK_TYPES': ('analyze_comments', 'generate_wordcloud'),
 }
 
 # Web展示配置
 WEB_CONFIG = {
     'host': '127.0.0.1',
     'port': 5000,
+    'ASGI_PORT': 8000,  # ASGI版本（web/asgi_app.py）的端口
     'debug': True,
+    'PROGRESS_INTERVAL': 0.5,  # 任务进度推送的最小间隔（秒）
+    'CACHE_MAX_BYTES': 64 * 1024 * 1024,  # 分析结果/下载文件响应缓存的内存上限（字节）
+    'EVENT_BUFFER': 100,  # 每个任务事件流保留的最近事件数（用于断线重连重放）
+    'SSE_HEARTBEAT': 15,  # 事件流心跳间隔（秒）
 }
\ No newline at end of file
@@ -15,11 +15,10 @@ from datetime import datetime
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from config import RESTAURANT_CONFIG, WEB_CONFIG
-from spiders.dianping_spider import DianpingSpider
-from utils.text_analyzer import CommentAnalyzer
-from utils.wordcloud_generator import WordCloudGenerator
 from utils.data_utils import DataManager, Logger
-from web.app import create_app
+
+# 爬虫、分析器和词云生成器依赖selenium、jieba、sklearn、matplotlib等较重的模块，
+# 在各命令中按需导入，启动Web服务或执行单个命令时只加载用到的部分
 
 
 def crawl_comments(restaurant_name, city='北京', months=3):
@@ -27,6 +26,8 @@ def crawl_comments(restaurant_name, city='北京', months=3):
     logger = Logger.setup('main')
     logger.info(f"开始爬取 {restaurant_name} 的评论")
 
+    from spiders.dianping_spider import DianpingSpider
+
     spider = DianpingSpider()
     try:
         # 更新配置
@@ -49,6 +50,8 @@ def analyze_comments(comments_file):
     logger = Logger.setup('main')
     logger.info(f"开始分析评论文件: {comments_file}")
 
+    from utils.text_analyzer import CommentAnalyzer
+
     data_manager = DataManager()
     analyzer = CommentAnalyzer()
 
@@ -79,6 +82,8 @@ def generate_wordcloud(analysis_file):
     logger = Logger.setup('main')
     logger.info(f"开始生成词云: {analysis_file}")
 
+    from utils.wordcloud_generator import WordCloudGenerator
+
     data_manager = DataManager()
     generator = WordCloudGenerator()
 
@@ -168,6 +173,9 @@ def start_web_server():
     print("启动Web服务器...")
     print(f"访问地址: http://{WEB_CONFIG['host']}:{WEB_CONFIG['port']}")
 
+    # 在这里导入：任务子进程（spawn）会重新导入本模块，不应创建Web应用的全局状态
+    from web.app import create_app
+
     app = create_app()
     app.run(
         host=WEB_CONFIG['host'],
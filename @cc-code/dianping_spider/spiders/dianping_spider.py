@@ -14,10 +14,19 @@ from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
 import pandas as pd
-import logging
 from fake_useragent import UserAgent
 
 from config import SPIDER_CONFIG, RESTAURANT_CONFIG
+from utils import storage, metrics
+from utils.data_utils import Logger
+
+
+# 页面等待加载与解析的耗时（不含随机延迟）
+SPIDER_PAGE_SECONDS = metrics.histogram(
+    'spider_page_seconds', '爬虫页面加载/解析耗时（秒）', ['page', 'phase']
+)
+SPIDER_COMMENTS = metrics.counter('spider_comments_total', '已爬取的评论条数')
+SPIDER_ERRORS = metrics.counter('spider_errors_total', '爬虫失败次数', ['stage'])
 
 
 class DianpingSpider:
@@ -32,15 +41,7 @@ class DianpingSpider:
 
     def setup_logging(self):
         """设置日志"""
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler('spider.log', encoding='utf-8'),
-                logging.StreamHandler()
-            ]
-        )
-        self.logger = logging.getLogger(__name__)
+        self.logger = Logger.setup(__name__, 'spider.log')
 
     def setup_session(self):
         """设置请求会话"""
@@ -95,10 +96,12 @@ class DianpingSpider:
 
             # 等待搜索结果加载
             wait = WebDriverWait(self.driver, 10)
-            wait.until(EC.presence_of_element_located((By.CLASS_NAME, "shop-list")))
+            with SPIDER_PAGE_SECONDS.time(page='search', phase='load'):
+                wait.until(EC.presence_of_element_located((By.CLASS_NAME, "shop-list")))
 
             # 解析搜索结果
-            soup = BeautifulSoup(self.driver.page_source, 'html.parser')
+            with SPIDER_PAGE_SECONDS.time(page='search', phase='parse'):
+                soup = BeautifulSoup(self.driver.page_source, 'html.parser')
             restaurants = []
 
             shop_list = soup.find('div', class_='shop-list')
@@ -131,11 +134,15 @@ class DianpingSpider:
             return restaurants
 
         except Exception as e:
+            SPIDER_ERRORS.inc(stage='search')
             self.logger.error(f"搜索餐厅失败: {e}")
             return []
 
-    def get_restaurant_comments(self, restaurant_url, months=3):
-        """获取餐厅评论"""
+    def get_restaurant_comments(self, restaurant_url, months=3, progress=None, max_pages=50):
+        """获取餐厅评论
+
+        progress: 可选的 ProgressReporter，按已爬取页数（上限max_pages）上报进度
+        """
         self.setup_driver()
 
         try:
@@ -157,26 +164,35 @@ class DianpingSpider:
             page = 1
             target_date = datetime.now() - timedelta(days=months * 30)
 
-            while page <= 50:  # 限制最大页数防止无限循环
+            if progress:
+                progress.total = max_pages
+
+            while page <= max_pages:  # 限制最大页数防止无限循环
                 self.logger.info(f"爬取第 {page} 页评论...")
 
                 # 等待页面加载
                 wait = WebDriverWait(self.driver, 10)
                 try:
-                    wait.until(EC.presence_of_element_located((By.CLASS_NAME, "reviews-items")))
+                    with SPIDER_PAGE_SECONDS.time(page='review', phase='load'):
+                        wait.until(EC.presence_of_element_located((By.CLASS_NAME, "reviews-items")))
                 except:
+                    SPIDER_ERRORS.inc(stage='review_timeout')
                     self.logger.warning("评论加载超时")
                     break
 
                 # 解析当前页面评论
-                soup = BeautifulSoup(self.driver.page_source, 'html.parser')
-                page_comments = self.parse_comments_page(soup, target_date)
+                with SPIDER_PAGE_SECONDS.time(page='review', phase='parse'):
+                    soup = BeautifulSoup(self.driver.page_source, 'html.parser')
+                    page_comments = self.parse_comments_page(soup, target_date)
 
                 if not page_comments:
                     self.logger.info("没有更多评论或已超过时间范围")
                     break
 
                 comments.extend(page_comments)
+                SPIDER_COMMENTS.inc(len(page_comments))
+                if progress:
+                    progress.update(message=f"已爬取第{page}页，共{len(comments)}条评论")
 
                 # 检查是否还有下一页
                 try:
@@ -194,9 +210,12 @@ class DianpingSpider:
                 time.sleep(random.uniform(*SPIDER_CONFIG['DELAY_RANGE']))
 
             self.logger.info(f"共获取 {len(comments)} 条评论")
+            if progress:
+                progress.finish(f"共获取{len(comments)}条评论")
             return comments
 
         except Exception as e:
+            SPIDER_ERRORS.inc(stage='comments')
             self.logger.error(f"获取评论失败: {e}")
             return []
 
@@ -305,15 +324,19 @@ class DianpingSpider:
     def save_comments(self, comments, filename='comments.json'):
         """保存评论数据"""
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(comments, f, ensure_ascii=False, indent=2)
+            # 按配置追加压缩扩展名，写入为原子操作
+            compression = SPIDER_CONFIG.get('COMPRESSION')
+            if compression and storage.codec_for_path(filename) is None:
+                filename += storage.codec_suffix(compression)
+
+            storage.dump_json(comments, filename)
             self.logger.info(f"评论数据已保存到 {filename}")
 
             # 同时保存为CSV格式
             if comments:
                 df = pd.DataFrame(comments)
                 csv_filename = filename.replace('.json', '.csv')
-                df.to_csv(csv_filename, index=False, encoding='utf-8-sig')
+                storage.dump_csv(df, csv_filename)
                 self.logger.info(f"评论数据已保存到 {csv_filename}")
 
         except Exception as e:
@@ -154,21 +154,50 @@ function startWordcloudGeneration() {
     });
 }
 
-// 监控任务状态
+// 监控任务状态（优先使用SSE推送，不支持或连接失败时回退到轮询）
 function monitorTask(taskId, taskType) {
+    if (!window.EventSource) {
+        pollTask(taskId, taskType);
+        return;
+    }
+
+    const source = new EventSource(`/api/task_events/${taskId}`);
+    let finished = false;
+
+    source.addEventListener('progress', event => {
+        const data = JSON.parse(event.data);
+        updateProgress(taskType, data.progress || 0, data.message || '');
+    });
+
+    source.addEventListener('done', event => {
+        finished = true;
+        source.close();
+        // 事件中不含完整结果，结束后查询一次任务状态
+        fetchTaskStatus(taskId)
+        .then(data => finishTask(taskType, data))
+        .catch(error => {
+            console.error('获取任务结果失败:', error);
+        });
+    });
+
+    source.onerror = () => {
+        // 浏览器会自动重连（携带Last-Event-ID）；连接被彻底关闭时改为轮询
+        if (!finished && source.readyState === EventSource.CLOSED) {
+            pollTask(taskId, taskType);
+        }
+    };
+}
+
+// 轮询任务状态
+function pollTask(taskId, taskType) {
     const interval = setInterval(() => {
-        fetch(`/api/task_status/${taskId}`)
-        .then(response => response.json())
+        fetchTaskStatus(taskId)
         .then(data => {
             updateProgress(taskType, data.progress || 0, data.message || '');
 
-            if (data.status === 'completed') {
-                clearInterval(interval);
-                handleTaskCompletion(taskType, data);
-            } else if (data.status === 'failed') {
+            if (['completed', 'failed', 'cancelled', 'timeout'].includes(data.status)) {
                 clearInterval(interval);
-                hideProgress(taskType);
-                alert(`任务失败: ${data.error}`);
+                finishTask(taskType, data);
             }
         })
         .catch(error => {
@@ -177,6 +206,21 @@ function monitorTask(taskId, taskType) {
     }, 2000); // 每2秒检查一次
 }
 
+// 查询任务状态（包含完整结果）
+function fetchTaskStatus(taskId) {
+    return fetch(`/api/task_status/${taskId}`).then(response => response.json());
+}
+
+// 任务结束
+function finishTask(taskType, data) {
+    if (data.status === 'completed') {
+        handleTaskCompletion(taskType, data);
+    } else {
+        hideProgress(taskType);
+        alert(`任务失败: ${data.error}`);
+    }
+}
+
 // 处理任务完成
 function handleTaskCompletion(taskType, data) {
     hideProgress(taskType);
@@ -192,7 +236,7 @@ function handleTaskCompletion(taskType, data) {
             const analysisResult = data.result;
             alert('分析完成！');
             loadDataFiles(); // 刷新文件列表
-            displayAnalysisResults(analysisResult.analysis_results);
+            loadAnalysisResult(analysisResult.analysis_filename);
             break;
 
         case 'wordcloud':
@@ -242,7 +286,7 @@ function loadDataFiles() {
     .then(data => {
         if (data.success) {
             updateFileSelects(data.comment_files, data.analysis_files);
-            updateFilesList(data.comment_files, data.analysis_files);
+            updateFilesList(data.comment_files, data.analysis_files, data.file_info || {});
         }
     })
     .catch(error => {
@@ -274,8 +318,23 @@ function updateFileSelects(commentFiles, analysisFiles) {
     });
 }
 
+// 文件元数据摘要（记录数、大小）
+function describeFile(info) {
+    if (!info) {
+        return '';
+    }
+    const parts = [];
+    if (info.record_count !== null && info.record_count !== undefined) {
+        parts.push(`${info.record_count}条`);
+    }
+    if (info.size !== undefined) {
+        parts.push(`${(info.size / 1024).toFixed(1)} KB`);
+    }
+    return parts.join(' · ');
+}
+
 // 更新文件列表显示
-function updateFilesList(commentFiles, analysisFiles) {
+function updateFilesList(commentFiles, analysisFiles, fileInfo = {}) {
     const commentList = document.getElementById('commentFilesList');
     const analysisList = document.getElementById('analysisFilesList');
 
@@ -283,7 +342,7 @@ function updateFilesList(commentFiles, analysisFiles) {
     if (commentFiles.length > 0) {
         commentList.innerHTML = commentFiles.map(file => `
             <div class="d-flex justify-content-between align-items-center mb-2">
-                <span class="text-truncate">${file}</span>
+                <span class="text-truncate">${file} <small class="text-muted">${describeFile(fileInfo[file])}</small></span>
                 <a href="/download/${file}" class="btn btn-sm btn-outline-primary">
                     <i class="fas fa-download"></i>
                 </a>
@@ -297,7 +356,7 @@ function updateFilesList(commentFiles, analysisFiles) {
     if (analysisFiles.length > 0) {
         analysisList.innerHTML = analysisFiles.map(file => `
             <div class="d-flex justify-content-between align-items-center mb-2">
-                <span class="text-truncate">${file}</span>
+                <span class="text-truncate">${file} <small class="text-muted">${describeFile(fileInfo[file])}</small></span>
                 <div>
                     <button class="btn btn-sm btn-outline-info me-1" onclick="loadAnalysisResult('${file}')">
                         <i class="fas fa-eye"></i>
@@ -313,9 +372,12 @@ function updateFilesList(commentFiles, analysisFiles) {
     }
 }
 
+// 结果面板用到的字段（逐条评论明细按需分页读取，不随摘要下载）
+const ANALYSIS_SUMMARY_FIELDS = 'basic_stats,sentiments,keywords,labels';
+
 // 加载并显示分析结果
 function loadAnalysisResult(filename) {
-    fetch(`/api/analysis_result/${filename}`)
+    fetch(`/api/analysis_result/${filename}?fields=${ANALYSIS_SUMMARY_FIELDS}`)
     .then(response => response.json())
     .then(data => {
         if (data.success) {
@@ -499,6 +561,11 @@ function displayCategoryChart(labels) {
     chart.setOption(option);
 }
 
+// 词云图片地址（服务端返回图片引用，旧结果为base64）
+function wordcloudImageSrc(result) {
+    return result.image_url || `data:image/png;base64,${result.image_base64}`;
+}
+
 // 显示词云图
 function displayWordclouds(wordcloudResult) {
     const gallery = document.getElementById('wordcloudGallery');
@@ -509,7 +576,7 @@ function displayWordclouds(wordcloudResult) {
         overallDiv.className = 'wordcloud-container mb-4';
         overallDiv.innerHTML = `
             <h5>整体词云图</h5>
-            <img src="data:image/png;base64,${wordcloudResult.overall_wordcloud.image_base64}"
+            <img src="${wordcloudImageSrc(wordcloudResult.overall_wordcloud)}"
                  class="wordcloud-image" alt="整体词云图">
         `;
         gallery.appendChild(overallDiv);
@@ -529,7 +596,7 @@ function displayWordclouds(wordcloudResult) {
             col.innerHTML = `
                 <div class="wordcloud-container">
                     <h6>${category}</h6>
-                    <img src="data:image/png;base64,${result.image_base64}"
+                    <img src="${wordcloudImageSrc(result)}"
                          class="wordcloud-image" alt="${category}词云图">
                 </div>
             `;
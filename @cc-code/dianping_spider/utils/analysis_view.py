@@ -0,0 +1,250 @@
+import json
+import base64
+import binascii
+
+from utils import storage
+
+
+# 按条目分页返回的逐条评论数组（点分路径），字段投影时不内联
+PAGED_ARRAYS = ('sentiments.details', 'time_analysis')
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# 流式输出时每次发送的字节数
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class CursorExpired(ValueError):
+    """分页游标对应的文件版本已变化"""
+
+
+def _split_path(path):
+    return path.split('.')
+
+
+def _pop_path(data, path):
+    """从嵌套字典中取出路径对应的值，不存在时返回None"""
+    *parents, name = _split_path(path)
+    for key in parents:
+        data = data.get(key) if isinstance(data, dict) else None
+    if not isinstance(data, dict):
+        return None
+    return data.pop(name, None)
+
+
+class AnalysisDocument:
+    """拆分后的分析结果文档
+
+    逐条评论数组（PAGED_ARRAYS）按条目预先序列化，其余部分作为摘要保留为对象。
+    预序列化的条目占用内存接近JSON文本大小，分页只需切片拼接；
+    摘要通常只有几KB，字段投影不受评论数量影响。
+    """
+
+    __slots__ = ('summary', 'arrays', 'cost')
+
+    def __init__(self, data):
+        self.summary = data if isinstance(data, dict) else {}
+        self.arrays = {}
+        self.cost = 0
+        for path in PAGED_ARRAYS:
+            items = _pop_path(self.summary, path)
+            if isinstance(items, list):
+                encoded = [json.dumps(item, ensure_ascii=False).encode('utf-8') for item in items]
+                self.arrays[path] = encoded
+                self.cost += sum(len(item) for item in encoded) + 64 * len(encoded)
+        self.cost += len(json.dumps(self.summary, ensure_ascii=False).encode('utf-8')) * 5
+
+    @classmethod
+    def load(cls, path):
+        return cls(storage.load_json(path))
+
+    def project(self, fields):
+        """按字段路径投影摘要，返回 (投影结果, {涉及的分页数组: 条目数})"""
+        result = {}
+        for field in fields:
+            value = self.summary
+            for key in _split_path(field):
+                value = value.get(key) if isinstance(value, dict) else None
+                if value is None:
+                    break
+            if value is None:
+                continue
+            target = result
+            *parents, name = _split_path(field)
+            for key in parents:
+                target = target.setdefault(key, {})
+            target[name] = value
+
+        paged = {
+            path: len(items) for path, items in self.arrays.items()
+            if any(path == field or path.startswith(field + '.') for field in fields)
+        }
+        return result, paged
+
+    def page(self, name, offset, limit):
+        """分页数组的一页条目（已序列化），返回 (条目列表, 条目总数)"""
+        if name not in self.arrays:
+            raise ValueError(f"不支持分页的字段: {name}，可选: {', '.join(self.arrays)}")
+        items = self.arrays[name]
+        return items[offset:offset + limit], len(items)
+
+
+def parse_fields(value):
+    """解析 ?fields=a,b.c 参数"""
+    fields = [field.strip() for field in (value or '').split(',') if field.strip()]
+    if not fields:
+        raise ValueError("fields 参数不能为空")
+    return fields
+
+
+def parse_limit(value):
+    if value in (None, ''):
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError("limit 必须是整数")
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def encode_cursor(version, offset):
+    """游标包含文件版本，文件重新生成后旧游标失效"""
+    return base64.urlsafe_b64encode(f"{version}:{offset}".encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, version):
+    """解析游标得到偏移量（cursor为空时从头开始）"""
+    if not cursor:
+        return 0
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        cursor_version, offset = raw.rsplit(':', 1)
+        offset = int(offset)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("无效的分页游标")
+    if cursor_version != version or offset < 0:
+        raise CursorExpired("分析结果已更新，请重新从第一页开始读取")
+    return offset
+
+
+def _chunked(parts):
+    """把小片段合并为约 STREAM_CHUNK_SIZE 的块"""
+    buffer = []
+    size = 0
+    for part in parts:
+        buffer.append(part)
+        size += len(part)
+        if size >= STREAM_CHUNK_SIZE:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def stream_projection(document, fields):
+    """流式生成字段投影的响应体"""
+    data, paged = document.project(fields)
+    encoder = json.JSONEncoder(ensure_ascii=False)
+    payload = {'success': True, 'data': data, 'paged': paged}
+    return _chunked(chunk.encode('utf-8') for chunk in encoder.iterencode(payload))
+
+
+def stream_page(document, name, offset, limit, version):
+    """流式生成分页数组一页的响应体"""
+    items, total = document.page(name, offset, limit)
+    end = offset + len(items)
+    next_cursor = encode_cursor(version, end) if end < total else None
+
+    def parts():
+        yield b'{"success": true, "items": ['
+        for i, item in enumerate(items):
+            yield b', ' + item if i else item
+        tail = {'total': total, 'offset': offset, 'next_cursor': next_cursor}
+        yield b'], ' + json.dumps(tail)[1:].encode('utf-8')
+
+    return _chunked(parts())
+
+
+def view(document, args, version):
+    """按查询参数生成流式响应体
+
+    args: 查询参数（fields 或 items/cursor/limit）。参数错误时抛出 ValueError，
+    游标过期时抛出 CursorExpired。
+    """
+    if args.get('items'):
+        offset = decode_cursor(args.get('cursor'), version)
+        return stream_page(document, args['items'], offset, parse_limit(args.get('limit')), version)
+    return stream_projection(document, parse_fields(args.get('fields')))
+
+
+def benchmark(records=50000):
+    """大分析文件的完整响应与摘要投影、分页的开销对比"""
+    import os
+    import time
+    import random
+    import tempfile
+
+    from utils.response_cache import ResponseCache
+
+    words = ['火锅', '牛肉', '新鲜', '服务', '环境', '价格', '排队', '好吃', '性价比', '毛肚']
+    analysis = {
+        'basic_stats': {'total_comments': records, 'average_rating': 4.2},
+        'keywords': [[w, random.random()] for w in words],
+        'sentiments': {
+            'distribution': {'positive': records // 2, 'neutral': records // 4, 'negative': records // 4},
+            'average_score': 0.61,
+            'details': [{'label': 'positive', 'score': random.random()} for _ in range(records)]
+        },
+        'labels': {'category_counts': {'口味': records}},
+        'time_analysis': [
+            {'time': '2024-01-01', 'rating': 5, 'sentiment_score': random.random(), 'sentiment_label': 'positive'}
+            for _ in range(records)
+        ]
+    }
+
+    def full_body(data):
+        return json.dumps({'success': True, 'data': data}, ensure_ascii=False).encode('utf-8')
+
+    def timed(func, repeat=20):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            result = func()
+        return (time.perf_counter() - start) / repeat * 1e3, result
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'comments_bench_20240101_000000_analysis.json')
+        storage.dump_json(analysis, path)
+        results['file_kb'] = os.path.getsize(path) / 1024
+
+        results['full_ms'], body = timed(lambda: full_body(storage.load_json(path)), repeat=3)
+        results['full_kb'] = len(body) / 1024
+
+        cache = ResponseCache()
+        results['split_ms'], _ = timed(lambda: AnalysisDocument.load(path), repeat=3)
+        entry = cache.parsed(path, AnalysisDocument.load)
+        fields = {'fields': 'basic_stats,sentiments,keywords,labels'}
+        results['summary_ms'], body = timed(
+            lambda: b''.join(view(cache.parsed(path, AnalysisDocument.load).data, fields, entry.etag))
+        )
+        results['summary_kb'] = len(body) / 1024
+        page = {'items': 'time_analysis', 'limit': str(DEFAULT_PAGE_SIZE)}
+        results['page_ms'], body = timed(
+            lambda: b''.join(view(cache.parsed(path, AnalysisDocument.load).data, page, entry.etag))
+        )
+        results['page_kb'] = len(body) / 1024
+        results['cache_mb'] = cache.stats()['bytes'] / 1024 / 1024
+
+    return results
+
+
+if __name__ == "__main__":
+    # 基准测试
+    stats = benchmark()
+    print(f"分析文件 {stats['file_kb'] / 1024:.1f} MB")
+    print(f"完整响应（读取+序列化）: {stats['full_ms']:.1f} ms, {stats['full_kb'] / 1024:.1f} MB")
+    print(f"首次拆分加载: {stats['split_ms']:.1f} ms, 缓存占用 {stats['cache_mb']:.1f} MB")
+    print(f"摘要投影（缓存命中）: {stats['summary_ms']:.3f} ms, {stats['summary_kb']:.1f} KB")
+    print(f"分页 {DEFAULT_PAGE_SIZE} 条（缓存命中）: {stats['page_ms']:.3f} ms, {stats['page_kb']:.1f} KB")
@@ -0,0 +1,311 @@
+import os
+import time
+import zlib
+import hashlib
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from config import SPIDER_CONFIG
+from utils.data_utils import Logger
+from utils import storage
+
+# 合规要求的数据保留期限（天）
+RETENTION_DAYS = SPIDER_CONFIG.get('BACKUP_RETENTION_DAYS', 30)
+# 自动清理的最小间隔（秒）
+GC_INTERVAL = SPIDER_CONFIG.get('BACKUP_GC_INTERVAL', 24 * 3600)
+# 清理时跳过最近修改过的数据块，避免删除其他进程刚写入、清单尚未保存的块
+GC_GRACE_SECONDS = 3600
+
+
+# 内容定义分块参数（平均约64KB）
+MIN_CHUNK_SIZE = 16 * 1024
+AVG_CHUNK_BITS = 16
+MAX_CHUNK_SIZE = 256 * 1024
+WINDOW_SIZE = 32
+READ_BLOCK_SIZE = 8 * 1024 * 1024
+
+
+def _build_tables(window=WINDOW_SIZE, seed=20240601):
+    """预计算buzhash循环左移表：tables[k][b] = rotl(T[b], k)"""
+    rng = np.random.RandomState(seed)
+    base = rng.randint(0, 2 ** 32, size=256, dtype=np.uint64).astype(np.uint32)
+    tables = []
+    for k in range(window):
+        rotated = ((base << np.uint32(k)) | (base >> np.uint32((32 - k) % 32))) if k else base
+        tables.append(rotated.astype(np.uint32))
+    return tables
+
+
+_TABLES = _build_tables()
+
+
+def iter_chunks(stream, min_size=MIN_CHUNK_SIZE, avg_bits=AVG_CHUNK_BITS, max_size=MAX_CHUNK_SIZE):
+    """按内容定义的边界切分数据流
+
+    使用窗口化buzhash，哈希低avg_bits位全为0处作为候选切点，
+    插入或删除内容只影响附近的块，未变化部分的块哈希保持不变。
+    哈希计算用numpy向量化完成，按块读取，内存占用与文件大小无关。
+    """
+    mask = np.uint32((1 << avg_bits) - 1)
+    pending = b''
+    tail = b''
+
+    while True:
+        block = stream.read(READ_BLOCK_SIZE)
+        eof = not block
+
+        if block:
+            # 带上上一块末尾的窗口数据，使滚动哈希跨块连续
+            data = np.frombuffer(tail + block, dtype=np.uint8)
+            if len(data) >= WINDOW_SIZE:
+                h = np.zeros(len(data) - WINDOW_SIZE + 1, dtype=np.uint32)
+                for k in range(WINDOW_SIZE):
+                    h ^= _TABLES[k][data[WINDOW_SIZE - 1 - k:len(data) - k]]
+                # 候选切点（相对于pending的位置，切在窗口结束之后）
+                offset = len(pending) - len(tail) + WINDOW_SIZE
+                candidates = (np.flatnonzero((h & mask) == 0) + offset).tolist()
+            else:
+                candidates = []
+            tail = (tail + block)[-(WINDOW_SIZE - 1):]
+            pending += block
+        else:
+            candidates = []
+
+        start = 0
+        for cut in candidates:
+            while cut - start > max_size:
+                yield pending[start:start + max_size]
+                start += max_size
+            if cut - start >= min_size:
+                yield pending[start:cut]
+                start = cut
+
+        if eof:
+            while len(pending) - start > max_size:
+                yield pending[start:start + max_size]
+                start += max_size
+            if start < len(pending):
+                yield pending[start:]
+            return
+
+        # 未找到切点的数据超过上限时强制切分
+        while len(pending) - start > max_size:
+            yield pending[start:start + max_size]
+            start += max_size
+        pending = pending[start:]
+
+
+class BackupStore:
+    """内容寻址的去重备份存储
+
+    目录结构::
+
+        backup/
+          objects/ab/abcdef...   # 按sha256存储的唯一数据块（zlib压缩）
+          manifests/<文件名>/<版本>.json  # 每个备份版本的块列表
+
+    重复备份大部分未变化的文件时只写入新增的块。
+    """
+
+    def __init__(self, backup_dir='backup', retention_days=RETENTION_DAYS, gc_interval=GC_INTERVAL):
+        self.backup_dir = backup_dir
+        self.objects_dir = os.path.join(backup_dir, 'objects')
+        self.manifests_dir = os.path.join(backup_dir, 'manifests')
+        self.retention_days = retention_days
+        self.gc_interval = gc_interval
+        # 上次清理时间记录在该文件的修改时间上，多个进程共享
+        self._gc_marker = os.path.join(backup_dir, '.last_gc')
+        self.logger = Logger.setup(__name__)
+        self._lock = threading.Lock()
+
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.manifests_dir, exist_ok=True)
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def _put_chunk(self, chunk):
+        """写入数据块（已存在则跳过），返回(哈希, 是否新写入)"""
+        digest = hashlib.sha256(chunk).hexdigest()
+        path = self._object_path(digest)
+        if os.path.exists(path):
+            # 刷新修改时间，使其在清理的保护期内
+            os.utime(path)
+            return digest, False
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with storage.atomic_write(path, codec='raw') as f:
+            f.write(zlib.compress(chunk, 6))
+        return digest, True
+
+    def _get_chunk(self, digest):
+        with open(self._object_path(digest), 'rb') as f:
+            return zlib.decompress(f.read())
+
+    def backup(self, src_path, name=None):
+        """备份文件，返回清单路径"""
+        name = name or os.path.basename(src_path)
+        file_hash = hashlib.sha256()
+        chunks = []
+        new_chunks = 0
+        new_bytes = 0
+        size = 0
+
+        # 与gc互斥，避免新写入但尚未被清单引用的块被清理
+        with self._lock, open(src_path, 'rb') as f:
+            for chunk in iter_chunks(f):
+                digest, is_new = self._put_chunk(chunk)
+                chunks.append([digest, len(chunk)])
+                file_hash.update(chunk)
+                size += len(chunk)
+                if is_new:
+                    new_chunks += 1
+                    new_bytes += len(chunk)
+
+            now = datetime.now()
+            manifest = {
+                'name': name,
+                'created': now.isoformat(),
+                'size': size,
+                'sha256': file_hash.hexdigest(),
+                'chunks': chunks
+            }
+
+            manifest_dir = os.path.join(self.manifests_dir, name)
+            version = now.strftime('%Y%m%d_%H%M%S_%f')
+            manifest_path = os.path.join(manifest_dir, f"{version}.json")
+            storage.dump_json(manifest, manifest_path, indent=None)
+
+        self.logger.info(
+            f"备份 {name}: {len(chunks)} 块，新增 {new_chunks} 块 ({new_bytes}/{size} 字节)"
+        )
+        return manifest_path
+
+    def list_versions(self, name):
+        """列出文件的备份版本（从旧到新）"""
+        manifest_dir = os.path.join(self.manifests_dir, name)
+        if not os.path.isdir(manifest_dir):
+            return []
+        return sorted(f[:-len('.json')] for f in os.listdir(manifest_dir) if f.endswith('.json'))
+
+    def load_manifest(self, name, version=None):
+        """加载备份清单，version为None时取最新版本"""
+        versions = self.list_versions(name)
+        if not versions:
+            return None
+        if version is None:
+            version = versions[-1]
+        return storage.load_json(os.path.join(self.manifests_dir, name, f"{version}.json"))
+
+    def iter_restore(self, name, version=None):
+        """流式读取备份内容"""
+        manifest = self.load_manifest(name, version)
+        if manifest is None:
+            raise FileNotFoundError(f"没有找到备份: {name}")
+        for digest, _ in manifest['chunks']:
+            yield self._get_chunk(digest)
+
+    def restore(self, name, dst_path, version=None):
+        """恢复备份到指定路径（逐块写入并校验）"""
+        manifest = self.load_manifest(name, version)
+        if manifest is None:
+            raise FileNotFoundError(f"没有找到备份: {name}")
+
+        file_hash = hashlib.sha256()
+        with storage.atomic_write(dst_path, codec='raw') as f:
+            for digest, _ in manifest['chunks']:
+                chunk = self._get_chunk(digest)
+                file_hash.update(chunk)
+                f.write(chunk)
+
+            if file_hash.hexdigest() != manifest['sha256']:
+                raise ValueError(f"备份校验失败: {name}")
+
+        return dst_path
+
+    def gc(self, retention_days=None):
+        """清理超过保留期限的备份版本及不再被引用的数据块"""
+        if retention_days is None:
+            retention_days = self.retention_days
+        cutoff = datetime.now() - timedelta(days=retention_days)
+        grace_cutoff = time.time() - GC_GRACE_SECONDS
+
+        with self._lock:
+            removed_manifests = 0
+            live = set()
+
+            for name in os.listdir(self.manifests_dir):
+                manifest_dir = os.path.join(self.manifests_dir, name)
+                for version in self.list_versions(name):
+                    path = os.path.join(manifest_dir, f"{version}.json")
+                    manifest = storage.load_json(path)
+                    if datetime.fromisoformat(manifest['created']) < cutoff:
+                        os.remove(path)
+                        removed_manifests += 1
+                    else:
+                        live.update(digest for digest, _ in manifest['chunks'])
+                if not os.listdir(manifest_dir):
+                    os.rmdir(manifest_dir)
+
+            removed_chunks = 0
+            freed_bytes = 0
+            for prefix in os.listdir(self.objects_dir):
+                prefix_dir = os.path.join(self.objects_dir, prefix)
+                for digest in os.listdir(prefix_dir):
+                    # 跳过正在写入的临时文件
+                    if digest.startswith('.') or digest in live:
+                        continue
+                    path = os.path.join(prefix_dir, digest)
+                    stat = os.stat(path)
+                    if stat.st_mtime > grace_cutoff:
+                        continue
+                    freed_bytes += stat.st_size
+                    os.remove(path)
+                    removed_chunks += 1
+
+            with open(self._gc_marker, 'w'):
+                pass
+
+        self.logger.info(f"备份清理: 删除 {removed_manifests} 个版本, {removed_chunks} 个数据块, 释放 {freed_bytes} 字节")
+        return {
+            'removed_manifests': removed_manifests,
+            'removed_chunks': removed_chunks,
+            'freed_bytes': freed_bytes
+        }
+
+    def maybe_gc(self):
+        """距上次清理超过 gc_interval 时执行 gc，返回清理结果，未到间隔时返回None"""
+        try:
+            last = os.path.getmtime(self._gc_marker)
+        except OSError:
+            last = 0
+        if time.time() - last < self.gc_interval:
+            return None
+        return self.gc()
+
+    def stats(self):
+        """存储统计"""
+        chunk_count = 0
+        stored_bytes = 0
+        for prefix in os.listdir(self.objects_dir):
+            prefix_dir = os.path.join(self.objects_dir, prefix)
+            for digest in os.listdir(prefix_dir):
+                chunk_count += 1
+                stored_bytes += os.path.getsize(os.path.join(prefix_dir, digest))
+
+        logical_bytes = 0
+        version_count = 0
+        for name in os.listdir(self.manifests_dir):
+            for version in self.list_versions(name):
+                manifest = storage.load_json(os.path.join(self.manifests_dir, name, f"{version}.json"))
+                logical_bytes += manifest['size']
+                version_count += 1
+
+        return {
+            'versions': version_count,
+            'chunks': chunk_count,
+            'logical_bytes': logical_bytes,
+            'stored_bytes': stored_bytes
+        }
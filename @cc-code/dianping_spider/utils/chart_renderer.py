@@ -0,0 +1,80 @@
+import threading
+from io import BytesIO
+
+import matplotlib
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+
+class ChartRenderer:
+    """matplotlib 图表渲染器（不经过 pyplot）
+
+    pyplot 的当前图表是全局状态，Web 工作线程同时绘图会互相干扰，绘图中途抛出异常跳过
+    plt.close() 时图表留在 pyplot 的图表管理器中无法回收。这里每次渲染从池中取出一个直接绑定
+    Agg 画布的 Figure（没有空闲的则新建），调用方的绘图函数在其上作图，保存为PNG后无论成功与否
+    都清空并放回池中，同一个 Figure 同一时间只在一个线程中使用。每种尺寸最多保留 max_idle 个空闲 Figure。
+    """
+
+    def __init__(self, max_idle=4):
+        self.max_idle = max_idle
+        self._lock = threading.Lock()
+        self._idle = {}
+        self.created = 0
+        self.reused = 0
+
+    def _acquire(self, figsize):
+        with self._lock:
+            idle = self._idle.get(figsize)
+            if idle:
+                self.reused += 1
+                return idle.pop()
+            self.created += 1
+        figure = Figure(figsize=figsize)
+        FigureCanvasAgg(figure)
+        return figure
+
+    def _release(self, figure, figsize):
+        try:
+            # 清除绘图函数留下的所有状态（坐标轴、标题、tight_layout调整过的边距、背景色）
+            figure.clear()
+            figure.subplotpars.reset()
+            figure.set_size_inches(figsize)
+            figure.set_facecolor(matplotlib.rcParams['figure.facecolor'])
+        except Exception:
+            return
+        with self._lock:
+            idle = self._idle.setdefault(figsize, [])
+            if len(idle) < self.max_idle:
+                idle.append(figure)
+
+    def render(self, draw, figsize, dpi=300, bbox_inches='tight'):
+        """调用 draw(figure) 作图并返回PNG字节，draw 抛出的异常原样抛出（Figure 仍会回收）"""
+        figsize = tuple(figsize)
+        figure = self._acquire(figsize)
+        try:
+            draw(figure)
+            buffer = BytesIO()
+            figure.savefig(buffer, format='png', dpi=dpi, bbox_inches=bbox_inches)
+            return buffer.getvalue()
+        finally:
+            self._release(figure, figsize)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'created': self.created,
+                'reused': self.reused,
+                'idle': sum(len(idle) for idle in self._idle.values())
+            }
+
+
+# 进程内共用的渲染器
+_renderer = ChartRenderer()
+
+
+def get_renderer():
+    return _renderer
+
+
+def render_png(draw, figsize, **kwargs):
+    return _renderer.render(draw, figsize, **kwargs)
@@ -0,0 +1,241 @@
+import os
+import re
+import json
+import hashlib
+import tempfile
+import threading
+from datetime import datetime
+
+from utils.data_utils import Logger
+from utils import storage
+
+
+# 文件名规则: comments_<餐厅>[_<YYYYmmdd_HHMMSS>][_analysis].json
+# 与原先按文件名包含 comments_ / _analysis 判断的规则一致，没有时间戳的文件同样列出（按修改时间排序）
+COMMENTS_FILE_PATTERN = re.compile(
+    r'comments_(?P<restaurant>.*?)(?:_(?P<timestamp>\d{8}_\d{6}))?(?P<analysis>_analysis)?\.(json|csv)'
+)
+WORDCLOUD_FILE_PATTERN = re.compile(r'^wordcloud_.*?(?P<timestamp>\d{8}_\d{6})?\.png$')
+DATE_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+INDEX_VERSION = 2
+
+
+class DataCatalog:
+    """数据文件目录索引
+
+    为数据目录中的文件维护元数据索引（类型、餐厅、记录数、大小、时间范围、内容哈希）。
+    通过目录mtime判断是否需要重新扫描，只重新解析大小或mtime发生变化的文件，
+    索引持久化到 ``<data_dir>/.catalog/index.json``，重启后可直接复用。
+    """
+
+    def __init__(self, data_dir='data', index_dir='.catalog'):
+        self.data_dir = data_dir
+        self.index_dir = os.path.join(data_dir, index_dir)
+        self.index_path = os.path.join(self.index_dir, 'index.json')
+        self.logger = Logger.setup(__name__)
+
+        self._lock = threading.RLock()
+        self._entries = {}
+        self._dir_mtime = None
+        self._dirty = set()
+        self._views = {}
+
+        os.makedirs(self.index_dir, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        """加载持久化的索引"""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+
+        if index.get('version') != INDEX_VERSION:
+            return
+
+        self._entries = index.get('entries', {})
+        self._dir_mtime = index.get('dir_mtime')
+        self._rebuild_views()
+
+    def _save_index(self):
+        """原子写入索引文件"""
+        index = {
+            'version': INDEX_VERSION,
+            'dir_mtime': self._dir_mtime,
+            'entries': self._entries
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=self.index_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(index, f, ensure_ascii=False)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            self.logger.warning(f"保存目录索引失败: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def invalidate(self, filename=None):
+        """标记文件（或整个目录）需要重新索引"""
+        with self._lock:
+            if filename is None:
+                self._dir_mtime = None
+            else:
+                self._dirty.add(os.path.basename(filename))
+
+    def refresh(self, force=False):
+        """按需刷新索引
+
+        目录mtime未变化且没有被标记的文件时只需一次stat调用。
+        """
+        with self._lock:
+            try:
+                dir_mtime = os.stat(self.data_dir).st_mtime_ns
+            except FileNotFoundError:
+                return False
+
+            if not force and dir_mtime == self._dir_mtime and not self._dirty:
+                return False
+
+            if force or dir_mtime != self._dir_mtime:
+                self._rescan()
+            else:
+                for filename in self._dirty:
+                    self._update_entry(filename)
+
+            self._dirty.clear()
+            self._dir_mtime = dir_mtime
+            self._rebuild_views()
+            self._save_index()
+            return True
+
+    def _rescan(self):
+        """扫描数据目录，只解析有变化的文件"""
+        seen = set()
+        with os.scandir(self.data_dir) as it:
+            for entry in it:
+                if entry.name.startswith('.') or not entry.is_file():
+                    continue
+                seen.add(entry.name)
+                st = entry.stat()
+                cached = self._entries.get(entry.name)
+                if (cached and entry.name not in self._dirty
+                        and cached['size'] == st.st_size
+                        and cached['mtime_ns'] == st.st_mtime_ns):
+                    continue
+                self._entries[entry.name] = self._inspect(entry.name, st)
+
+        for name in list(self._entries):
+            if name not in seen:
+                del self._entries[name]
+
+    def _update_entry(self, filename):
+        """更新单个文件的索引项"""
+        filepath = os.path.join(self.data_dir, filename)
+        try:
+            st = os.stat(filepath)
+        except FileNotFoundError:
+            self._entries.pop(filename, None)
+            return
+        self._entries[filename] = self._inspect(filename, st)
+
+    def _inspect(self, filename, st):
+        """解析文件元数据"""
+        entry = {
+            'filename': filename,
+            'kind': 'other',
+            'restaurant': None,
+            'record_count': None,
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'modified': datetime.fromtimestamp(st.st_mtime).isoformat(),
+            'time_range': None,
+            'content_hash': None
+        }
+
+        match = COMMENTS_FILE_PATTERN.search(filename)
+        if match:
+            entry['kind'] = 'analysis' if '_analysis' in filename else 'comments'
+            entry['restaurant'] = match.group('restaurant') or None
+        elif WORDCLOUD_FILE_PATTERN.match(filename):
+            entry['kind'] = 'wordcloud'
+
+        filepath = os.path.join(self.data_dir, filename)
+        hasher = hashlib.sha256()
+        try:
+            # 哈希基于解压后的内容，压缩与否不影响去重判断
+            with storage.open_read(filepath) as f:
+                if storage.strip_codec_suffix(filename).endswith('.json') and entry['kind'] in ('comments', 'analysis'):
+                    content = f.read()
+                    hasher.update(content)
+                    self._inspect_json(entry, content)
+                else:
+                    for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                        hasher.update(chunk)
+            entry['content_hash'] = hasher.hexdigest()
+        except (OSError, EOFError) as e:
+            self.logger.warning(f"读取文件失败 {filename}: {e}")
+
+        return entry
+
+    def _inspect_json(self, entry, content):
+        """解析评论/分析JSON的记录数和时间范围"""
+        try:
+            data = json.loads(content.decode('utf-8'))
+        except ValueError as e:
+            self.logger.warning(f"解析JSON失败 {entry['filename']}: {e}")
+            return
+
+        if entry['kind'] == 'comments' and isinstance(data, list):
+            entry['record_count'] = len(data)
+            entry['time_range'] = self._time_range(data)
+        elif entry['kind'] == 'analysis' and isinstance(data, dict):
+            entry['record_count'] = data.get('basic_stats', {}).get('total_comments')
+            entry['time_range'] = self._time_range(data.get('time_analysis', []))
+
+    @staticmethod
+    def _time_range(records):
+        """从记录的time字段中提取日期范围"""
+        dates = []
+        for record in records:
+            if not isinstance(record, dict):
+                continue
+            match = DATE_PATTERN.search(str(record.get('time') or record.get('crawl_time') or ''))
+            if match:
+                dates.append(match.group(0))
+        if not dates:
+            return None
+        return {'start': min(dates), 'end': max(dates)}
+
+    def _rebuild_views(self):
+        """预先计算按类型分组的有序列表"""
+        views = {}
+        for entry in sorted(self._entries.values(), key=lambda e: e['mtime_ns'], reverse=True):
+            views.setdefault(entry['kind'], []).append(entry)
+        self._views = views
+
+    def list(self, kind=None, restaurant=None, extension=None):
+        """列出索引项（按修改时间倒序）"""
+        self.refresh()
+        with self._lock:
+            if kind is None:
+                entries = [e for group in self._views.values() for e in group]
+                entries.sort(key=lambda e: e['mtime_ns'], reverse=True)
+            else:
+                entries = self._views.get(kind, [])
+            if restaurant is not None:
+                entries = [e for e in entries if e['restaurant'] == restaurant]
+            if extension is not None:
+                entries = [e for e in entries if storage.strip_codec_suffix(e['filename']).endswith(extension)]
+            return list(entries)
+
+    def names(self, kind, extension=None):
+        """列出某一类型的文件名"""
+        return [entry['filename'] for entry in self.list(kind, extension=extension)]
+
+    def get(self, filename):
+        """获取单个文件的索引项"""
+        self.refresh()
+        with self._lock:
+            return self._entries.get(filename)
@@ -1,16 +1,24 @@
 import os
 import json
-import pandas as pd
+import time
 from datetime import datetime
-import logging
+
+from config import SPIDER_CONFIG
+from utils import storage
 
 
 class DataManager:
-    """数据管理工具类"""
+    """数据管理工具类
+
+    文件按扩展名透明压缩（.gz/.zst），读取时自动识别；所有写入均为原子写入。
+    """
 
-    def __init__(self, data_dir='data', backup_dir='backup'):
+    def __init__(self, data_dir='data', backup_dir='backup', compression=None):
         self.data_dir = data_dir
         self.backup_dir = backup_dir
+        self.compression = compression if compression is not None else SPIDER_CONFIG.get('COMPRESSION')
+        self._catalog = None
+        self._backup_store = None
         self.ensure_dirs()
 
     def ensure_dirs(self):
@@ -18,57 +26,91 @@ class DataManager:
         os.makedirs(self.data_dir, exist_ok=True)
         os.makedirs(self.backup_dir, exist_ok=True)
 
+    @property
+    def catalog(self):
+        """数据文件目录索引（首次访问时创建）"""
+        if self._catalog is None:
+            from utils.data_catalog import DataCatalog
+            self._catalog = DataCatalog(self.data_dir)
+        return self._catalog
+
+    def _notify_catalog(self, filename):
+        """通知目录索引文件已变更"""
+        if self._catalog is not None:
+            self._catalog.invalidate(filename)
+
+    def _write_path(self, filename):
+        """写入路径：未指定压缩扩展名时按配置追加"""
+        if self.compression and storage.codec_for_path(filename) is None:
+            filename += storage.codec_suffix(self.compression)
+        return os.path.join(self.data_dir, filename)
+
     def save_json(self, data, filename):
         """保存JSON数据"""
-        filepath = os.path.join(self.data_dir, filename)
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        filepath = storage.dump_json(data, self._write_path(filename))
+        self._notify_catalog(filepath)
         return filepath
 
     def load_json(self, filename):
         """加载JSON数据"""
         filepath = os.path.join(self.data_dir, filename)
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            return storage.load_json(filepath)
         except FileNotFoundError:
             return None
 
     def save_csv(self, data, filename):
         """保存CSV数据"""
-        filepath = os.path.join(self.data_dir, filename)
         if isinstance(data, list):
+            import pandas as pd
+
             df = pd.DataFrame(data)
         else:
             df = data
-        df.to_csv(filepath, index=False, encoding='utf-8-sig')
+        filepath = storage.dump_csv(df, self._write_path(filename))
+        self._notify_catalog(filepath)
         return filepath
 
     def load_csv(self, filename):
         """加载CSV数据"""
         filepath = os.path.join(self.data_dir, filename)
         try:
-            return pd.read_csv(filepath, encoding='utf-8-sig')
+            return storage.load_csv(filepath)
         except FileNotFoundError:
             return None
 
+    @property
+    def backup_store(self):
+        """去重备份存储（首次访问时创建）"""
+        if self._backup_store is None:
+            from utils.backup_store import BackupStore
+            self._backup_store = BackupStore(self.backup_dir)
+        return self._backup_store
+
     def backup_file(self, filename):
-        """备份文件"""
+        """备份文件（内容寻址去重存储），返回备份清单路径
+
+        按 BACKUP_GC_INTERVAL 的间隔顺带清理超过保留期限的版本和不再被引用的数据块。
+        """
         src = os.path.join(self.data_dir, filename)
-        if os.path.exists(src):
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            backup_name = f"{timestamp}_{filename}"
-            dst = os.path.join(self.backup_dir, backup_name)
-            import shutil
-            shutil.copy2(src, dst)
-            return dst
-        return None
+        if not os.path.exists(src):
+            return None
+        manifest_path = self.backup_store.backup(src, filename)
+        self.backup_store.maybe_gc()
+        return manifest_path
+
+    def restore_file(self, filename, version=None, dst_filename=None):
+        """从备份恢复文件，version为None时恢复最新版本"""
+        dst = os.path.join(self.data_dir, dst_filename or filename)
+        self.backup_store.restore(filename, dst, version)
+        self._notify_catalog(dst)
+        return dst
 
     def list_files(self, extension=None):
         """列出数据目录中的文件"""
         files = os.listdir(self.data_dir)
         if extension:
-            files = [f for f in files if f.endswith(extension)]
+            files = [f for f in files if storage.strip_codec_suffix(f).endswith(extension)]
         return files
 
 
@@ -76,34 +118,13 @@ class Logger:
     """日志管理工具"""
 
     @staticmethod
-    def setup(name, log_file='app.log', level=logging.INFO):
-        """设置日志"""
-        logger = logging.getLogger(name)
-        logger.setLevel(level)
-
-        # 清除已有的处理器
-        for handler in logger.handlers[:]:
-            logger.removeHandler(handler)
-
-        # 文件处理器
-        file_handler = logging.FileHandler(log_file, encoding='utf-8')
-        file_handler.setLevel(level)
-
-        # 控制台处理器
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(level)
-
-        # 格式化器
-        formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
-        file_handler.setFormatter(formatter)
-        console_handler.setFormatter(formatter)
+    def setup(name, log_file=None, level=None, json_format=None):
+        """设置日志
 
-        logger.addHandler(file_handler)
-        logger.addHandler(console_handler)
-
-        return logger
+        同名日志器重复调用是幂等的；日志通过队列由后台线程写入文件和控制台。
+        """
+        from utils.log_manager import get_logger
+        return get_logger(name, log_file, level, json_format)
 
 
 class RateLimiter:
@@ -130,26 +151,123 @@ class RateLimiter:
         self.last_request = time.time()
 
 
-class ProgressTracker:
-    """进度跟踪器"""
+class ProgressReporter:
+    """进度与指标上报器
+
+    记录已处理数量、吞吐量和预计剩余时间，按 interval 限制输出频率，
+    并把快照推送给所有 sinks（控制台、Web任务状态等）。
+    子阶段通过 stage() 映射到父进度的一段区间内。
+    """
 
-    def __init__(self, total, desc="Progress"):
+    def __init__(self, total=None, desc="Progress", interval=0.5, sinks=None,
+                 console=False, start=0.0, end=100.0, parent=None):
         self.total = total
-        self.current = 0
         self.desc = desc
+        self.interval = interval
+        self.sinks = list(sinks or [])
+        if console:
+            self.sinks.append(console_progress_sink)
+        self.start = start
+        self.end = end
+        self.parent = parent
 
-    def update(self, step=1):
-        """更新进度"""
+        self.current = 0
+        self.message = desc
+        self.started_at = time.monotonic()
+        self._last_emit = 0.0
+
+    def stage(self, start, end, total=None, message=None):
+        """创建子阶段上报器，占本阶段区间的 [start, end]%"""
+        span = self.end - self.start
+        child = ProgressReporter(total=total, desc=message or self.desc, interval=self.interval,
+                                 start=self.start + span * start / 100, end=self.start + span * end / 100,
+                                 parent=self)
+        child.emit(force=True)
+        return child
+
+    @property
+    def fraction(self):
+        """本阶段完成比例（0-1）"""
+        if not self.total:
+            return 0.0
+        return min(self.current / self.total, 1.0)
+
+    @property
+    def progress(self):
+        """映射后的总体进度（百分比）"""
+        return self.start + (self.end - self.start) * self.fraction
+
+    def snapshot(self):
+        """当前进度快照"""
+        elapsed = time.monotonic() - self.started_at
+        throughput = self.current / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if self.total and throughput > 0:
+            eta = round(max(self.total - self.current, 0) / throughput, 1)
+        return {
+            'progress': round(self.progress, 1),
+            'message': self.message,
+            'processed': self.current,
+            'total': self.total,
+            'throughput': round(throughput, 2),
+            'eta': eta,
+            'elapsed': round(elapsed, 1)
+        }
+
+    def update(self, step=1, message=None):
+        """更新进度（输出频率受 interval 限制）"""
         self.current += step
-        percentage = (self.current / self.total) * 100
-        print(f"\r{self.desc}: {self.current}/{self.total} ({percentage:.1f}%)", end="")
-        if self.current >= self.total:
-            print()  # 换行
-
-    def finish(self):
-        """完成进度"""
-        self.current = self.total
-        self.update(0)
+        if message is not None:
+            self.message = message
+        now = time.monotonic()
+        if now - self._last_emit >= self.interval or (self.total and self.current >= self.total):
+            self._emit(now)
+
+    def set_message(self, message):
+        """更新状态消息并立即推送"""
+        self.message = message
+        self.emit(force=True)
+
+    def emit(self, force=False):
+        """推送当前快照"""
+        now = time.monotonic()
+        if force or now - self._last_emit >= self.interval:
+            self._emit(now)
+
+    def _emit(self, now):
+        self._last_emit = now
+        snapshot = self.snapshot()
+        reporter = self
+        while reporter is not None:
+            for sink in reporter.sinks:
+                sink(snapshot)
+            reporter = reporter.parent
+
+    def finish(self, message=None):
+        """完成本阶段"""
+        if not self.total:
+            self.total = max(self.current, 1)
+        self.current = max(self.current, self.total)
+        if message is not None:
+            self.message = message
+        self.emit(force=True)
+
+
+def console_progress_sink(snapshot):
+    """控制台进度输出"""
+    total = snapshot['total'] if snapshot['total'] is not None else '?'
+    eta = f", 剩余约{snapshot['eta']}s" if snapshot['eta'] is not None else ''
+    print(f"\r{snapshot['message']}: {snapshot['processed']}/{total} "
+          f"({snapshot['progress']:.1f}%, {snapshot['throughput']:.1f}/s{eta})", end="")
+    if snapshot['progress'] >= 100:
+        print()  # 换行
+
+
+class ProgressTracker(ProgressReporter):
+    """进度跟踪器（控制台输出）"""
+
+    def __init__(self, total, desc="Progress", interval=0.5):
+        super().__init__(total=total, desc=desc, interval=interval, console=True)
 
 
 def clean_text(text):
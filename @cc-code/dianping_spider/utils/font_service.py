@@ -0,0 +1,368 @@
+import io
+import os
+import sys
+import time
+import base64
+import hashlib
+import shutil
+import threading
+import subprocess
+
+from PIL import ImageFont
+
+from utils import storage
+from utils.data_utils import Logger
+
+try:
+    from fontTools import subset as ft_subset
+    from fontTools.ttLib import TTFont
+except ImportError:
+    ft_subset = None
+    TTFont = None
+
+
+# 各平台的字体目录（没有fontconfig时扫描）
+FONT_DIRS = {
+    'win32': [os.path.join(os.environ.get('WINDIR', 'C:/Windows'), 'Fonts')],
+    'darwin': ['/System/Library/Fonts', '/Library/Fonts', os.path.expanduser('~/Library/Fonts')],
+    'linux': ['/usr/share/fonts', '/usr/local/share/fonts', os.path.expanduser('~/.local/share/fonts'),
+              os.path.expanduser('~/.fonts')],
+}
+
+FONT_EXTENSIONS = ('.ttf', '.otf', '.ttc')
+
+# 中文字体的优先顺序（按字体族名匹配，不区分大小写）
+PREFERRED_FAMILIES = [
+    'Microsoft YaHei', 'SimHei', 'PingFang SC', 'Hiragino Sans GB', 'Noto Sans CJK SC',
+    'Noto Sans SC', 'Source Han Sans SC', 'Source Han Sans CN', 'WenQuanYi Micro Hei',
+    'WenQuanYi Zen Hei', 'Droid Sans Fallback', 'SimSun', 'Arial Unicode MS',
+]
+
+# 没有中文字体时的后备字体
+FALLBACK_FAMILIES = ['DejaVu Sans', 'Liberation Sans', 'Helvetica', 'Arial']
+
+REGULAR_STYLES = ('regular', 'book', 'normal', 'roman', 'medium', 'w3', '')
+
+# 判断是否支持中文的探测字符
+CJK_PROBE = '中文词云'
+
+# 字体清单缓存格式变化时递增
+INDEX_VERSION = 2
+
+# 子集字体缓存的上限：总大小和最长未使用时间；最近使用过的子集（可能仍被其他渲染进程按路径加载）不删除
+SUBSET_CACHE_MAX_BYTES = 64 * 1024 * 1024
+SUBSET_CACHE_MAX_AGE = 7 * 24 * 3600
+SUBSET_IN_USE_SECONDS = 600
+
+
+def _font_dirs():
+    platform = 'linux' if sys.platform.startswith('linux') else sys.platform
+    return [d for d in FONT_DIRS.get(platform, FONT_DIRS['linux']) if os.path.isdir(d)]
+
+
+def _dirs_signature(dirs):
+    """字体目录（含子目录）的mtime，安装或删除字体后清单失效"""
+    signature = {}
+    for root in dirs:
+        for path, _, _ in os.walk(root):
+            try:
+                signature[path] = os.stat(path).st_mtime_ns
+            except OSError:
+                pass
+    return signature
+
+
+def _read_font(path):
+    """读取字体族名及是否包含中文字形，无法读取时返回None"""
+    if TTFont is not None:
+        try:
+            font = TTFont(path, lazy=True, fontNumber=0)
+            try:
+                family = font['name'].getBestFamilyName()
+                style = font['name'].getBestSubFamilyName()
+                cmap = font.getBestCmap() or {}
+            finally:
+                font.close()
+        except Exception:
+            return None
+        return {'path': path, 'family': family, 'style': style, 'cjk': all(ord(c) in cmap for c in CJK_PROBE)}
+
+    try:
+        family, style = ImageFont.truetype(path, 12).getname()
+    except OSError:
+        return None
+    # 没有fontTools时只能按字体族名判断
+    return {'path': path, 'family': family, 'style': style, 'cjk': family in PREFERRED_FAMILIES}
+
+
+def _regular_first(fonts):
+    """同一字体族中常规字重排在前（粗体、斜体等排在后面）"""
+    def rank(info):
+        return 0 if (info.get('style') or '').lower() in REGULAR_STYLES else 1
+    return sorted(fonts, key=rank)
+
+
+class FontService:
+    """字体发现与按需子集化
+
+    首次使用时查找系统字体（优先 fc-list，否则扫描各平台字体目录），字体清单连同字体目录的mtime
+    保存到 <cache_dir>/fonts.json，之后的进程直接读取，字体目录变化时重新扫描。
+    subset() 把字体裁剪为一份词频实际用到的字形（需要fontTools），子集文件按字体和字符集缓存在
+    <cache_dir>/subsets/ 下，CJK字体从十几MB降到几十KB，加载更快，每个渲染进程的内存也更少。
+    子集缓存按最近使用时间淘汰：每次生成新子集后删除超过 subset_max_age 未使用的子集，
+    总大小超过 subset_max_bytes 时再删除最久未使用的。
+    """
+
+    def __init__(self, cache_dir='data/.font_cache', subset_max_bytes=SUBSET_CACHE_MAX_BYTES,
+                 subset_max_age=SUBSET_CACHE_MAX_AGE):
+        self.cache_dir = cache_dir
+        self.subset_max_bytes = subset_max_bytes
+        self.subset_max_age = subset_max_age
+        self.logger = Logger.setup(__name__)
+        self._lock = threading.Lock()
+        self._fonts = None
+
+    @property
+    def index_path(self):
+        return os.path.join(self.cache_dir, 'fonts.json')
+
+    def fonts(self):
+        """字体清单 [{'path', 'family', 'style', 'cjk'}]（常规字重在前，进程内只加载一次）"""
+        if self._fonts is None:
+            with self._lock:
+                if self._fonts is None:
+                    self._fonts = _regular_first(self._load_index())
+        return self._fonts
+
+    def _load_index(self):
+        dirs = _font_dirs()
+        signature = _dirs_signature(dirs)
+        try:
+            index = storage.load_json(self.index_path)
+            if index.get('version') == INDEX_VERSION and index.get('signature') == signature:
+                return index['fonts']
+        except (OSError, ValueError):
+            pass
+
+        start = time.perf_counter()
+        fonts = self._scan_fontconfig()
+        if fonts is None:
+            fonts = [info for info in map(_read_font, self._scan_dirs(dirs)) if info]
+        self.logger.info(f"字体扫描完成: {len(fonts)} 个字体，{(time.perf_counter() - start) * 1e3:.0f} ms")
+        try:
+            storage.dump_json({'version': INDEX_VERSION, 'signature': signature, 'fonts': fonts},
+                              self.index_path, indent=None)
+        except OSError as e:
+            self.logger.warning(f"保存字体清单失败: {e}")
+        return fonts
+
+    @staticmethod
+    def _scan_dirs(dirs):
+        for root in dirs:
+            for path, _, files in os.walk(root):
+                for name in sorted(files):
+                    if name.lower().endswith(FONT_EXTENSIONS):
+                        yield os.path.join(path, name)
+
+    def _scan_fontconfig(self):
+        """用 fc-list 列出字体（族名和支持的语言），没有fontconfig时返回None"""
+        if shutil.which('fc-list') is None:
+            return None
+        try:
+            output = subprocess.run(
+                ['fc-list', '--format', '%{file}\\t%{family[0]}\\t%{style[0]}\\t%{lang}\\n'],
+                capture_output=True, text=True, timeout=30, check=True
+            ).stdout
+        except (OSError, subprocess.SubprocessError) as e:
+            self.logger.warning(f"fc-list 执行失败，改为扫描字体目录: {e}")
+            return None
+
+        fonts = []
+        for line in output.splitlines():
+            parts = line.split('\t')
+            if len(parts) != 4 or not parts[0].lower().endswith(FONT_EXTENSIONS):
+                continue
+            path, family, style, langs = parts
+            fonts.append({'path': path, 'family': family, 'style': style,
+                          'cjk': any(lang.startswith('zh') for lang in langs.split('|'))})
+        return sorted(fonts, key=lambda info: info['path'])
+
+    def find_font(self):
+        """最合适的中文字体路径：按 PREFERRED_FAMILIES 顺序，其次任意中文字体，再次后备字体"""
+        fonts = self.fonts()
+        by_family = {}
+        for info in fonts:
+            by_family.setdefault((info['family'] or '').lower(), info['path'])
+        for family in PREFERRED_FAMILIES:
+            path = by_family.get(family.lower())
+            if path and os.path.exists(path):
+                return path
+        for info in fonts:
+            if info['cjk'] and os.path.exists(info['path']):
+                return info['path']
+        for family in FALLBACK_FAMILIES:
+            path = by_family.get(family.lower())
+            if path and os.path.exists(path):
+                return path
+        return None
+
+    def families(self):
+        """已安装的字体族名（中文字体在前），用于 matplotlib 的 font.sans-serif，避免查找不存在的字体"""
+        fonts = self.fonts()
+        installed = {(info['family'] or '').lower(): info['family'] for info in fonts}
+        names = [installed[f.lower()] for f in PREFERRED_FAMILIES if f.lower() in installed]
+        names += [info['family'] for info in fonts if info['cjk'] and info['family'] not in names]
+        names += [installed[f.lower()] for f in FALLBACK_FAMILIES
+                  if f.lower() in installed and installed[f.lower()] not in names]
+        return names
+
+    def subset(self, font_path, text):
+        """只含 text 中字符的子集字体文件路径
+
+        没有fontTools、字体为空或子集化失败时返回原字体路径。
+        """
+        if ft_subset is None or not font_path:
+            return font_path
+        chars = ''.join(sorted(set(text)))
+        key = self._subset_key(font_path, chars)
+        path = os.path.join(self.cache_dir, 'subsets', f"{key}.ttf")
+        try:
+            # 更新修改时间作为最近使用时间
+            os.utime(path)
+        except OSError:
+            try:
+                data = self._build_subset(font_path, chars)
+                with storage.atomic_write(path, codec='raw') as f:
+                    f.write(data)
+            except Exception as e:
+                self.logger.warning(f"字体子集化失败，使用完整字体: {e}")
+                return font_path
+            self.evict_subsets()
+        return path
+
+    def evict_subsets(self):
+        """按最近使用时间淘汰子集字体缓存，返回删除的文件数"""
+        directory = os.path.join(self.cache_dir, 'subsets')
+        now = time.time()
+        entries = []
+        try:
+            for item in os.scandir(directory):
+                if item.name.endswith('.ttf'):
+                    st = item.stat()
+                    entries.append((st.st_mtime, st.st_size, item.path))
+        except OSError:
+            return 0
+
+        total = sum(entry[1] for entry in entries)
+        removed = 0
+        for mtime, size, path in sorted(entries):
+            if now - mtime < SUBSET_IN_USE_SECONDS:
+                break
+            if total <= self.subset_max_bytes and now - mtime <= self.subset_max_age:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        if removed:
+            self.logger.info(f"清理子集字体缓存: 删除 {removed} 个文件")
+        return removed
+
+    def embed(self, font_path, text):
+        """只含 text 中字符的WOFF字体（base64 data URI），用于SVG内嵌，失败时返回None"""
+        if ft_subset is None or not font_path:
+            return None
+        try:
+            data = self._build_subset(font_path, ''.join(sorted(set(text))), flavor='woff')
+        except Exception as e:
+            self.logger.warning(f"生成内嵌字体失败: {e}")
+            return None
+        return 'data:font/woff;base64,' + base64.b64encode(data).decode()
+
+    @staticmethod
+    def _subset_key(font_path, chars):
+        try:
+            st = os.stat(font_path)
+            identity = f"{font_path}:{st.st_size}:{st.st_mtime_ns}"
+        except OSError:
+            identity = font_path
+        return hashlib.sha256(f"{identity}\n{chars}".encode('utf-8')).hexdigest()[:32]
+
+    @staticmethod
+    def _build_subset(font_path, chars, flavor=None):
+        options = ft_subset.Options()
+        options.flavor = flavor
+        options.font_number = 0
+        options.name_IDs = ['*']
+        options.notdef_outline = True
+        options.drop_tables += ['FFTM']
+        font = ft_subset.load_font(font_path, options, lazy=True)
+        try:
+            subsetter = ft_subset.Subsetter(options)
+            subsetter.populate(text=chars)
+            subsetter.subset(font)
+            buffer = io.BytesIO()
+            ft_subset.save_font(font, buffer, options)
+        finally:
+            font.close()
+        return buffer.getvalue()
+
+
+# 进程内共用的字体服务（首次使用时创建）
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_service(cache_dir='data/.font_cache'):
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = FontService(cache_dir)
+        return _service
+
+
+def benchmark(loads=200, words=200):
+    """字体清单冷/热加载，以及完整字体与子集字体的加载耗时"""
+    import random
+    import tempfile
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        start = time.perf_counter()
+        service = FontService(tmp_dir)
+        font_path = service.find_font()
+        results['discover_cold_ms'] = (time.perf_counter() - start) * 1e3
+
+        start = time.perf_counter()
+        FontService(tmp_dir).find_font()
+        results['discover_cached_ms'] = (time.perf_counter() - start) * 1e3
+        results['font_path'] = font_path
+        if not font_path:
+            return results
+
+        alphabet = CJK_PROBE + 'abcdefghijklmnopqrstuvwxyz' + '好吃新鲜服务环境价格排队性价比'
+        text = ''.join(random.choice(alphabet) for _ in range(words * 3))
+        start = time.perf_counter()
+        subset_path = service.subset(font_path, text)
+        results['subset_ms'] = (time.perf_counter() - start) * 1e3
+        results['font_kb'] = os.path.getsize(font_path) / 1024
+        results['subset_kb'] = os.path.getsize(subset_path) / 1024
+
+        for name, path in (('full', font_path), ('subset', subset_path)):
+            start = time.perf_counter()
+            for i in range(loads):
+                ImageFont.truetype(path, 12 + i % 100)
+            results[f"{name}_load_us"] = (time.perf_counter() - start) / loads * 1e6
+    return results
+
+
+if __name__ == "__main__":
+    # 基准测试
+    stats = benchmark()
+    print(f"字体: {stats['font_path']}")
+    print(f"字体清单: 首次扫描 {stats['discover_cold_ms']:.1f} ms，读取缓存 {stats['discover_cached_ms']:.1f} ms")
+    if 'subset_ms' in stats:
+        print(f"子集化: {stats['subset_ms']:.0f} ms，{stats['font_kb']:.0f} KB -> {stats['subset_kb']:.1f} KB")
+        print(f"truetype加载: 完整 {stats['full_load_us']:.0f} us/次，子集 {stats['subset_load_us']:.0f} us/次")
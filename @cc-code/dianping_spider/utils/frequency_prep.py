@@ -0,0 +1,230 @@
+import re
+import unicodedata
+from collections import Counter
+
+import numpy as np
+
+
+# 中文字符之间的空格（TF-IDF二元词组 "服务 态度" 与 "服务态度" 视为同一个词）
+# 以空格开头、之后再向前断言，正则可以直接定位空格而不必在每个位置尝试
+_CJK_SPACE = re.compile(r' (?=[\u3400-\u9fff])(?<=[\u3400-\u9fff] )')
+# ASCII 和中日韩统一表意文字以外的字符（只有含这些字符的词语需要 NFKC 规范化）
+_NFKC_CANDIDATE = re.compile(r'[^\x00-\x7f\u3400-\u9fff]')
+# 空格和换行以外的空白字符（str.isspace 为真的字符）
+_OTHER_SPACES = ('\t\x0b\x0c\r\x1c\x1d\x1e\x1f\x85\xa0\u1680\u2000\u2001\u2002\u2003\u2004\u2005'
+                 '\u2006\u2007\u2008\u2009\u200a\u2028\u2029\u202f\u205f\u3000')
+
+
+def surface_form(word):
+    """词语的规范写法：全角/半角统一（NFKC），连续空白合并为一个空格并去掉首尾空白，去掉中文字符之间的空格"""
+    return _CJK_SPACE.sub('', ' '.join(unicodedata.normalize('NFKC', str(word)).split()))
+
+
+def _normalize_lines(text):
+    """对换行分隔的文本做 NFKC，只处理含 _NFKC_CANDIDATE 字符的行"""
+    parts = []
+    last = 0
+    match = _NFKC_CANDIDATE.search(text)
+    while match is not None:
+        start = text.rfind('\n', 0, match.start()) + 1
+        end = text.find('\n', match.end())
+        if end < 0:
+            end = len(text)
+        parts.append(text[last:start])
+        parts.append(unicodedata.normalize('NFKC', text[start:end]))
+        last = end
+        match = _NFKC_CANDIDATE.search(text, end)
+    if not parts:
+        return text
+    parts.append(text[last:])
+    return ''.join(parts)
+
+
+def _collapse_spaces(text):
+    """换行以外的空白统一为空格，连续空格合并为一个（str.replace 比逐字符的正则快得多）"""
+    for char in _OTHER_SPACES:
+        if char in text:
+            text = text.replace(char, ' ')
+    while '  ' in text:
+        text = text.replace('  ', ' ')
+    return text.replace(' \n', '\n').replace('\n ', '\n').strip(' ')
+
+
+def surface_forms(words):
+    """批量计算 surface_form，返回与 words 等长的列表
+
+    所有词语用换行拼接成一个字符串整体规范化，避免几万个词逐个调用正则和 unicodedata。
+    词语本身含换行时逐个计算。
+    """
+    text = '\n'.join(words)
+    if text.count('\n') == len(words) - 1:
+        forms = _CJK_SPACE.sub('', _collapse_spaces(_normalize_lines(text))).split('\n')
+        if len(forms) == len(words):
+            return forms
+    return [surface_form(word) for word in words]
+
+
+def quantize_frequencies(word_freq, buckets):
+    """把词频量化为 buckets 级（相对最大词频），相近的词频得到相同的字号
+
+    词频整体的细微波动不再改变排布结果和缓存键。最小为第1级，不会量化为0而被丢弃。
+    """
+    if not buckets or not word_freq:
+        return dict(word_freq)
+    top = max(word_freq.values())
+    if top <= 0:
+        return dict(word_freq)
+    return {word: max(1, round(freq / top * buckets)) / buckets for word, freq in word_freq.items()}
+
+
+def _merge_variants(keys, forms, weights):
+    """写法相同（键相同）的词权重累加到第一次出现的位置，其余位置权重置0，显示权重最大的写法
+
+    只遍历有重复的键，没有重复写法时几乎没有开销。返回合并后的词数。
+    """
+    counts = Counter(keys)
+    if '' in counts:
+        weights[[i for i, key in enumerate(keys) if not key]] = 0
+        del counts['']
+    if len(counts) == len(keys):
+        return len(counts)
+    duplicated = {key for key, n in counts.items() if n > 1 and key}
+    first = {}
+    best = {}
+    for i in [i for i, key in enumerate(keys) if key in duplicated]:
+        weight = weights[i]
+        if weight <= 0:
+            continue
+        key = keys[i]
+        j = first.setdefault(key, i)
+        if j == i:
+            best[key] = weight
+            continue
+        weights[j] += weight
+        weights[i] = 0
+        if weight > best[key]:
+            best[key] = weight
+            forms[j] = forms[i]
+    return len(counts)
+
+
+def _top_indices(weights, n):
+    """权重最高的 n 个正数权重的下标，与按权重降序稳定排序后截取的结果和顺序一致
+
+    先用 np.partition 找到第 n 大的权重（线性时间），只对不小于它的候选排序。
+    """
+    candidates = np.flatnonzero(weights > 0)
+    if len(candidates) > n:
+        kth = len(candidates) - n
+        threshold = np.partition(weights[candidates], kth)[kth]
+        candidates = candidates[weights[candidates] >= threshold]
+    # 权重降序，同权重按原顺序
+    order = np.lexsort((candidates, -weights[candidates]))[:n]
+    return candidates[order]
+
+
+def prepare_frequencies(word_freq, max_words, buckets=0, merge=True):
+    """排布前的词频预处理，返回 (词频字典, 统计)
+
+    1. 统计输入的词数、总权重、最大/最小权重（不排序）；
+    2. merge 为True且词数超过 max_words 时合并写法不同的同一个词（见 surface_form，大小写不敏感），
+       权重相加，显示权重最大的写法；词数不超过 max_words 时不需要截取，跳过规范化，与不预处理的开销相同；
+    3. 选出权重最高的 max_words 个词（非正数权重跳过），与按权重降序排序后截取的结果和顺序一致；
+    4. buckets 大于0时把权重量化为字号级别（见 quantize_frequencies）。
+    之后的排布和缓存键只处理 max_words 个词，开销与词表大小无关。
+    """
+    words = list(map(str, word_freq))
+    weights = np.fromiter(word_freq.values(), dtype=float, count=len(words))
+    stats = {
+        'count': len(words),
+        'unique': len(words),
+        'total': float(weights.sum()),
+        'max': float(weights.max()) if len(words) else 0,
+        'min': float(weights.min()) if len(words) else 0
+    }
+    if not words or not max_words:
+        return {}, stats
+
+    forms = words
+    if merge and len(words) > max_words:
+        forms = surface_forms(words)
+        keys = '\n'.join(forms).casefold().split('\n')
+        if len(keys) != len(forms):
+            keys = [form.casefold() for form in forms]
+        stats['unique'] = _merge_variants(keys, forms, weights)
+
+    result = {forms[i]: float(weights[i]) for i in _top_indices(weights, max_words)}
+    return quantize_frequencies(result, buckets), stats
+
+
+def _phrase_vocabulary(words, seed=11):
+    """模拟开启短语挖掘后的关键词：长尾分布，含全角、大小写和带空格的重复写法"""
+    import random
+
+    random_state = random.Random(seed)
+    vocabulary = {}
+    for i in range(words):
+        word = f"词{i}" if i % 3 else f"服务 态度{i}"
+        vocabulary[word] = random_state.paretovariate(1.2)
+        if i % 50 == 0:
+            vocabulary[f"{word}".replace(' ', '')] = random_state.paretovariate(1.2)
+        if i % 70 == 0:
+            vocabulary[f"ＷｉＦｉ{i}"] = random_state.paretovariate(1.2)
+            vocabulary[f"wifi{i}"] = random_state.paretovariate(1.2)
+    return vocabulary
+
+
+def benchmark(vocabulary_sizes=(1000, 10000, 50000), max_words=200, repeat=3):
+    """不同词表大小下排布之前的开销：直接使用完整词表与先预处理的对比
+
+    词云：缓存键 + WordCloud 内部的排序截取；交互式数据：原先对完整词表排序后取最大/最小值的做法
+    与 generate_interactive_wordcloud（不排布）。排布本身只处理 max_words 个词，不在此比较。
+    """
+    import time
+
+    from utils.render_cache import render_key
+    from utils.wordcloud_generator import WordCloudGenerator
+
+    generator = WordCloudGenerator()
+    generator.config['max_words'] = max_words
+
+    def timed(func):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return (time.perf_counter() - start) / repeat * 1e3
+
+    def raw_wordcloud(word_freq):
+        render_key(word_freq, generator.config, '基准')
+        sorted(word_freq.items(), key=lambda item: item[1], reverse=True)[:max_words]
+
+    def prepared_wordcloud(word_freq):
+        prepared, _ = generator.prepare_frequencies(word_freq)
+        render_key(prepared, generator.config, '基准')
+        sorted(prepared.items(), key=lambda item: item[1], reverse=True)[:max_words]
+
+    def raw_interactive(word_freq):
+        word_data = [{'name': word, 'value': int(score * 1000)} for word, score in word_freq.items()]
+        word_data.sort(key=lambda x: x['value'], reverse=True)
+        return max([item['value'] for item in word_data]), min([item['value'] for item in word_data])
+
+    results = {}
+    for size in vocabulary_sizes:
+        word_freq = _phrase_vocabulary(size)
+        _, stats = generator.prepare_frequencies(word_freq)
+        results[size] = {
+            'wordcloud_raw_ms': timed(lambda: raw_wordcloud(word_freq)),
+            'wordcloud_prepared_ms': timed(lambda: prepared_wordcloud(word_freq)),
+            'interactive_raw_ms': timed(lambda: raw_interactive(word_freq)),
+            'interactive_prepared_ms': timed(lambda: generator.generate_interactive_wordcloud(word_freq, formats=())),
+            'merged': stats['count'] - stats['unique']
+        }
+    return results
+
+
+if __name__ == "__main__":
+    # 基准测试
+    for size, stats in benchmark().items():
+        print(f"词表 {size:>6}: 词云 {stats['wordcloud_raw_ms']:6.1f} -> {stats['wordcloud_prepared_ms']:5.1f} ms  "
+              f"交互式数据 {stats['interactive_raw_ms']:6.1f} -> {stats['interactive_prepared_ms']:5.1f} ms  "
+              f"合并 {stats['merged']} 个重复写法")
@@ -0,0 +1,281 @@
+import json
+import hashlib
+from functools import lru_cache
+from operator import itemgetter
+from random import Random
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+from wordcloud import WordCloud
+from wordcloud.wordcloud import IntegralOccupancyMap
+
+
+# 沿用上一期位置的字号容差：目标字号与上一期相差不超过该比例时保留原字号和位置
+SIZE_TOLERANCE = 0.15
+
+
+@lru_cache(maxsize=512)
+def _font(font_path, font_size, orientation):
+    """按字体、字号和方向缓存的字体对象（CJK字体文件较大，避免每个词重复加载）"""
+    font = ImageFont.truetype(font_path, font_size)
+    return ImageFont.TransposedFont(font, orientation=orientation)
+
+
+def layout_digest(layout):
+    """排布元数据的哈希，作为增量排布结果缓存键的一部分"""
+    raw = json.dumps(layout, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class IncrementalWordCloud(WordCloud):
+    """以上一期排布为起点的词云
+
+    时间趋势词云的相邻时间段大部分词语相同。给出上一期的排布元数据（layout_metadata 格式）时：
+    1. 按词频计算每个词的目标字号，起始字号沿用上一期，不再用前两个词试排；
+    2. 上一期出现过且字号变化在 SIZE_TOLERANCE 以内的词，先放回原位置（原字号、方向、颜色），
+       位置已被占用时改为重新排布；
+    3. 新词和字号变化较大的词按词频从高到低用原有的随机采样方式排布。
+    沿用的词不做位置搜索，排布更快，相邻两期的图片也保持稳定，可以连成动画。
+    没有上一期排布时与 WordCloud 的结果一致。
+
+    使用mask时可以设置 mask_entry（wordcloud_styles.MaskEntry），直接复制其中预先计算的
+    积分图作为初始占用图，并复用缓存的轮廓，不再每次渲染重新计算。
+    """
+
+    mask_entry = None
+
+    def _occupancy(self):
+        """(高, 宽, 不可绘制区域, 占用图)"""
+        if self.mask is None:
+            return self.height, self.width, None, IntegralOccupancyMap(self.height, self.width, None)
+        height, width = self.mask.shape[:2]
+        entry = self.mask_entry
+        if entry is None or entry.mask is not self.mask:
+            boolean_mask = self._get_bolean_mask(self.mask)
+            return height, width, boolean_mask, IntegralOccupancyMap(height, width, boolean_mask)
+        occupancy = IntegralOccupancyMap(height, width, None)
+        occupancy.integral = entry.integral.copy()
+        return height, width, entry.boolean, occupancy
+
+    def generate_from_frequencies(self, frequencies, max_font_size=None, previous=None):
+        self.reused_ = 0
+        if self.repeat or (not previous and self.mask is None):
+            return super().generate_from_frequencies(frequencies, max_font_size=max_font_size)
+
+        frequencies = sorted(frequencies.items(), key=itemgetter(1), reverse=True)
+        if len(frequencies) <= 0:
+            raise ValueError("We need at least 1 word to plot a word cloud, got 0.")
+        frequencies = frequencies[:self.max_words]
+        max_frequency = float(frequencies[0][1])
+        frequencies = [(word, freq / max_frequency) for word, freq in frequencies]
+
+        random_state = self.random_state if self.random_state is not None else Random()
+        height, width, boolean_mask, occupancy = self._occupancy()
+        img_grey = Image.new("L", (width, height))
+        draw = ImageDraw.Draw(img_grey)
+        placed = {}
+
+        def place(index, word, font_size, orientation, position, color=None):
+            x, y = position
+            font = _font(self.font_path, font_size, orientation)
+            draw.text((y, x), word, fill="white", font=font)
+            if color is None:
+                color = self.color_func(word, font_size=font_size, position=(x, y), orientation=orientation,
+                                        random_state=random_state, font_path=self.font_path)
+            placed[index] = (frequencies[index], font_size, (x, y), orientation, color)
+            img_array = np.asarray(img_grey)
+            if boolean_mask is not None:
+                img_array = img_array + boolean_mask
+            occupancy.update(img_array, x, y)
+
+        rs = self.relative_scaling
+        half_margin = self.margin // 2
+        if previous:
+            targets, deferred = self._reuse_previous(frequencies, previous, max_font_size, draw, img_grey,
+                                                     boolean_mask, place)
+        else:
+            # 与 WordCloud 相同：先用前两个词试排确定起始字号，之后按 relative_scaling 逐词递推
+            targets, deferred = None, range(len(frequencies))
+            font_size = max_font_size or self.max_font_size
+            if font_size is None:
+                if len(frequencies) == 1:
+                    font_size = self.height
+                else:
+                    self.generate_from_frequencies(dict(frequencies[:2]), max_font_size=self.height)
+                    sizes = [item[1] for item in self.layout_]
+                    if not sizes:
+                        raise ValueError("Couldn't find space to draw. Either the Canvas size"
+                                         " is too small or too much of the image is masked out.")
+                    font_size = int(2 * sizes[0] * sizes[1] / (sizes[0] + sizes[1])) if len(sizes) > 1 else sizes[0]
+        self.words_ = dict(frequencies)
+
+        # 第二遍：新词和字号变化较大的词重新排布（与 WordCloud 相同的采样和缩小字号策略）
+        last_freq = 1.
+        for index in deferred:
+            word, freq = frequencies[index]
+            if targets is not None:
+                font_size = targets[index]
+            elif freq == 0:
+                continue
+            elif rs != 0:
+                font_size = int(round((rs * (freq / float(last_freq)) + (1 - rs)) * font_size))
+            orientation = None if random_state.random() < self.prefer_horizontal else Image.ROTATE_90
+            tried_other_orientation = False
+            while font_size >= self.min_font_size:
+                box = draw.textbbox((0, 0), word, font=_font(self.font_path, font_size, orientation), anchor="lt")
+                result = occupancy.sample_position(box[3] + self.margin, box[2] + self.margin, random_state)
+                if result is not None:
+                    break
+                if not tried_other_orientation and self.prefer_horizontal < 1:
+                    orientation = Image.ROTATE_90
+                    tried_other_orientation = True
+                else:
+                    font_size -= self.font_step
+                    orientation = None
+            if font_size < self.min_font_size:
+                break
+            x, y = np.array(result) + half_margin
+            place(index, word, font_size, orientation, (int(x), int(y)))
+            last_freq = freq
+
+        self.layout_ = [placed[index] for index in sorted(placed)]
+        return self
+
+    def _reuse_previous(self, frequencies, previous, max_font_size, draw, img_grey, boolean_mask, place):
+        """计算目标字号并把字号变化不大的词放回上一期的位置，返回 (目标字号, 待重新排布的词序号)"""
+        height, width = img_grey.height, img_grey.width
+
+        # 两期最大词频不同时归一化后的词频整体偏移，用共有词词频比值的中位数消除
+        previous = {item['word']: item for item in previous if item['frequency'] > 0}
+        ratios = sorted(freq / previous[word]['frequency'] for word, freq in frequencies if word in previous)
+        drift = ratios[len(ratios) // 2] if ratios else 1.
+        rs = self.relative_scaling
+
+        # 目标字号：上一期出现过的词按词频变化缩放上一期的实际字号（已包含空间不足时的缩小），
+        # 新词按 relative_scaling 从前一个词的目标字号递推，与 WordCloud 的递推方式一致
+        font_size = max_font_size or max((item['font_size'] for item in previous.values()), default=self.height)
+        last_freq = 1.
+        targets = []
+        for word, freq in frequencies:
+            if freq == 0:
+                targets.append(None)
+                continue
+            item = previous.get(word)
+            if item is not None:
+                font_size = int(round((rs * (freq / item['frequency'] / drift) + (1 - rs)) * item['font_size']))
+            elif rs != 0:
+                font_size = int(round((rs * (freq / float(last_freq)) + (1 - rs)) * font_size))
+            targets.append(font_size)
+            last_freq = freq
+
+        # 第一遍：沿用上一期位置
+        deferred = []
+        half_margin = self.margin // 2
+        for index, target in enumerate(targets):
+            if target is None:
+                continue
+            word = frequencies[index][0]
+            item = previous.get(word)
+            if item is None or abs(item['font_size'] - target) > target * SIZE_TOLERANCE:
+                deferred.append(index)
+                continue
+            orientation = item['orientation']
+            box = draw.textbbox((0, 0), word, font=_font(self.font_path, item['font_size'], orientation), anchor="lt")
+            x, y = item['position']
+            top, left = x - half_margin, y - half_margin
+            bottom, right = top + box[3] + self.margin, left + box[2] + self.margin
+            if top < 0 or left < 0 or bottom >= height or right >= width:
+                deferred.append(index)
+                continue
+            region = np.asarray(img_grey)[top:bottom, left:right]
+            if region.any() or (boolean_mask is not None and boolean_mask[top:bottom, left:right].any()):
+                deferred.append(index)
+                continue
+            place(index, word, item['font_size'], orientation, (x, y), item['color'])
+            self.reused_ += 1
+        return targets, deferred
+
+    def to_image(self):
+        self._check_generated()
+        if self.mask is not None:
+            width, height = self.mask.shape[1], self.mask.shape[0]
+        else:
+            width, height = self.width, self.height
+        img = Image.new(self.mode, (int(width * self.scale), int(height * self.scale)), self.background_color)
+        draw = ImageDraw.Draw(img)
+        for (word, count), font_size, position, orientation, color in self.layout_:
+            font = _font(self.font_path, int(font_size * self.scale), orientation)
+            draw.text((int(position[1] * self.scale), int(position[0] * self.scale)), word, fill=color, font=font)
+        return self._draw_contour(img=img)
+
+    def _draw_contour(self, img):
+        entry = self.mask_entry
+        if self.mask is None or self.contour_width == 0 or entry is None or entry.mask is not self.mask:
+            return super()._draw_contour(img)
+        contour = entry.contour(img.size, self.contour_width)
+        ret = np.array(img) * np.invert(contour)
+        if self.contour_color != 'black':
+            color = Image.new(img.mode, img.size, self.contour_color)
+            ret += np.array(color) * contour
+        return Image.fromarray(ret)
+
+
+def _drifting_periods(periods, words, churn=0.15, seed=7):
+    """模拟逐月的关键词：每期保留上一期大部分词语（词频小幅波动），替换 churn 比例的词"""
+    random_state = Random(seed)
+    vocabulary = [f"词{i}" for i in range(words * 4)]
+    current = {word: random_state.paretovariate(1.5) for word in random_state.sample(vocabulary, words)}
+    result = []
+    for _ in range(periods):
+        result.append(dict(current))
+        current = {word: freq * random_state.uniform(0.9, 1.1) for word, freq in current.items()}
+        for word in random_state.sample(sorted(current), int(words * churn)):
+            del current[word]
+        while len(current) < words:
+            word = random_state.choice(vocabulary)
+            current.setdefault(word, random_state.paretovariate(1.5))
+    return result
+
+
+def benchmark(periods=24, words=150):
+    """24期趋势词云：各期独立排布与增量排布的总耗时，以及相邻两期共有词语保持原位的比例"""
+    import time
+
+    from utils.wordcloud_generator import WordCloudGenerator
+
+    generator = WordCloudGenerator()
+    series = _drifting_periods(periods, words)
+    generator.render_wordcloud(series[0], '预热')
+
+    results = {}
+    for mode in ('independent', 'incremental'):
+        previous = None
+        layouts = []
+        start = time.perf_counter()
+        for i, word_freq in enumerate(series):
+            _, layout = generator.render_wordcloud(word_freq, f"第{i + 1}期",
+                                                   previous=previous if mode == 'incremental' else None)
+            previous = layout
+            layouts.append(layout)
+        elapsed = time.perf_counter() - start
+
+        stable = []
+        for before, after in zip(layouts, layouts[1:]):
+            positions = {item['word']: item['position'] for item in before}
+            shared = [item for item in after if item['word'] in positions]
+            if shared:
+                stable.append(sum(item['position'] == positions[item['word']] for item in shared) / len(shared))
+        results[mode] = {
+            'total_ms': elapsed * 1e3,
+            'per_period_ms': elapsed / periods * 1e3,
+            'placed': sum(len(layout) for layout in layouts) / periods,
+            'stable': sum(stable) / len(stable) if stable else 0.0
+        }
+    return results
+
+
+if __name__ == "__main__":
+    # 基准测试
+    for mode, stats in benchmark().items():
+        print(f"{mode:<12} 总计 {stats['total_ms']:.0f} ms  每期 {stats['per_period_ms']:.0f} ms  "
+              f"平均排布 {stats['placed']:.0f} 词  共有词位置不变 {stats['stable']:.0%}")
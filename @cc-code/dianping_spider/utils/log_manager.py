@@ -0,0 +1,249 @@
+import os
+import sys
+import json
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+from config import LOG_CONFIG
+
+
+DEFAULT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+class JsonFormatter(logging.Formatter):
+    """结构化JSON日志格式（每行一条记录）"""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'name': record.name,
+            'level': record.levelname,
+            'message': record.getMessage(),
+            'module': record.module,
+            'line': record.lineno,
+            'thread': record.threadName,
+            'process': record.process,
+        }
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _RoutingHandler(logging.Handler):
+    """在监听线程中把记录分发到对应的日志文件和控制台"""
+
+    def __init__(self):
+        super().__init__()
+        self.file_handlers = {}
+        self.console_handler = logging.StreamHandler(sys.stderr)
+        self.console_handler.setFormatter(logging.Formatter(DEFAULT_FORMAT))
+        self.text_formatter = logging.Formatter(DEFAULT_FORMAT)
+        self.json_formatter = JsonFormatter()
+
+    def _file_handler(self, log_file, json_format):
+        key = (os.path.abspath(log_file), json_format)
+        handler = self.file_handlers.get(key)
+        if handler is None:
+            handler = logging.FileHandler(log_file, encoding='utf-8')
+            handler.setFormatter(self.json_formatter if json_format else self.text_formatter)
+            self.file_handlers[key] = handler
+        return handler
+
+    def emit(self, record):
+        try:
+            log_file = getattr(record, 'log_file', None)
+            if log_file:
+                self._file_handler(log_file, getattr(record, 'json_format', False)).handle(record)
+            if getattr(record, 'console', True):
+                self.console_handler.handle(record)
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        for handler in self.file_handlers.values():
+            handler.close()
+        self.file_handlers.clear()
+        self.console_handler.flush()
+        super().close()
+
+
+class _RoutedQueueHandler(QueueHandler):
+    """入队处理器：调用线程只合并参数并打上路由信息，格式化和I/O留给监听线程"""
+
+    _exc_formatter = logging.Formatter()
+
+    def __init__(self, log_queue, log_file, json_format, console):
+        super().__init__(log_queue)
+        self.log_file = log_file
+        self.json_format = json_format
+        self.console = console
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self._exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        record.log_file = self.log_file
+        record.json_format = self.json_format
+        record.console = self.console
+        return record
+
+
+class LogManager:
+    """队列化日志管理器
+
+    所有日志器共享一个进程内队列，调用方只做一次入队，
+    文件和控制台I/O由后台 QueueListener 线程完成。
+    同名日志器重复配置是幂等的，不会重复添加处理器。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._configured = {}
+        self._handlers = {}
+        self._queue = queue.SimpleQueue()
+        self._listener = None
+        self._router = None
+        self._pid = None
+
+    def _ensure_listener(self):
+        """按需启动监听线程"""
+        if self._listener is not None and self._pid == os.getpid():
+            return
+        self._router = _RoutingHandler()
+        self._listener = QueueListener(self._queue, self._router, respect_handler_level=False)
+        self._listener.start()
+        self._pid = os.getpid()
+
+    def _after_fork(self):
+        """fork后的子进程：换用新队列并重启监听线程
+
+        父进程队列中尚未写出的记录不会在子进程重复写入。
+        """
+        self._lock = threading.Lock()
+        self._queue = queue.SimpleQueue()
+        for handler in self._handlers.values():
+            handler.queue = self._queue
+        self._listener = None
+        if self._handlers:
+            self._ensure_listener()
+
+    def get_logger(self, name, log_file=None, level=None, json_format=None, console=None):
+        """获取（必要时配置）日志器"""
+        log_file = log_file if log_file is not None else LOG_CONFIG['LOG_FILE']
+        level = level if level is not None else LOG_CONFIG['LEVEL']
+        json_format = json_format if json_format is not None else LOG_CONFIG['JSON_FORMAT']
+        console = console if console is not None else LOG_CONFIG['CONSOLE']
+        if isinstance(level, str):
+            level = logging.getLevelName(level.upper())
+
+        settings = (log_file, level, json_format, console)
+        logger = logging.getLogger(name)
+
+        with self._lock:
+            self._ensure_listener()
+            if self._configured.get(name) == settings:
+                return logger
+
+            for handler in logger.handlers[:]:
+                logger.removeHandler(handler)
+
+            queue_handler = _RoutedQueueHandler(self._queue, log_file, json_format, console)
+            logger.addHandler(queue_handler)
+            self._handlers[name] = queue_handler
+            logger.setLevel(level)
+            # 避免与根日志器（例如basicConfig）重复输出
+            logger.propagate = False
+
+            self._configured[name] = settings
+
+        return logger
+
+    def flush(self):
+        """等待队列中的日志写完"""
+        with self._lock:
+            if self._listener is None or self._pid != os.getpid():
+                return
+            self._listener.stop()
+            self._listener.start()
+
+    def shutdown(self):
+        """停止监听线程并关闭文件"""
+        with self._lock:
+            if self._listener is not None and self._pid == os.getpid():
+                self._listener.stop()
+                self._router.close()
+            self._listener = None
+            self._configured.clear()
+
+
+log_manager = LogManager()
+atexit.register(log_manager.shutdown)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=log_manager._after_fork)
+
+
+def get_logger(name, log_file=None, level=None, json_format=None, console=None):
+    """获取日志器"""
+    return log_manager.get_logger(name, log_file, level, json_format, console)
+
+
+def benchmark(calls=20000):
+    """对比同步文件处理器与队列管道的单次日志调用开销"""
+    import time
+    import tempfile
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        devnull = open(os.devnull, 'w')
+
+        # 原实现：FileHandler + StreamHandler，调用线程同步写文件
+        sync_logger = logging.getLogger('benchmark.sync')
+        sync_logger.propagate = False
+        sync_logger.setLevel(logging.INFO)
+        formatter = logging.Formatter(DEFAULT_FORMAT)
+        file_handler = logging.FileHandler(os.path.join(tmp_dir, 'sync.log'), encoding='utf-8')
+        stream_handler = logging.StreamHandler(devnull)
+        for handler in (file_handler, stream_handler):
+            handler.setFormatter(formatter)
+            sync_logger.addHandler(handler)
+
+        start = time.perf_counter()
+        for i in range(calls):
+            sync_logger.info(f"分析第 {i} 条评论")
+        results['sync_us'] = (time.perf_counter() - start) / calls * 1e6
+        for handler in (file_handler, stream_handler):
+            sync_logger.removeHandler(handler)
+            handler.close()
+
+        # 队列管道
+        manager = LogManager()
+        queued_logger = manager.get_logger('benchmark.queue', os.path.join(tmp_dir, 'queue.log'),
+                                           logging.INFO, False, False)
+        start = time.perf_counter()
+        for i in range(calls):
+            queued_logger.info(f"分析第 {i} 条评论")
+        results['queue_us'] = (time.perf_counter() - start) / calls * 1e6
+        manager.shutdown()
+
+        # 幂等配置：重复调用的开销
+        start = time.perf_counter()
+        for _ in range(calls):
+            log_manager.get_logger('benchmark.setup')
+        results['setup_us'] = (time.perf_counter() - start) / calls * 1e6
+
+        devnull.close()
+
+    return results
+
+
+if __name__ == "__main__":
+    # 基准测试
+    stats = benchmark()
+    print(f"同步处理器: {stats['sync_us']:.2f} us/次")
+    print(f"队列管道:   {stats['queue_us']:.2f} us/次")
+    print(f"重复配置:   {stats['setup_us']:.2f} us/次")
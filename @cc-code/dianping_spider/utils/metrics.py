@@ -0,0 +1,379 @@
+import math
+import time
+import bisect
+import threading
+
+
+# 默认耗时分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# 响应体大小分桶（字节）
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if value == -math.inf:
+        return '-Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    """指标基类：按标签值元组保存各时间序列"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        try:
+            if len(labels) == len(self.labelnames):
+                return tuple([str(labels[name]) for name in self.labelnames])
+        except KeyError:
+            pass
+        raise ValueError(f"指标 {self.name} 需要标签 {self.labelnames}，实际为 {tuple(labels)}")
+
+    def labels(self, **labels):
+        """绑定标签值，热点路径上重复记录时省去每次拼装标签"""
+        return _Bound(self, self._key(labels))
+
+    def definition(self):
+        return {'kind': self.kind, 'documentation': self.documentation, 'labelnames': self.labelnames}
+
+    def samples(self):
+        """当前各时间序列的值 {标签值元组: 值}"""
+        with self._lock:
+            return dict(self._values)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in sorted(self.samples().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """只增计数器"""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        self._inc(self._key(labels), amount)
+
+    def _inc(self, key, amount):
+        if amount < 0:
+            raise ValueError("计数器只能增加")
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def drain(self):
+        """取出并清零当前值（子进程回传增量用）"""
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def merge(self, values):
+        with self._lock:
+            for key, amount in values.items():
+                self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """可增可减的瞬时值，也可以在采集时由回调函数计算"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._function = None
+
+    def set(self, value, **labels):
+        self._set(self._key(labels), value)
+
+    def _set(self, key, value):
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        self._inc(self._key(labels), amount)
+
+    def _inc(self, key, amount):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self._inc(self._key(labels), -amount)
+
+    def set_function(self, function):
+        """采集时调用 function()：无标签时返回数值，有标签时返回 {标签值元组: 值}"""
+        self._function = function
+
+    def samples(self):
+        function = self._function
+        if function is None:
+            return super().samples()
+        value = function()
+        if not self.labelnames:
+            return {(): value}
+        return {tuple(str(v) for v in key): v for key, v in value.items()}
+
+
+class _Timer:
+    """计时上下文管理器，退出时把耗时记入直方图"""
+
+    __slots__ = ('histogram', 'key', 'start')
+
+    def __init__(self, histogram, key):
+        self.histogram = histogram
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram._observe(self.key, time.perf_counter() - self.start)
+
+
+class Histogram(_Metric):
+    """分桶直方图，每个时间序列保存 [各桶计数, 总和, 次数]"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets if b != math.inf))
+
+    def definition(self):
+        return dict(super().definition(), buckets=self.buckets)
+
+    def observe(self, value, **labels):
+        self._observe(self._key(labels), value)
+
+    def _observe(self, key, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, **labels):
+        """with histogram.time(stage='x'): ... 记录代码块耗时"""
+        return _Timer(self, self._key(labels))
+
+    def samples(self):
+        with self._lock:
+            return {key: [list(counts), total, count] for key, (counts, total, count) in self._values.items()}
+
+    def drain(self):
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def merge(self, values):
+        with self._lock:
+            for key, (counts, total, count) in values.items():
+                series = self._values.get(key)
+                if series is None:
+                    series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                for i, n in enumerate(counts):
+                    series[0][i] += n
+                series[1] += total
+                series[2] += count
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        bounds = self.buckets + (math.inf,)
+        for key, (counts, total, count) in sorted(self.samples().items()):
+            cumulative = 0
+            for bound, n in zip(bounds, counts):
+                cumulative += n
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class _Bound:
+    """绑定了标签值的指标"""
+
+    __slots__ = ('metric', 'key')
+
+    def __init__(self, metric, key):
+        self.metric = metric
+        self.key = key
+
+    def inc(self, amount=1):
+        self.metric._inc(self.key, amount)
+
+    def dec(self, amount=1):
+        self.metric._inc(self.key, -amount)
+
+    def set(self, value):
+        self.metric._set(self.key, value)
+
+    def observe(self, value):
+        self.metric._observe(self.key, value)
+
+    def time(self):
+        return _Timer(self.metric, self.key)
+
+
+METRIC_TYPES = {cls.kind: cls for cls in (Counter, Gauge, Histogram)}
+
+
+class Registry:
+    """进程内指标注册表
+
+    各模块在导入时声明指标（同名重复声明返回同一对象），记录时只按标签取值
+    并在指标自己的锁内更新，不做I/O；采集时生成Prometheus文本格式。
+    进程池子进程中记录的计数器和直方图通过 drain()/merge() 把增量汇总到主进程。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def register(self, kind, name, documentation, labelnames=(), **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = METRIC_TYPES[kind](name, documentation, labelnames, **kwargs)
+            elif metric.kind != kind or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"指标 {name} 已注册为 {metric.kind}{metric.labelnames}")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register('counter', name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register('gauge', name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register('histogram', name, documentation, labelnames, buckets=buckets)
+
+    def get(self, name):
+        with self._lock:
+            return self._metrics.get(name)
+
+    def render(self):
+        """Prometheus文本格式（version 0.0.4）"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def drain(self):
+        """取出计数器和直方图的增量（可序列化，供子进程回传）"""
+        with self._lock:
+            metrics = [m for m in self._metrics.values() if m.kind != 'gauge']
+        deltas = []
+        for metric in metrics:
+            values = metric.drain()
+            if values:
+                deltas.append((metric.name, metric.definition(), values))
+        return deltas
+
+    def merge(self, deltas):
+        """合并其他进程的增量，指标未在本进程声明时按定义创建"""
+        for name, definition, values in deltas:
+            definition = dict(definition)
+            kind = definition.pop('kind')
+            metric = self.register(kind, name, definition.pop('documentation'),
+                                   definition.pop('labelnames'), **definition)
+            metric.merge(values)
+
+
+# 全局注册表
+registry = Registry()
+counter = registry.counter
+gauge = registry.gauge
+histogram = registry.histogram
+
+
+def benchmark(iterations=200000, series=200):
+    """记录开销与采集开销"""
+    bench = Registry()
+    calls = bench.counter('bench_calls_total', '调用次数', ['type'])
+    latency = bench.histogram('bench_latency_seconds', '耗时', ['stage'])
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        pass
+    baseline = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        calls.inc(type='analyze')
+    counter_ns = (time.perf_counter() - start - baseline) / iterations * 1e9
+
+    start = time.perf_counter()
+    for i in range(iterations):
+        latency.observe(i * 1e-6, stage='keywords')
+    histogram_ns = (time.perf_counter() - start - baseline) / iterations * 1e9
+
+    bound = calls.labels(type='analyze')
+    start = time.perf_counter()
+    for _ in range(iterations):
+        bound.inc()
+    bound_ns = (time.perf_counter() - start - baseline) / iterations * 1e9
+
+    start = time.perf_counter()
+    for _ in range(iterations // 10):
+        with latency.time(stage='keywords'):
+            pass
+    timer_ns = (time.perf_counter() - start) / (iterations // 10) * 1e9
+
+    for i in range(series):
+        latency.observe(0.1, stage=f"stage_{i}")
+    start = time.perf_counter()
+    text = bench.render()
+    render_ms = (time.perf_counter() - start) * 1e3
+
+    return {
+        'counter_ns': counter_ns,
+        'histogram_ns': histogram_ns,
+        'bound_ns': bound_ns,
+        'timer_ns': timer_ns,
+        'series': series + 1,
+        'render_ms': render_ms,
+        'render_bytes': len(text)
+    }
+
+
+if __name__ == "__main__":
+    # 基准测试
+    stats = benchmark()
+    print(f"Counter.inc:         {stats['counter_ns']:.0f} ns/次")
+    print(f"Histogram.observe:   {stats['histogram_ns']:.0f} ns/次")
+    print(f"labels().inc:        {stats['bound_ns']:.0f} ns/次")
+    print(f"Histogram.time:      {stats['timer_ns']:.0f} ns/次")
+    print(f"采集 {stats['series']} 个直方图序列: {stats['render_ms']:.2f} ms, {stats['render_bytes'] / 1024:.1f} KB")
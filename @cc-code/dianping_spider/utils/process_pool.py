@@ -0,0 +1,328 @@
+import queue
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from utils import metrics
+from utils.data_utils import Logger, ProgressReporter
+from utils.task_pool import TaskCancelled
+
+
+# 子进程状态（由初始化函数设置）
+_child = {}
+
+# 子进程结束一个任务后发送的进度结束标记
+_DONE = None
+
+# 子进程回传指标增量时使用的任务ID
+_METRICS = '__metrics__'
+
+
+def _init_child(events, flags, initializer, initargs):
+    """子进程初始化：保存通信对象并预热任务组件"""
+    _child['events'] = events
+    _child['flags'] = flags
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def in_child():
+    """当前进程是否为任务进程池的子进程"""
+    return bool(_child)
+
+
+def _warmup():
+    """空任务：促使执行器提前启动子进程"""
+    return True
+
+
+def _run_in_child(func, args, task_id, slot, interval):
+    """在子进程中执行任务，进度经队列发回父进程，取消标志位经共享内存读取"""
+    events = _child['events']
+    flags = _child['flags']
+
+    def publish(snapshot):
+        events.put((task_id, snapshot))
+
+    def check(*_):
+        if flags[slot]:
+            raise TaskCancelled("任务已取消")
+
+    try:
+        check()
+        progress = ProgressReporter(interval=interval, sinks=[publish, check])
+        return func(*args, progress=progress)
+    finally:
+        # 子进程中记录的指标增量汇总到主进程的注册表
+        deltas = metrics.registry.drain()
+        if deltas:
+            events.put((_METRICS, deltas))
+        events.put((task_id, _DONE))
+
+
+class ProcessTaskPool:
+    """CPU密集型任务的进程池
+
+    子进程使用spawn方式启动（避免fork多线程的Flask进程），由 initializer 预热
+    分词、字体等组件，之后每个任务只传递参数，结果应是文件引用等小对象。
+    进度通过队列回传给父进程；取消/超时由父进程等待线程检查令牌，
+    通过共享内存标志位通知子进程在下一个进度检查点停止。
+    """
+
+    def __init__(self, workers=2, slots=8, initializer=None, initargs=(), poll_interval=0.2,
+                 name='process-pool'):
+        """
+        workers: 子进程数
+        slots: 同时执行（含排队）的任务上限，每个任务占用一个取消标志位
+        """
+        self.workers = workers
+        self.slots = slots
+        self.initializer = initializer
+        self.initargs = initargs
+        self.poll_interval = poll_interval
+        self.name = name
+        self.logger = Logger.setup(__name__)
+
+        self._lock = threading.Lock()
+        self._context = multiprocessing.get_context('spawn')
+        self._executor = None
+        self._events = None
+        self._flags = None
+        self._free_slots = None
+        self._listeners = {}
+        self._drained = {}
+        self._drain_thread = None
+
+    @property
+    def running(self):
+        return self._executor is not None
+
+    def start(self):
+        """启动子进程与进度转发线程"""
+        with self._lock:
+            if self._executor is not None:
+                return
+            self._events = self._context.Queue()
+            self._flags = self._context.Array('b', self.slots, lock=False)
+            self._free_slots = queue.Queue()
+            for slot in range(self.slots):
+                self._free_slots.put(slot)
+            self._executor = self._create_executor()
+
+            self._drain_thread = threading.Thread(
+                target=self._drain, args=(self._events,), name=f"{self.name}-events", daemon=True
+            )
+            self._drain_thread.start()
+
+        # 提前启动并预热子进程，首个任务不需要等待模型加载
+        self._prewarm(self._executor)
+        self.logger.info(f"进程池已启动: {self.workers} 个子进程")
+
+    def _prewarm(self, executor):
+        """提交空任务促使执行器启动全部子进程（执行器已停止或崩溃时忽略）"""
+        try:
+            for _ in range(self.workers):
+                executor.submit(_warmup)
+        except RuntimeError:
+            pass
+
+    def _create_executor(self):
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=self._context,
+            initializer=_init_child,
+            initargs=(self._events, self._flags, self.initializer, self.initargs)
+        )
+
+    def _drain(self, events):
+        """转发子进程发回的进度"""
+        while True:
+            item = events.get()
+            if item is _DONE:
+                return
+            task_id, snapshot = item
+            if task_id == _METRICS:
+                metrics.registry.merge(snapshot)
+                continue
+            if snapshot is _DONE:
+                done = self._drained.get(task_id)
+                if done is not None:
+                    done.set()
+                continue
+            listener = self._listeners.get(task_id)
+            if listener is not None:
+                try:
+                    listener(snapshot)
+                except Exception as e:
+                    self.logger.error(f"转发任务进度失败: {task_id}, {e}")
+
+    def run(self, func, args, task_id, token, on_progress=None, interval=0.5):
+        """在子进程中执行 func(*args, progress=...) 并等待结果
+
+        func 必须是可按模块路径导入的顶层函数。token 被取消或超时时，
+        通知子进程停止并抛出对应的 TaskCancelled/TaskTimeout。
+        """
+        if self._executor is None:
+            raise RuntimeError("进程池未启动")
+
+        slot = self._free_slots.get()
+        self._flags[slot] = 0
+        drained = threading.Event()
+        self._drained[task_id] = drained
+        if on_progress is not None:
+            self._listeners[task_id] = on_progress
+
+        try:
+            executor, future = self._submit(_run_in_child, func, args, task_id, slot, interval)
+
+            while True:
+                try:
+                    result = future.result(timeout=self.poll_interval)
+                    break
+                except FutureTimeout:
+                    pass
+                except BrokenProcessPool:
+                    self._restart(executor)
+                    raise RuntimeError("任务子进程异常退出")
+
+                try:
+                    token.check()
+                except TaskCancelled:
+                    # 通知子进程在下一个检查点停止，等它释放后再抛出原因
+                    self._flags[slot] = 1
+                    if not future.cancel():
+                        wait([future])
+                    raise
+
+            # 等待进度转发完，避免完成后再收到旧进度
+            drained.wait(5)
+            return result
+
+        finally:
+            self._listeners.pop(task_id, None)
+            self._drained.pop(task_id, None)
+            self._free_slots.put(slot)
+
+    def stats(self):
+        """子进程数、忙碌子进程数与等待子进程的任务数"""
+        tasks = 0 if self._free_slots is None else self.slots - self._free_slots.qsize()
+        return {
+            'workers': self.workers,
+            'busy': min(tasks, self.workers),
+            'queued': max(tasks - self.workers, 0)
+        }
+
+    def _submit(self, *args):
+        """提交到当前执行器，返回 (执行器, future)
+
+        执行器已崩溃时重建后重试一次，仍然失败（或进程池已停止）时抛出 RuntimeError。
+        """
+        for attempt in range(2):
+            executor = self._executor
+            if executor is None:
+                raise RuntimeError("进程池已停止")
+            try:
+                return executor, executor.submit(*args)
+            except BrokenProcessPool:
+                self._restart(executor)
+        raise RuntimeError("任务子进程异常退出")
+
+    def _restart(self, broken):
+        """子进程崩溃后重建执行器
+
+        同一次崩溃会使该执行器上所有等待中的任务都调用到这里，只有当前执行器仍是 broken 时才重建，
+        其他线程已经重建（或进程池已停止）时什么也不做，不会关掉刚重建的执行器。
+        """
+        with self._lock:
+            if broken is None or self._executor is not broken:
+                return
+            self._executor = executor = self._create_executor()
+        self.logger.error("任务子进程异常退出，已重建进程池")
+        broken.shutdown(wait=False, cancel_futures=True)
+        self._prewarm(executor)
+
+    def stop(self):
+        """停止子进程"""
+        with self._lock:
+            executor = self._executor
+            if executor is None:
+                return
+            self._executor = None
+        executor.shutdown(wait=True, cancel_futures=True)
+        self._events.put(_DONE)
+        self._drain_thread.join(5)
+        self.logger.info("进程池已停止")
+
+
+def _cpu_work(rounds, progress=None):
+    """基准测试用的纯Python CPU密集计算（持有GIL）"""
+    total = 0
+    for i in range(rounds):
+        total += sum(j * j for j in range(2000))
+        if progress is not None and i % 50 == 0:
+            progress.update(message=f"{i}/{rounds}")
+    return total
+
+
+def benchmark(jobs=4, rounds=1500, probes=200):
+    """CPU密集任务在线程与进程池中执行时，主进程轻量请求的延迟对比"""
+    import json
+    import time
+    import statistics
+
+    from utils.task_pool import CancelToken
+
+    payload = {'comments': [{'content': '火锅很好吃', 'rating': 5}] * 200}
+
+    def probe_latencies(stop):
+        # 模拟Web请求：每10ms到达一个请求，延迟包括等待GIL/CPU的时间和序列化小响应的时间
+        latencies = []
+        while not stop.is_set() and len(latencies) < probes:
+            arrival = time.perf_counter() + 0.01
+            time.sleep(0.01)
+            json.dumps(payload, ensure_ascii=False)
+            latencies.append(time.perf_counter() - arrival)
+        return latencies
+
+    def summarize(latencies):
+        latencies = sorted(latencies)
+        return {
+            'p50_ms': statistics.median(latencies) * 1e3,
+            'p99_ms': latencies[int(len(latencies) * 0.99) - 1] * 1e3
+        }
+
+    results = {'idle': summarize(probe_latencies(threading.Event()))}
+
+    # 线程：与请求处理共享GIL
+    stop = threading.Event()
+    threads = [threading.Thread(target=_cpu_work, args=(rounds,)) for _ in range(jobs)]
+    for thread in threads:
+        thread.start()
+    results['threads'] = summarize(probe_latencies(stop))
+    for thread in threads:
+        thread.join()
+
+    # 进程池：主进程只等待结果
+    pool = ProcessTaskPool(workers=jobs, slots=jobs, name='bench')
+    pool.start()
+    # 等待子进程启动完成，只比较执行阶段
+    pool.run(_cpu_work, (1,), 'warmup', CancelToken())
+    runners = [
+        threading.Thread(target=pool.run, args=(_cpu_work, (rounds,), f"bench_{i}", CancelToken()))
+        for i in range(jobs)
+    ]
+    for runner in runners:
+        runner.start()
+    results['process_pool'] = summarize(probe_latencies(stop))
+    for runner in runners:
+        runner.join()
+    pool.stop()
+
+    return results
+
+
+if __name__ == "__main__":
+    # 基准测试
+    for mode, stats in benchmark().items():
+        print(f"{mode:<13} p50={stats['p50_ms']:.3f}ms  p99={stats['p99_ms']:.3f}ms")
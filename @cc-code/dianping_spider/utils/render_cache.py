@@ -0,0 +1,264 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+from utils import storage, metrics
+from utils.data_utils import Logger
+
+
+# 渲染代码（画布尺寸、dpi、字号比例等）变化时递增，使旧缓存失效
+RENDER_VERSION = 1
+
+# 其他进程（进程池子进程、Web进程）也会写入同一缓存目录，累计的大小和项数最多每隔这么多秒重新扫描一次
+SYNC_INTERVAL = 60
+# 淘汰时删除到上限的比例
+EVICT_TARGET = 0.9
+
+RENDER_CACHE_REQUESTS = metrics.counter(
+    'wordcloud_render_cache_requests_total', '词云渲染缓存查找次数', ['result']
+)
+
+
+def normalize_frequencies(word_freq, max_words):
+    """与 WordCloud.generate_from_frequencies 一致地排序、截取并归一化词频
+
+    只有影响排布结果的部分参与缓存键：按词频降序（同频保持原顺序）取前 max_words 个，
+    最大词频归一为1。整体按比例缩放的词频得到相同的键。
+    """
+    items = sorted(word_freq.items(), key=lambda item: item[1], reverse=True)[:max_words]
+    if not items:
+        return []
+    top = float(items[0][1]) or 1.0
+    return [[str(word), round(float(freq) / top, 9)] for word, freq in items]
+
+
+def font_identity(font_path):
+    """字体文件标识（路径、大小、修改时间），字体被替换后缓存失效"""
+    if not font_path:
+        return None
+    try:
+        st = os.stat(font_path)
+    except OSError:
+        return [font_path]
+    return [font_path, st.st_size, st.st_mtime_ns]
+
+
+def render_key(word_freq, config, title, **options):
+    """渲染缓存键：归一化词频、渲染配置、字体和标题的哈希"""
+    payload = {
+        'version': RENDER_VERSION,
+        'frequencies': normalize_frequencies(word_freq, config.get('max_words', 200)),
+        'config': {k: config.get(k) for k in ('width', 'height', 'max_words', 'background_color', 'colormap')},
+        'font': font_identity(config.get('font_path')),
+        'title': title,
+        'options': options
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class RenderCache:
+    """词云渲染结果的磁盘缓存（内容寻址）
+
+    目录结构:
+        <cache_dir>/<键前2位>/<键>.png   # 渲染好的图片
+        <cache_dir>/<键前2位>/<键>.json  # 排布元数据（词语、字号、位置、方向、颜色）
+
+    命中时更新图片的mtime作为最近使用时间，写入新结果后按总大小淘汰最久未用的项。
+    不维护内存索引，进程池的多个子进程可以共用同一个缓存目录。
+    总大小和项数在首次使用时扫描一次，之后随写入和淘汰累计，超过上限时才扫描目录淘汰；
+    其他进程的写入在距上次扫描超过 SYNC_INTERVAL 后重新扫描时计入。
+    """
+
+    def __init__(self, cache_dir='data/.render_cache', max_bytes=256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.logger = Logger.setup(__name__)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = None
+        self._bytes = None
+        self._synced = 0
+
+    def _paths(self, key):
+        directory = os.path.join(self.cache_dir, key[:2])
+        return os.path.join(directory, f"{key}.png"), os.path.join(directory, f"{key}.json")
+
+    def contains(self, key):
+        """缓存项是否存在（不计入命中统计）"""
+        return os.path.exists(self._paths(key)[0])
+
+    def get(self, key):
+        """返回 (PNG字节, 元数据)，未命中返回None"""
+        png_path, meta_path = self._paths(key)
+        try:
+            with open(png_path, 'rb') as f:
+                image = f.read()
+            meta = storage.load_json(meta_path)
+            os.utime(png_path)
+        except (OSError, ValueError):
+            self.misses += 1
+            RENDER_CACHE_REQUESTS.inc(result='miss')
+            return None
+        self.hits += 1
+        RENDER_CACHE_REQUESTS.inc(result='hit')
+        return image, meta
+
+    def put(self, key, image, meta):
+        """写入渲染结果（先写元数据，图片存在即表示缓存项完整）"""
+        png_path, meta_path = self._paths(key)
+        try:
+            replaced = os.path.getsize(png_path) + os.path.getsize(meta_path)
+        except OSError:
+            replaced = None
+        try:
+            storage.dump_json(meta, meta_path, indent=None)
+            with storage.atomic_write(png_path, codec='raw') as f:
+                f.write(image)
+            added = len(image) + os.path.getsize(meta_path)
+        except OSError as e:
+            self.logger.warning(f"写入词云渲染缓存失败: {e}")
+            return
+        with self._lock:
+            if self._bytes is not None:
+                self._bytes += added - (replaced or 0)
+                self._entries += replaced is None
+        if self._totals()[1] > self.max_bytes:
+            self.evict()
+
+    def _totals(self):
+        """(项数, 总字节数)，首次使用或距上次扫描超过 SYNC_INTERVAL 时扫描目录"""
+        with self._lock:
+            if self._bytes is not None and time.monotonic() - self._synced < SYNC_INTERVAL:
+                return self._entries, self._bytes
+        entries = self._scan()
+        return self._set_totals(len(entries), sum(entry[1] for entry in entries))
+
+    def _set_totals(self, count, total):
+        with self._lock:
+            self._entries, self._bytes = count, total
+            self._synced = time.monotonic()
+        return count, total
+
+    def _scan(self):
+        """[(最近使用时间, 大小, 图片路径, 元数据路径)]"""
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for prefix in os.scandir(self.cache_dir):
+            if not prefix.is_dir():
+                continue
+            for item in os.scandir(prefix.path):
+                if not item.name.endswith('.png'):
+                    continue
+                meta_path = item.path[:-len('.png')] + '.json'
+                try:
+                    st = item.stat()
+                    size = st.st_size + os.path.getsize(meta_path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, size, item.path, meta_path))
+        return entries
+
+    def evict(self):
+        """总大小超过 max_bytes 时删除最久未使用的项，返回删除的项数
+
+        删除到 max_bytes 的90%，之后的写入不会每次都超过上限而重新扫描目录。
+        """
+        entries = self._scan()
+        total = sum(entry[1] for entry in entries)
+        if total <= self.max_bytes:
+            self._set_totals(len(entries), total)
+            return 0
+        removed = 0
+        for _, size, png_path, meta_path in sorted(entries):
+            if total <= self.max_bytes * EVICT_TARGET:
+                break
+            for path in (png_path, meta_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total -= size
+            removed += 1
+        self._set_totals(len(entries) - removed, total)
+        return removed
+
+    def clear(self):
+        for _, _, png_path, meta_path in self._scan():
+            for path in (png_path, meta_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        self._set_totals(0, 0)
+
+    def stats(self):
+        count, total = self._totals()
+        return {
+            'entries': count,
+            'bytes': total,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+
+def layout_metadata(wordcloud):
+    """WordCloud排布结果转为可序列化的元数据"""
+    return [
+        {
+            'word': word,
+            'frequency': round(float(freq), 6),
+            'font_size': int(font_size),
+            'position': [int(position[0]), int(position[1])],
+            'orientation': None if orientation is None else int(orientation),
+            'color': color
+        }
+        for (word, freq), font_size, position, orientation, color in wordcloud.layout_
+    ]
+
+
+def benchmark(renders=5):
+    """重复渲染同一份词频时，缓存命中与完整渲染的耗时对比"""
+    import random
+    import tempfile
+
+    from config import WORDCLOUD_CONFIG
+    from utils.wordcloud_generator import WordCloudGenerator
+
+    words = ['火锅', '牛肉', '新鲜', '服务', '环境', '价格', '排队', '好吃', '性价比', '毛肚',
+             '锅底', '鸭肠', '虾滑', '服务员', '上菜', '停车', '装修', '辣度', '调料', '甜品']
+    keywords = [[word, random.random()] for word in words]
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        generator = WordCloudGenerator()
+        generator.render_cache = RenderCache(os.path.join(tmp_dir, 'cache'), WORDCLOUD_CONFIG.get('CACHE_MAX_BYTES'))
+
+        start = time.perf_counter()
+        generator.generate_wordcloud(keywords, save_path=os.path.join(tmp_dir, 'first.png'))
+        results['miss_ms'] = (time.perf_counter() - start) * 1e3
+
+        start = time.perf_counter()
+        for i in range(renders):
+            generator.generate_wordcloud(keywords, save_path=os.path.join(tmp_dir, f"hit_{i}.png"))
+        results['hit_ms'] = (time.perf_counter() - start) / renders * 1e3
+
+        # 整体缩放的词频命中同一缓存项
+        scaled = [[word, score * 10] for word, score in keywords]
+        generator.generate_wordcloud(scaled)
+        results['stats'] = generator.render_cache.stats()
+
+    return results
+
+
+if __name__ == "__main__":
+    # 基准测试
+    stats = benchmark()
+    print(f"完整渲染: {stats['miss_ms']:.0f} ms")
+    print(f"缓存命中: {stats['hit_ms']:.1f} ms/次")
+    print(f"缓存统计: {stats['stats']}")
@@ -0,0 +1,283 @@
+import os
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from utils import storage, metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# 只压缩文本类文件，图片和已压缩的文件原样返回
+COMPRESSIBLE_EXTENSIONS = ('.json', '.csv', '.txt', '.log')
+MIN_COMPRESS_SIZE = 1024
+# 超过该大小的下载不在内存中压缩，直接流式返回
+MAX_COMPRESS_SIZE = 16 * 1024 * 1024
+# 解析后的Python对象相对JSON文本的内存放大倍数（估计值）
+PARSED_OVERHEAD = 4
+
+ENCODERS = {
+    'gzip': lambda body: gzip.compress(body, 6),
+}
+if brotli is not None:
+    ENCODERS['br'] = lambda body: brotli.compress(body, quality=5)
+
+# 压缩格式协商的优先顺序
+ENCODING_PREFERENCE = [name for name in ('br', 'gzip') if name in ENCODERS]
+
+CACHE_REQUESTS = metrics.counter(
+    'response_cache_requests_total', '响应缓存查找次数', ['kind', 'result']
+)
+
+
+class CacheEntry:
+    """缓存项：文件版本（mtime/大小）、强ETag、解析结果、响应体及其压缩版本"""
+
+    __slots__ = ('key', 'path', 'mtime_ns', 'size', 'etag', 'data', 'body', 'encoded', 'cost')
+
+    def __init__(self, key, path, st, etag, data=None, body=None, cost=0):
+        self.key = key
+        self.path = path
+        self.mtime_ns = st.st_mtime_ns
+        self.size = st.st_size
+        self.etag = etag
+        self.data = data
+        self.body = body
+        self.encoded = {}
+        self.cost = cost
+
+    def matches(self, st):
+        return self.mtime_ns == st.st_mtime_ns and self.size == st.st_size
+
+
+class ResponseCache:
+    """按路径和mtime失效的响应缓存
+
+    缓存解析后的JSON文档及序列化好的响应体，以及下载文件的内容哈希（强ETag）
+    和按需生成的gzip/brotli压缩版本。每次访问只做一次stat，文件变化后自动重新加载；
+    总内存超过 max_bytes 时按LRU淘汰。
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def encodings():
+        """可用的压缩格式（按优先顺序）"""
+        return ENCODING_PREFERENCE
+
+    @staticmethod
+    def compressible(path):
+        """文件是否适合压缩传输"""
+        if not path.endswith(COMPRESSIBLE_EXTENSIONS):
+            return False
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return False
+        return MIN_COMPRESS_SIZE <= size <= MAX_COMPRESS_SIZE
+
+    def _lookup(self, key, st):
+        """查找与当前文件版本一致的缓存项（需持有锁）"""
+        entry = self._entries.get(key)
+        if entry is not None and entry.matches(st):
+            self._entries.move_to_end(key)
+            self.hits += 1
+            CACHE_REQUESTS.inc(kind=key[0], result='hit')
+            return entry
+        self.misses += 1
+        CACHE_REQUESTS.inc(kind=key[0], result='miss')
+        return None
+
+    def _store(self, entry):
+        """放入缓存并按内存预算淘汰（需持有锁）"""
+        old = self._entries.pop(entry.key, None)
+        if old is not None:
+            self._bytes -= old.cost
+        if entry.cost > self.max_bytes:
+            return
+        self._entries[entry.key] = entry
+        self._bytes += entry.cost
+        self._evict()
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._entries:
+            _, old = self._entries.popitem(last=False)
+            self._bytes -= old.cost
+
+    def document(self, path, serializer, loader=storage.load_json):
+        """获取解析后的文档及序列化好的响应体
+
+        serializer(data) -> bytes 生成响应体，ETag为响应体的哈希。
+        文件不存在时抛出 FileNotFoundError。
+        """
+        path = storage.resolve_path(path)
+        st = os.stat(path)
+        key = ('document', path)
+        with self._lock:
+            entry = self._lookup(key, st)
+        if entry is not None:
+            return entry
+
+        data = loader(path)
+        body = serializer(data)
+        entry = CacheEntry(
+            key, path, st,
+            etag=hashlib.sha256(body).hexdigest(),
+            data=data, body=body,
+            cost=len(body) * (1 + PARSED_OVERHEAD)
+        )
+        with self._lock:
+            self._store(entry)
+        return entry
+
+    def parsed(self, path, loader):
+        """获取按文件版本缓存的 loader(path) 结果（不生成响应体）
+
+        结果对象有 cost 属性时按其计算内存占用，否则按文件大小估计。
+        ETag由文件的mtime和大小生成，供由结果派生的响应使用。
+        文件不存在时抛出 FileNotFoundError。
+        """
+        path = storage.resolve_path(path)
+        st = os.stat(path)
+        key = ('parsed', path)
+        with self._lock:
+            entry = self._lookup(key, st)
+        if entry is not None:
+            return entry
+
+        data = loader(path)
+        entry = CacheEntry(
+            key, path, st,
+            etag=f"{st.st_mtime_ns:x}-{st.st_size:x}",
+            data=data,
+            cost=getattr(data, 'cost', st.st_size * (1 + PARSED_OVERHEAD))
+        )
+        with self._lock:
+            self._store(entry)
+        return entry
+
+    def file(self, path):
+        """获取下载文件的缓存项（强ETag基于文件内容）"""
+        st = os.stat(path)
+        key = ('file', path)
+        with self._lock:
+            entry = self._lookup(key, st)
+        if entry is not None:
+            return entry
+
+        hasher = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                hasher.update(chunk)
+        entry = CacheEntry(key, path, st, etag=hasher.hexdigest(), cost=256)
+        with self._lock:
+            self._store(entry)
+        return entry
+
+    def encode(self, entry, encoding):
+        """返回压缩后的响应体（按需生成并计入缓存）"""
+        with self._lock:
+            encoded = entry.encoded.get(encoding)
+        if encoded is not None:
+            return encoded
+
+        body = entry.body
+        if body is None:
+            with open(entry.path, 'rb') as f:
+                body = f.read()
+        encoded = ENCODERS[encoding](body)
+
+        with self._lock:
+            if encoding not in entry.encoded:
+                entry.encoded[encoding] = encoded
+                entry.cost += len(encoded)
+                if self._entries.get(entry.key) is entry:
+                    self._bytes += len(encoded)
+                    self._evict()
+        return encoded
+
+    def invalidate(self, path=None):
+        """清除缓存（path为None时清除全部）"""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self._bytes = 0
+                return
+            for key in [k for k in self._entries if k[1] == path]:
+                self._bytes -= self._entries.pop(key).cost
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+def benchmark(records=5000, requests=200):
+    """对比每次读取解析与缓存命中的分析结果响应开销，以及各压缩格式的体积"""
+    import json
+    import time
+    import random
+    import tempfile
+
+    words = ['火锅', '牛肉', '新鲜', '服务', '环境', '价格', '排队', '好吃', '性价比', '毛肚']
+    analysis = {
+        'total_comments': records,
+        'comments_with_sentiment': [
+            {'content': '，'.join(random.choices(words, k=20)), 'sentiment': random.random()}
+            for _ in range(records)
+        ],
+        'keywords': {'tfidf': [[w, random.random()] for w in words]}
+    }
+
+    def serializer(data):
+        return json.dumps({'success': True, 'data': data}, ensure_ascii=False).encode('utf-8')
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'comments_bench_20240101_000000_analysis.json')
+        storage.dump_json(analysis, path)
+
+        start = time.perf_counter()
+        for _ in range(requests):
+            serializer(storage.load_json(path))
+        results['uncached_ms'] = (time.perf_counter() - start) / requests * 1e3
+
+        cache = ResponseCache()
+        cache.document(path, serializer)
+        start = time.perf_counter()
+        for _ in range(requests):
+            cache.document(path, serializer)
+        results['cached_ms'] = (time.perf_counter() - start) / requests * 1e3
+
+        entry = cache.document(path, serializer)
+        results['sizes'] = {'identity': len(entry.body)}
+        for encoding in ENCODING_PREFERENCE:
+            results['sizes'][encoding] = len(cache.encode(entry, encoding))
+        results['cache'] = cache.stats()
+
+    return results
+
+
+if __name__ == "__main__":
+    # 基准测试
+    stats = benchmark()
+    print(f"读取+解析: {stats['uncached_ms']:.2f} ms/次")
+    print(f"缓存命中:  {stats['cached_ms']:.3f} ms/次")
+    for encoding, size in stats['sizes'].items():
+        print(f"{encoding:<9} {size / 1024:.1f} KB")
+    print(f"缓存统计: {stats['cache']}")
@@ -0,0 +1,76 @@
+import json
+import time
+import uuid
+import hashlib
+import threading
+from datetime import datetime
+
+
+def new_task_id(prefix):
+    """生成不会冲突的任务ID（时间戳便于阅读，随机后缀保证唯一）"""
+    return f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+
+def flight_key(task_type, content_hash, params):
+    """由任务类型、输入内容哈希和参数生成去重键"""
+    payload = json.dumps([task_type, content_hash, params], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class SingleFlight:
+    """相同任务合并执行
+
+    同一个键在执行中时，重复提交直接关联到正在执行的任务；
+    执行成功后的 result_ttl 秒内，重复提交直接复用已完成任务的结果。
+    """
+
+    def __init__(self, result_ttl=3600):
+        self.result_ttl = result_ttl
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._done = {}
+
+    def acquire(self, key, task_id, reuse_result=True, is_valid=None):
+        """登记任务
+
+        返回 (task_id, state)：state 为 'new'（调用方需要提交任务）、
+        'attached'（关联到执行中的任务）或 'cached'（复用已完成的任务）。
+        is_valid(task_id) 用于确认已完成任务的结果仍然可用。
+        """
+        with self._lock:
+            existing = self._inflight.get(key)
+            if existing is not None:
+                return existing, 'attached'
+
+            if reuse_result:
+                done = self._done.get(key)
+                if done is not None:
+                    done_id, finished_at = done
+                    if time.monotonic() - finished_at <= self.result_ttl and (is_valid is None or is_valid(done_id)):
+                        return done_id, 'cached'
+                    del self._done[key]
+
+            self._inflight[key] = task_id
+            return task_id, 'new'
+
+    def complete(self, key, task_id, success):
+        """任务结束：成功的任务在 result_ttl 内可被复用"""
+        with self._lock:
+            if self._inflight.get(key) == task_id:
+                del self._inflight[key]
+            if success:
+                self._done[key] = (task_id, time.monotonic())
+            else:
+                self._done.pop(key, None)
+
+            # 顺带清理过期的完成记录
+            now = time.monotonic()
+            for old_key in [k for k, (_, t) in self._done.items() if now - t > self.result_ttl]:
+                del self._done[old_key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'inflight': len(self._inflight),
+                'cached': len(self._done)
+            }
@@ -0,0 +1,272 @@
+import os
+import io
+import gzip
+import json
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# 压缩格式魔数
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+# 扩展名 -> 编码器
+CODEC_SUFFIXES = {
+    '.gz': 'gzip',
+    '.zst': 'zstd',
+}
+
+DEFAULT_LEVELS = {
+    'gzip': 6,
+    'zstd': 3,
+}
+
+# 压缩帧大小：流式写入时每次提交给压缩器的数据量
+FRAME_SIZE = 1024 * 1024
+
+# 新建文件的权限（首次使用时按umask计算，见 _new_file_mode）
+_new_file_mode_value = None
+
+
+def codec_for_path(path):
+    """根据扩展名选择编码器（None表示不压缩）"""
+    for suffix, codec in CODEC_SUFFIXES.items():
+        if path.endswith(suffix):
+            return codec
+    return None
+
+
+def codec_suffix(codec):
+    """编码器对应的扩展名"""
+    for suffix, name in CODEC_SUFFIXES.items():
+        if name == codec:
+            return suffix
+    return ''
+
+
+def strip_codec_suffix(path):
+    """去掉压缩扩展名，得到逻辑文件名"""
+    for suffix in CODEC_SUFFIXES:
+        if path.endswith(suffix):
+            return path[:-len(suffix)]
+    return path
+
+
+def detect_codec(path):
+    """通过文件头检测压缩格式"""
+    with open(path, 'rb') as f:
+        head = f.read(4)
+    if head.startswith(GZIP_MAGIC):
+        return 'gzip'
+    if head.startswith(ZSTD_MAGIC):
+        return 'zstd'
+    return None
+
+
+def resolve_path(path):
+    """解析实际存在的文件路径（支持省略压缩扩展名）"""
+    if os.path.exists(path):
+        return path
+    for suffix in CODEC_SUFFIXES:
+        if os.path.exists(path + suffix):
+            return path + suffix
+    return path
+
+
+def _require_zstd():
+    if zstandard is None:
+        raise ImportError("使用zstd压缩需要安装 zstandard: pip install zstandard")
+
+
+@contextmanager
+def open_read(path, mode='rb', encoding='utf-8'):
+    """打开文件读取，自动检测并解压"""
+    path = resolve_path(path)
+    codec = detect_codec(path)
+
+    raw = open(path, 'rb')
+    try:
+        if codec == 'gzip':
+            stream = gzip.GzipFile(fileobj=raw, mode='rb')
+        elif codec == 'zstd':
+            _require_zstd()
+            stream = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+            stream = io.BufferedReader(stream, FRAME_SIZE)
+        else:
+            stream = raw
+
+        if 't' in mode:
+            stream = io.TextIOWrapper(stream, encoding=encoding, newline='')
+        try:
+            yield stream
+        finally:
+            if stream is not raw:
+                stream.close()
+    finally:
+        raw.close()
+
+
+def _new_file_mode():
+    """新建文件的权限：0666 & ~umask
+
+    os.umask 只能通过设置来读取，会短暂改变整个进程的umask，与其他线程创建文件冲突；
+    这里从 /proc/self/status 读取，无法读取的平台使用常见的 0644。
+    """
+    global _new_file_mode_value
+    if _new_file_mode_value is None:
+        mode = 0o644
+        try:
+            with open('/proc/self/status') as f:
+                for line in f:
+                    if line.startswith('Umask:'):
+                        mode = 0o666 & ~int(line.split()[1], 8)
+                        break
+        except (OSError, ValueError, IndexError):
+            pass
+        _new_file_mode_value = mode
+    return _new_file_mode_value
+
+
+@contextmanager
+def atomic_write(path, mode='wb', encoding='utf-8', codec=None, level=None):
+    """原子写入：写入同目录临时文件后rename，读者不会看到写了一半的文件
+
+    codec为None时由扩展名决定，'raw'表示按原样写入；数据按帧流式压缩，不会整体驻留内存。
+    """
+    if codec is None:
+        codec = codec_for_path(path)
+    if level is None:
+        level = DEFAULT_LEVELS.get(codec)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.', suffix='.tmp')
+
+    try:
+        with os.fdopen(fd, 'wb') as raw:
+            if codec == 'gzip':
+                # mtime=0 使相同内容得到相同的压缩结果
+                stream = gzip.GzipFile(filename='', fileobj=raw, mode='wb', compresslevel=level, mtime=0)
+            elif codec == 'zstd':
+                _require_zstd()
+                compressor = zstandard.ZstdCompressor(level=level, write_content_size=False)
+                stream = compressor.stream_writer(raw, write_size=FRAME_SIZE, closefd=False)
+            else:
+                stream = raw
+
+            writer = io.TextIOWrapper(stream, encoding=encoding, newline='') if 't' in mode else stream
+
+            yield writer
+
+            if writer is not stream:
+                writer.flush()
+                writer.detach()
+            if stream is not raw:
+                # 关闭压缩流写入结尾帧，底层文件保持打开
+                stream.close()
+            raw.flush()
+            os.fsync(raw.fileno())
+
+        # mkstemp 创建的临时文件权限为0600：沿用目标文件原有的权限，新文件按umask（通常为0644）
+        try:
+            file_mode = os.stat(path).st_mode & 0o7777
+        except FileNotFoundError:
+            file_mode = _new_file_mode()
+        os.chmod(tmp_path, file_mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def dump_json(data, path, indent=2, codec=None, level=None):
+    """流式写入JSON（原子、按扩展名压缩）"""
+    with atomic_write(path, 'wt', codec=codec, level=level) as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent)
+    return path
+
+
+def load_json(path):
+    """读取JSON（自动检测压缩）"""
+    with open_read(path, 'rt') as f:
+        return json.load(f)
+
+
+def dump_csv(df, path, codec=None, level=None):
+    """写入CSV（原子、按扩展名压缩）"""
+    with atomic_write(path, 'wt', encoding='utf-8-sig', codec=codec, level=level) as f:
+        df.to_csv(f, index=False)
+    return path
+
+
+def load_csv(path):
+    """读取CSV（自动检测压缩）"""
+    import pandas as pd
+    with open_read(path, 'rt', encoding='utf-8-sig') as f:
+        return pd.read_csv(f)
+
+
+def benchmark(records=20000, repeat=3):
+    """各编码器/压缩级别的吞吐量与压缩比基准测试"""
+    import time
+    import random
+
+    words = ['火锅', '牛肉', '新鲜', '服务', '环境', '价格', '排队', '好吃', '性价比', '毛肚', '汤底', '蘸料']
+    comments = [
+        {
+            'content': '，'.join(random.choices(words, k=random.randint(5, 40))),
+            'rating': random.randint(1, 5),
+            'time': f"2024-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}",
+            'username': f"user_{random.randint(1, 5000)}",
+            'tags': random.sample(words, 3),
+            'crawl_time': '2024-06-01T12:00:00'
+        }
+        for _ in range(records)
+    ]
+
+    cases = [(None, None)]
+    cases += [('gzip', level) for level in (1, 6, 9)]
+    if zstandard is not None:
+        cases += [('zstd', level) for level in (1, 3, 9, 19)]
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for codec, level in cases:
+            path = os.path.join(tmp_dir, 'bench.json' + codec_suffix(codec))
+            write_times, read_times = [], []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                dump_json(comments, path, level=level)
+                write_times.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                load_json(path)
+                read_times.append(time.perf_counter() - start)
+
+            if codec is None:
+                raw_size = os.path.getsize(path)
+            size = os.path.getsize(path)
+            results.append({
+                'codec': codec or 'none',
+                'level': level,
+                'size': size,
+                'ratio': raw_size / size,
+                'write_mb_s': raw_size / min(write_times) / 1e6,
+                'read_mb_s': raw_size / min(read_times) / 1e6
+            })
+
+    return results
+
+
+if __name__ == "__main__":
+    # 基准测试
+    print(f"{'codec':<6}{'level':>6}{'size(KB)':>12}{'ratio':>8}{'write MB/s':>12}{'read MB/s':>12}")
+    for row in benchmark():
+        print(f"{row['codec']:<6}{str(row['level']):>6}{row['size'] / 1024:>12.1f}"
+              f"{row['ratio']:>8.2f}{row['write_mb_s']:>12.1f}{row['read_mb_s']:>12.1f}")
@@ -0,0 +1,251 @@
+import time
+import queue
+import itertools
+import threading
+
+from utils.data_utils import Logger
+
+
+# 优先级（数值越小越先执行）
+PRIORITIES = {
+    'high': 0,
+    'normal': 1,
+    'low': 2,
+}
+
+_STOP = object()
+
+
+class TaskCancelled(Exception):
+    """任务被取消"""
+
+
+class TaskTimeout(TaskCancelled):
+    """任务超时"""
+
+
+class CancelToken:
+    """协作式取消令牌
+
+    任务在检查点（例如进度上报时）调用 check()，被取消或超过截止时间时抛出异常。
+    """
+
+    def __init__(self, timeout=None):
+        self.timeout = timeout
+        self.deadline = None
+        self._cancelled = threading.Event()
+
+    def start(self):
+        """任务开始执行时计算截止时间"""
+        if self.timeout:
+            self.deadline = time.monotonic() + self.timeout
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def check(self, *_):
+        """检查点：已取消或超时则抛出异常（可直接作为进度sink使用）"""
+        if self._cancelled.is_set():
+            raise TaskCancelled("任务已取消")
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise TaskTimeout(f"任务超时（{self.timeout}秒）")
+
+
+class TaskPool:
+    """多工作线程任务池
+
+    每种任务类型一个优先级队列和若干工作线程，工作线程阻塞等待任务，
+    空闲时不占用CPU；长时间的爬取任务不会阻塞分析、词云等短任务。
+    """
+
+    def __init__(self, handler, workers=None, timeouts=None, default_workers=1, name='task-pool'):
+        """
+        handler: handler(task, token) 执行任务
+        workers: {任务类型: 工作线程数}
+        timeouts: {任务类型: 超时秒数}
+        """
+        self.handler = handler
+        self.workers = dict(workers or {})
+        self.timeouts = dict(timeouts or {})
+        self.default_workers = default_workers
+        self.name = name
+        self.logger = Logger.setup(__name__)
+
+        self._lock = threading.Lock()
+        self._queues = {}
+        self._threads = []
+        self._tokens = {}
+        self._busy = {}
+        self._spawned = set()
+        self._seq = itertools.count()
+        self.running = False
+
+    def start(self):
+        """启动工作线程"""
+        with self._lock:
+            if self.running:
+                return
+            self.running = True
+            for task_type in set(self.workers) | set(self._queues):
+                self._ensure_type(task_type)
+        self.logger.info(f"任务池已启动: {self.workers}")
+
+    def _ensure_type(self, task_type):
+        """为任务类型创建队列，任务池运行时同时启动工作线程（需持有锁）"""
+        task_queue = self._queues.get(task_type)
+        if task_queue is None:
+            task_queue = queue.PriorityQueue()
+            self._queues[task_type] = task_queue
+            self._busy[task_type] = 0
+
+        if self.running and task_type not in self._spawned:
+            self._spawned.add(task_type)
+            for i in range(self.workers.get(task_type, self.default_workers)):
+                thread = threading.Thread(
+                    target=self._worker, args=(task_type, task_queue),
+                    name=f"{self.name}-{task_type}-{i}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+        return task_queue
+
+    def submit(self, task, priority='normal', timeout=None):
+        """提交任务，返回取消令牌（任务池启动前提交的任务在启动后执行）"""
+        task_type = task['type']
+        if timeout is None:
+            timeout = self.timeouts.get(task_type)
+        token = CancelToken(timeout)
+
+        with self._lock:
+            task_queue = self._ensure_type(task_type)
+            self._tokens[task['id']] = token
+
+        task_queue.put((PRIORITIES.get(priority, PRIORITIES['normal']), next(self._seq), task))
+        return token
+
+    def cancel(self, task_id):
+        """取消任务（排队中的任务不会执行，运行中的任务在下一个检查点停止）"""
+        with self._lock:
+            token = self._tokens.get(task_id)
+        if token is None:
+            return False
+        token.cancel()
+        return True
+
+    def _worker(self, task_type, task_queue):
+        """工作线程：阻塞等待任务"""
+        while True:
+            _, _, task = task_queue.get()
+            try:
+                if task is _STOP:
+                    return
+                with self._lock:
+                    token = self._tokens.get(task['id'])
+                    self._busy[task_type] += 1
+                try:
+                    token.start()
+                    self.handler(task, token)
+                except Exception as e:
+                    self.logger.error(f"处理任务失败: {task.get('id')}, {e}")
+                finally:
+                    with self._lock:
+                        self._busy[task_type] -= 1
+                        self._tokens.pop(task['id'], None)
+            finally:
+                task_queue.task_done()
+
+    def stats(self):
+        """各任务类型的排队数、工作线程数与忙碌线程数"""
+        with self._lock:
+            return {
+                task_type: {
+                    'queued': task_queue.qsize(),
+                    'workers': self.workers.get(task_type, self.default_workers),
+                    'busy': self._busy[task_type]
+                }
+                for task_type, task_queue in self._queues.items()
+            }
+
+    def stop(self, timeout=None):
+        """停止所有工作线程（排在已提交任务之后）"""
+        with self._lock:
+            if not self.running:
+                return
+            self.running = False
+            queues = [(t, q) for t, q in self._queues.items() if t in self._spawned]
+            threads = list(self._threads)
+            self._threads.clear()
+            self._spawned.clear()
+
+        for task_type, task_queue in queues:
+            for _ in range(self.workers.get(task_type, self.default_workers)):
+                # 停止信号优先级最低，保证已排队的任务先执行完
+                task_queue.put((float('inf'), next(self._seq), _STOP))
+        for thread in threads:
+            thread.join(timeout)
+        self.logger.info("任务池已停止")
+
+
+def benchmark(rounds=5):
+    """混合负载基准：单线程FIFO与多工作线程任务池的各类任务等待+执行延迟"""
+    import random
+    import statistics
+
+    durations = {
+        'crawl_comments': 2.0,       # 长时间I/O
+        'analyze_comments': 0.2,
+        'generate_wordcloud': 0.3,
+    }
+    random.seed(7)
+    submissions = [random.choice(['crawl_comments', 'analyze_comments', 'analyze_comments', 'generate_wordcloud'])
+                   for _ in range(rounds * 4)]
+
+    def run(workers, serial=False):
+        latencies = {task_type: [] for task_type in durations}
+        done = threading.Event()
+        remaining = [len(submissions)]
+        lock = threading.Lock()
+
+        def handler(task, token):
+            time.sleep(durations[task['kind']])
+            with lock:
+                latencies[task['kind']].append(time.monotonic() - task['submitted'])
+                remaining[0] -= 1
+                if remaining[0] == 0:
+                    done.set()
+
+        pool = TaskPool(handler, workers=workers, name='bench')
+        pool.start()
+        for i, task_type in enumerate(submissions):
+            pool.submit({
+                'id': f"bench_{i}",
+                # 串行模式下所有任务共用一个队列和工作线程（原TaskRunner的行为）
+                'type': 'serial' if serial else task_type,
+                'kind': task_type,
+                'submitted': time.monotonic()
+            })
+            time.sleep(0.05)
+        done.wait()
+        pool.stop()
+        return {
+            task_type: (statistics.median(values), max(values))
+            for task_type, values in latencies.items() if values
+        }
+
+    return {
+        'serial': run({'serial': 1}, serial=True),
+        'pool': run({'crawl_comments': 2, 'analyze_comments': 2, 'generate_wordcloud': 2})
+    }
+
+
+if __name__ == "__main__":
+    # 基准测试
+    results = benchmark()
+    for mode, stats in results.items():
+        print(f"[{mode}]")
+        for task_type, (median, worst) in stats.items():
+            print(f"  {task_type:<20} p50={median:.2f}s  max={worst:.2f}s")
@@ -0,0 +1,222 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from utils.data_utils import Logger
+
+
+# 终态：任务不会再更新
+FINAL_STATUSES = ('completed', 'failed', 'cancelled', 'timeout')
+
+
+class TaskStore:
+    """任务状态存储
+
+    内存中只保留较小的状态记录（LRU + TTL淘汰），完整结果（分析结果、
+    base64词云等）压缩后写入SQLite，按任务ID引用，查询时再加载。
+    状态记录同样写入SQLite，服务重启后客户端仍可查询任务状态。
+    """
+
+    def __init__(self, store_dir='data/.tasks', max_entries=1000, memory_ttl=3600,
+                 retention_seconds=7 * 24 * 3600):
+        self.store_dir = store_dir
+        self.max_entries = max_entries
+        self.memory_ttl = memory_ttl
+        self.retention_seconds = retention_seconds
+        self.logger = Logger.setup(__name__)
+
+        self._lock = threading.RLock()
+        self._records = OrderedDict()
+        self._touched = {}
+        self._last_prune = 0.0
+        self._listeners = []
+
+        os.makedirs(store_dir, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(store_dir, 'tasks.db'), check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS tasks ('
+            'task_id TEXT PRIMARY KEY, record TEXT NOT NULL, updated REAL NOT NULL)'
+        )
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            'task_id TEXT PRIMARY KEY, payload BLOB NOT NULL, size INTEGER NOT NULL)'
+        )
+        self._db.commit()
+
+    def recover(self):
+        """服务启动时把上次运行未完成的任务标记为失败（执行线程已不存在）
+
+        由任务运行器启动时调用，而不是在构造时调用：任务子进程等只导入模块的进程
+        不应改动正在运行的服务的任务状态。本进程已登记的任务不受影响。
+        """
+        with self._lock:
+            rows = self._db.execute('SELECT task_id, record FROM tasks').fetchall()
+            interrupted = 0
+            for task_id, raw in rows:
+                record = json.loads(raw)
+                if task_id not in self._records and record.get('status') not in FINAL_STATUSES:
+                    record.update({'status': 'failed', 'error': '服务重启，任务已中断'})
+                    self._persist(task_id, record)
+                    interrupted += 1
+            self._db.commit()
+        if interrupted:
+            self.logger.warning(f"{interrupted} 个未完成的任务因服务重启被标记为失败")
+
+    def _persist(self, task_id, record):
+        self._db.execute(
+            'INSERT OR REPLACE INTO tasks (task_id, record, updated) VALUES (?, ?, ?)',
+            (task_id, json.dumps(record, ensure_ascii=False), time.time())
+        )
+
+    def _cache(self, task_id, record):
+        """放入内存缓存并按LRU/TTL淘汰（需持有锁）"""
+        now = time.monotonic()
+        self._records[task_id] = record
+        self._records.move_to_end(task_id)
+        self._touched[task_id] = now
+
+        while len(self._records) > self.max_entries:
+            old_id, _ = self._records.popitem(last=False)
+            self._touched.pop(old_id, None)
+
+        # 从最久未访问的一端淘汰过期记录
+        for old_id in list(self._records):
+            if now - self._touched[old_id] <= self.memory_ttl:
+                break
+            del self._records[old_id]
+            del self._touched[old_id]
+
+    def add_listener(self, callback):
+        """注册状态变化回调 callback(task_id, record)（例如推送进度事件）"""
+        self._listeners.append(callback)
+
+    def _notify(self, task_id, record):
+        for callback in self._listeners:
+            try:
+                callback(task_id, record)
+            except Exception as e:
+                self.logger.error(f"任务状态回调失败: {task_id}, {e}")
+
+    def set(self, task_id, record, persist=True):
+        """写入（替换）状态记录"""
+        record = dict(record)
+        record.pop('result', None)
+        with self._lock:
+            self._cache(task_id, record)
+            if persist:
+                self._persist(task_id, record)
+                self._db.commit()
+                self._prune()
+        self._notify(task_id, dict(record))
+
+    def update(self, task_id, fields, persist=True):
+        """合并更新状态记录
+
+        persist=False 只更新内存（用于高频的进度推送），状态变化时再持久化。
+        """
+        with self._lock:
+            record = self._load(task_id) or {}
+            record.update(fields)
+            record.pop('result', None)
+            self._cache(task_id, record)
+            if persist:
+                self._persist(task_id, record)
+                self._db.commit()
+            record = dict(record)
+        self._notify(task_id, record)
+
+    def set_result(self, task_id, result):
+        """保存任务的完整结果（压缩后落盘，内存只保留引用）"""
+        payload = zlib.compress(json.dumps(result, ensure_ascii=False).encode('utf-8'), 6)
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO results (task_id, payload, size) VALUES (?, ?, ?)',
+                (task_id, payload, len(payload))
+            )
+            record = self._load(task_id) or {}
+            record['result_ref'] = task_id
+            record['result_size'] = len(payload)
+            self._cache(task_id, record)
+            self._persist(task_id, record)
+            self._db.commit()
+
+    def get_result(self, task_id):
+        """加载任务的完整结果"""
+        with self._lock:
+            row = self._db.execute('SELECT payload FROM results WHERE task_id = ?', (task_id,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(zlib.decompress(row[0]).decode('utf-8'))
+
+    def _load(self, task_id):
+        """读取状态记录：先查内存，再查SQLite（需持有锁）"""
+        record = self._records.get(task_id)
+        if record is not None:
+            self._records.move_to_end(task_id)
+            self._touched[task_id] = time.monotonic()
+            return record
+
+        row = self._db.execute('SELECT record FROM tasks WHERE task_id = ?', (task_id,)).fetchone()
+        if row is None:
+            return None
+        record = json.loads(row[0])
+        self._cache(task_id, record)
+        return record
+
+    def get(self, task_id, include_result=True):
+        """获取任务状态（默认附带完整结果）"""
+        with self._lock:
+            record = self._load(task_id)
+            if record is None:
+                return None
+            record = dict(record)
+
+        if include_result and record.get('result_ref'):
+            result = self.get_result(record['result_ref'])
+            if result is not None:
+                record['result'] = result
+        return record
+
+    def __contains__(self, task_id):
+        with self._lock:
+            return self._load(task_id) is not None
+
+    def _prune(self):
+        """删除超过保留期限的持久化记录（最多每分钟一次，需持有锁）"""
+        now = time.monotonic()
+        if now - self._last_prune < 60:
+            return
+        self._last_prune = now
+
+        cutoff = time.time() - self.retention_seconds
+        expired = [row[0] for row in self._db.execute('SELECT task_id FROM tasks WHERE updated < ?', (cutoff,))]
+        if not expired:
+            return
+        self._db.executemany('DELETE FROM results WHERE task_id = ?', [(t,) for t in expired])
+        self._db.executemany('DELETE FROM tasks WHERE task_id = ?', [(t,) for t in expired])
+        self._db.commit()
+        for task_id in expired:
+            self._records.pop(task_id, None)
+            self._touched.pop(task_id, None)
+        self.logger.info(f"清理了 {len(expired)} 条过期任务记录")
+
+    def stats(self):
+        """内存与持久化记录统计"""
+        with self._lock:
+            persisted = self._db.execute('SELECT COUNT(*) FROM tasks').fetchone()[0]
+            result_bytes = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+            return {
+                'memory_entries': len(self._records),
+                'persisted_entries': persisted,
+                'result_bytes': result_bytes
+            }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -10,7 +10,14 @@ import json
 from datetime import datetime
 
 from config import ANALYSIS_CONFIG
-from utils.data_utils import clean_text, Logger
+from utils.data_utils import clean_text, Logger, ProgressReporter
+from utils import storage, metrics
+
+
+ANALYZER_STAGE_SECONDS = metrics.histogram(
+    'analyzer_stage_seconds', '评论分析各阶段耗时（秒）', ['stage']
+)
+ANALYZED_COMMENTS = metrics.counter('analyzer_comments_total', '已分析的评论条数')
 
 
 class TextProcessor:
@@ -88,7 +95,7 @@ class TextProcessor:
 
         return filtered_words
 
-    def extract_keywords(self, texts, top_k=None):
+    def extract_keywords(self, texts, top_k=None, progress=None):
         """提取关键词"""
         if top_k is None:
             top_k = ANALYSIS_CONFIG['KEYWORD_TOP_K']
@@ -98,6 +105,8 @@ class TextProcessor:
         for text in texts:
             words = self.clean_and_segment(text)
             processed_texts.append(' '.join(words))
+            if progress:
+                progress.update()
 
         # 使用TF-IDF提取关键词
         try:
@@ -164,30 +173,50 @@ class CommentAnalyzer:
         self.processor = TextProcessor()
         self.logger = Logger.setup(__name__)
 
-    def analyze_comments(self, comments):
-        """分析评论数据"""
+    def analyze_comments(self, comments, progress=None):
+        """分析评论数据
+
+        progress: 可选的 ProgressReporter，各阶段按实际处理条数上报进度
+        """
         if not comments:
             return {}
 
         self.logger.info(f"开始分析 {len(comments)} 条评论")
+        if progress is None:
+            progress = ProgressReporter()
 
         # 基础统计
-        stats = self.get_basic_stats(comments)
+        with ANALYZER_STAGE_SECONDS.time(stage='basic_stats'):
+            stats = self.get_basic_stats(comments)
 
         # 提取所有评论文本
         texts = [comment.get('content', '') for comment in comments if comment.get('content')]
 
         # 关键词分析
-        keywords = self.processor.extract_keywords(texts)
+        with ANALYZER_STAGE_SECONDS.time(stage='keywords'):
+            keywords = self.processor.extract_keywords(
+                texts, progress=progress.stage(0, 30, len(texts), '正在提取关键词...')
+            )
 
         # 情感分析
-        sentiments = self.analyze_sentiments(comments)
+        with ANALYZER_STAGE_SECONDS.time(stage='sentiments'):
+            sentiments = self.analyze_sentiments(
+                comments, progress=progress.stage(30, 60, len(comments), '正在分析情感...')
+            )
 
         # 标签分类
-        labels = self.categorize_labels(texts)
+        with ANALYZER_STAGE_SECONDS.time(stage='labels'):
+            labels = self.categorize_labels(
+                texts, progress=progress.stage(60, 75, len(texts), '正在分类标签...')
+            )
 
         # 时间分析
-        time_analysis = self.analyze_time_trends(comments)
+        with ANALYZER_STAGE_SECONDS.time(stage='time_trends'):
+            time_analysis = self.analyze_time_trends(
+                comments, progress=progress.stage(75, 100, len(comments), '正在分析时间趋势...')
+            )
+        progress.finish('评论分析完成')
+        ANALYZED_COMMENTS.inc(len(comments))
 
         results = {
             'basic_stats': stats,
@@ -225,7 +254,7 @@ class CommentAnalyzer:
             'rating_distribution': dict(Counter(ratings))
         }
 
-    def analyze_sentiments(self, comments):
+    def analyze_sentiments(self, comments, progress=None):
         """分析情感分布"""
         sentiments = []
 
@@ -233,6 +262,8 @@ class CommentAnalyzer:
             text = comment.get('content', '')
             sentiment = self.processor.analyze_sentiment(text)
             sentiments.append(sentiment)
+            if progress:
+                progress.update()
 
         # 统计情感分布
         labels = [s['label'] for s in sentiments]
@@ -244,7 +275,7 @@ class CommentAnalyzer:
             'details': sentiments
         }
 
-    def categorize_labels(self, texts):
+    def categorize_labels(self, texts, progress=None):
         """标签分类"""
         categories = ANALYSIS_CONFIG['LABEL_CATEGORIES']
         category_counts = {category: 0 for category in categories}
@@ -260,6 +291,9 @@ class CommentAnalyzer:
                         category_counts[category] += 1
                         category_keywords[category][keyword] += 1
 
+            if progress:
+                progress.update()
+
         # 转换Counter为普通字典
         category_keywords = {
             category: dict(counter.most_common(10))
@@ -271,7 +305,7 @@ class CommentAnalyzer:
             'category_keywords': category_keywords
         }
 
-    def analyze_time_trends(self, comments):
+    def analyze_time_trends(self, comments, progress=None):
         """分析时间趋势"""
         time_data = []
 
@@ -286,6 +320,8 @@ class CommentAnalyzer:
                 'sentiment_score': sentiment['score'],
                 'sentiment_label': sentiment['label']
             })
+            if progress:
+                progress.update()
 
         return time_data
 
@@ -306,8 +342,7 @@ class CommentAnalyzer:
     def save_analysis(self, results, filename):
         """保存分析结果"""
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(results, f, ensure_ascii=False, indent=2)
+            storage.dump_json(results, filename)
             self.logger.info(f"分析结果已保存到 {filename}")
         except Exception as e:
             self.logger.error(f"保存分析结果失败: {e}")
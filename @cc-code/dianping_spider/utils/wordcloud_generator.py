@@ -1,21 +1,114 @@
-import matplotlib.pyplot as plt
 import matplotlib
 import numpy as np
-from wordcloud import WordCloud
 import io
 import base64
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageColor, ImageDraw, ImageFont
 import json
+import math
 import os
+import threading
+from xml.sax.saxutils import escape, quoteattr
+import multiprocessing
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 from config import WORDCLOUD_CONFIG
 from utils.data_utils import Logger
-
-
-# 设置matplotlib支持中文
-matplotlib.rcParams['font.sans-serif'] = ['SimHei', 'DejaVu Sans']
-matplotlib.rcParams['axes.unicode_minus'] = False
+from utils import storage, metrics, font_service, chart_renderer, process_pool
+from utils.wordcloud_styles import SHAPES, STYLE_ONLY_KEYS, registry as style_registry
+from utils.render_cache import RenderCache, render_key, layout_metadata
+from utils.frequency_prep import prepare_frequencies, quantize_frequencies
+from utils.incremental_layout import IncrementalWordCloud, layout_digest
+
+
+# matplotlib中文字体（首次创建生成器时按已安装的字体设置）
+_matplotlib_fonts_ready = False
+
+
+def _setup_matplotlib_fonts(service):
+    """font.sans-serif 只列出已安装的字体，避免 matplotlib 对不存在的字体反复查找和告警"""
+    global _matplotlib_fonts_ready
+    if _matplotlib_fonts_ready:
+        return
+    matplotlib.rcParams['font.sans-serif'] = service.families() or ['DejaVu Sans']
+    matplotlib.rcParams['axes.unicode_minus'] = False
+    _matplotlib_fonts_ready = True
+
+# 词云渲染耗时：layout为词语排布，encode为绘图（含标题）并编码PNG
+WORDCLOUD_RENDER_SECONDS = metrics.histogram(
+    'wordcloud_render_seconds', '词云图渲染各阶段耗时（秒）', ['phase']
+)
+WORDCLOUD_IMAGE_BYTES = metrics.histogram(
+    'wordcloud_image_bytes', '词云PNG图片大小（字节）', buckets=metrics.SIZE_BUCKETS
+)
+
+# 对比词云中每个面板的配置（面板之间独立渲染，每个面板的内存占用固定）
+COMPARISON_PANEL = {
+    'width': 400,
+    'height': 400,
+    'max_words': 100,
+    'background_color': 'white',
+    'colormap': 'Set3'
+}
+
+# 批量渲染的进程池（每个进程一个，首次批量渲染时创建）
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+# 渲染子进程中的生成器（初始化时创建，字体等已加载）
+_worker_generator = None
+
+
+def _init_render_worker():
+    """渲染子进程初始化：预先构建样式（颜色映射、遮罩），查找字体并完成一次小渲染，加载字体文件和绘图模块"""
+    global _worker_generator
+    style_registry.preload()
+    _worker_generator = WordCloudGenerator()
+    _worker_generator.render_wordcloud({'预热': 1}, '预热')
+
+
+def _render_in_worker(method, settings, *args):
+    """在渲染子进程中调用生成器的 method(*args)，连同本次记录的指标增量一起返回
+
+    settings 为主进程生成器的渲染设置（见 WordCloudGenerator.render_settings），
+    子进程按其切换配置、渲染方式和缓存目录，渲染结果和缓存键与主进程一致。
+    """
+    generator = _worker_generator
+    generator.apply_render_settings(settings)
+    result = getattr(generator, method)(*args)
+    return result, metrics.registry.drain()
+
+
+def get_render_pool(workers):
+    """获取批量渲染进程池（spawn方式启动，子进程预先加载字体）"""
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_render_worker
+            )
+        return _render_pool
+
+
+def _discard_render_pool(pool):
+    """丢弃已崩溃的进程池，下次批量渲染时重建（其他线程已重建的新进程池不受影响）"""
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is pool:
+            _render_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_render_pool():
+    """关闭批量渲染进程池"""
+    global _render_pool
+    with _render_pool_lock:
+        pool, _render_pool = _render_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
 
 
 class WordCloudGenerator:
@@ -25,300 +118,861 @@ class WordCloudGenerator:
         self.logger = Logger.setup(__name__)
         self.config = WORDCLOUD_CONFIG.copy()
         self.setup_font()
+        self.renderer = self.config.get('RENDERER', 'pil')
+        self._title_fonts = {}
+        self.render_cache = None
+        if self.config.get('CACHE_DIR'):
+            self.render_cache = RenderCache(self.config['CACHE_DIR'], self.config['CACHE_MAX_BYTES'])
 
     def setup_font(self):
-        """设置中文字体"""
-        # 尝试寻找系统中的中文字体
-        font_paths = [
-            # Windows
-            'C:/Windows/Fonts/simhei.ttf',
-            'C:/Windows/Fonts/msyh.ttf',
-            'C:/Windows/Fonts/simsun.ttc',
-            # macOS
-            '/System/Library/Fonts/Helvetica.ttc',
-            '/System/Library/Fonts/PingFang.ttc',
-            # Linux
-            '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
-            '/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf',
-        ]
-
-        for font_path in font_paths:
-            if os.path.exists(font_path):
-                self.config['font_path'] = font_path
-                self.logger.info(f"使用字体: {font_path}")
-                break
+        """设置中文字体
+
+        字体由字体服务查找（进程内只查找一次，结果持久化，见 utils.font_service），
+        配置中指定了存在的 font_path 时直接使用。
+        """
+        service = font_service.get_service(self.config.get('FONT_CACHE_DIR') or 'data/.font_cache')
+        self.font_service = service
+
+        font_path = self.config.get('font_path')
+        if not (font_path and os.path.exists(font_path)):
+            font_path = service.find_font()
+        if font_path:
+            self.config['font_path'] = font_path
+            self.logger.info(f"使用字体: {font_path}")
         else:
             self.logger.warning("未找到中文字体，将使用默认字体")
             self.config['font_path'] = None
+        _setup_matplotlib_fonts(service)
+
+    def layout_font(self, word_freq):
+        """排布使用的字体：FONT_SUBSET 开启时为只含这些词语字形的子集字体"""
+        font_path = self.config['font_path']
+        if font_path and self.config.get('FONT_SUBSET'):
+            return self.font_service.subset(font_path, ''.join(str(word) for word in word_freq))
+        return font_path
+
+    def generate_wordcloud(self, keywords, title="词云图", save_path=None, output='png'):
+        """生成词云图
+
+        output: 'png' 为栅格图片（image_base64）；'svg' 和 'layout' 只排布不栅格化，
+        分别返回SVG文本（svg）和布局JSON（layout），由浏览器绘制，体积小一个数量级。
+        """
+        if output != 'png':
+            return self.generate_vector_wordcloud(keywords, title, save_path, output)
+        return self._generate_wordcloud(keywords, title, save_path)[0]
+
+    def generate_wordcloud_with_layout(self, keywords, title="词云图", save_path=None):
+        """生成PNG词云图，返回 (结果, 排布元数据)
+
+        排布元数据（命中缓存时取自缓存）可传给 generate_interactive_wordcloud，交互式数据不再重新排布。
+        """
+        return self._generate_wordcloud(keywords, title, save_path)
+
+    def generate_vector_wordcloud(self, keywords, title="词云图", save_path=None, output='svg'):
+        """生成SVG或布局JSON词云（不栅格化），save_path 给出时保存为 .svg/.json 文件"""
+        if output not in ('svg', 'layout'):
+            self.logger.error(f"不支持的词云输出格式: {output}")
+            return None
+        word_freq = self.word_frequencies(keywords) if keywords else None
+        if not word_freq:
+            self.logger.warning("关键词为空或格式不支持，无法生成词云")
+            return None
 
-    def generate_wordcloud(self, keywords, title="词云图", save_path=None):
-        """生成词云图"""
+        try:
+            word_freq, stats = self.prepare_frequencies(word_freq)
+            document = self.layout_document(self.layout_wordcloud(word_freq), title)
+            result = {'save_path': save_path, 'word_count': stats['count']}
+            if output == 'svg':
+                result['svg'] = self.render_svg(document)
+                if save_path:
+                    with storage.atomic_write(save_path, codec='raw') as f:
+                        f.write(result['svg'].encode('utf-8'))
+            else:
+                result['layout'] = document
+                if save_path:
+                    storage.dump_json(document, save_path, indent=None)
+            if save_path:
+                self.logger.info(f"词云已保存到: {save_path}")
+            return result
+
+        except Exception as e:
+            self.logger.error(f"生成词云失败: {e}")
+            return None
+
+    def _generate_wordcloud(self, keywords, title, save_path, previous=None):
+        """生成词云图，返回 (结果, 排布元数据)
+
+        previous 为上一期的排布元数据时，以其为起点增量排布（见 IncrementalWordCloud）。
+        """
         if not keywords:
             self.logger.warning("关键词为空，无法生成词云")
-            return None
+            return None, None
 
         try:
             # 准备词频数据
-            if isinstance(keywords, list):
-                # 如果是[(word, score), ...]格式
-                word_freq = {word: score for word, score in keywords}
-            elif isinstance(keywords, dict):
-                word_freq = keywords
-            else:
+            word_freq = self.word_frequencies(keywords)
+            if word_freq is None:
                 self.logger.error("不支持的关键词格式")
-                return None
-
-            # 创建词云对象
-            wordcloud = WordCloud(
-                width=self.config['width'],
-                height=self.config['height'],
-                font_path=self.config['font_path'],
-                max_words=self.config['max_words'],
-                background_color=self.config['background_color'],
-                colormap=self.config['colormap'],
-                relative_scaling=0.5,
-                random_state=42
-            ).generate_from_frequencies(word_freq)
-
-            # 创建图表
-            plt.figure(figsize=(12, 8))
-            plt.imshow(wordcloud, interpolation='bilinear')
-            plt.axis('off')
-            plt.title(title, fontsize=16, pad=20)
-            plt.tight_layout(pad=0)
+                return None, None
+            word_count = len(word_freq)
+            word_freq, _ = self.prepare_frequencies(word_freq)
+
+            # 相同词频、配置、字体和标题的渲染结果直接从缓存读取
+            cache_key = None
+            cached = None
+            if self.render_cache is not None:
+                cache_key = self.render_key(word_freq, title, previous)
+                cached = self.render_cache.get(cache_key)
+
+            if cached is not None:
+                image_bytes, meta = cached
+                layout = meta.get('layout')
+            else:
+                image_bytes, layout = self.render_wordcloud(word_freq, title, previous=previous)
+                WORDCLOUD_IMAGE_BYTES.observe(len(image_bytes))
+                if cache_key is not None:
+                    self.render_cache.put(cache_key, image_bytes, {
+                        'title': title,
+                        'width': self.config['width'],
+                        'height': self.config['height'],
+                        'word_count': word_count,
+                        'layout': layout
+                    })
 
             # 保存图片
             if save_path:
-                plt.savefig(save_path, dpi=300, bbox_inches='tight')
+                with storage.atomic_write(save_path, codec='raw') as f:
+                    f.write(image_bytes)
                 self.logger.info(f"词云图已保存到: {save_path}")
 
             # 转换为base64编码（用于web显示）
-            buffer = io.BytesIO()
-            plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight')
-            buffer.seek(0)
-            image_base64 = base64.b64encode(buffer.read()).decode()
-            buffer.close()
-
-            plt.close()  # 关闭图表释放内存
+            image_base64 = base64.b64encode(image_bytes).decode()
 
             return {
                 'image_base64': image_base64,
                 'save_path': save_path,
-                'word_count': len(word_freq)
-            }
+                'word_count': word_count,
+                'cached': cached is not None
+            }, layout
 
         except Exception as e:
             self.logger.error(f"生成词云图失败: {e}")
-            return None
+            return None, None
 
-    def generate_category_wordclouds(self, category_data, save_dir="wordclouds"):
-        """生成分类词云图"""
-        if not os.path.exists(save_dir):
-            os.makedirs(save_dir)
+    @staticmethod
+    def word_frequencies(keywords):
+        """关键词转为词频字典（支持[(word, score), ...]和字典），格式不支持时返回None"""
+        if isinstance(keywords, list):
+            # 如果是[(word, score), ...]格式
+            return {word: score for word, score in keywords}
+        if isinstance(keywords, dict):
+            return keywords
+        return None
+
+    def prepare_frequencies(self, word_freq, max_words=None):
+        """排布前的词频预处理（见 utils.frequency_prep），返回 (词频字典, 统计)
+
+        只保留合并重复写法后权重最高的 max_words 个词（默认为所用样式或配置的 max_words），
+        FREQUENCY_BUCKETS 大于0时把权重量化为字号级别。
+        """
+        return prepare_frequencies(word_freq, max_words or self.prepare_max_words(),
+                                   buckets=self.config.get('FREQUENCY_BUCKETS'),
+                                   merge=self.config.get('MERGE_VARIANTS', True))
+
+    def prepare_max_words(self):
+        """排布的词数上限：所用预设样式的 max_words，没有样式时为配置的 max_words"""
+        style = self.config.get('STYLE')
+        return style_registry.presets[style]['max_words'] if style else self.config['max_words']
+
+    def render_key(self, word_freq, title, previous=None):
+        """词云渲染缓存键（word_freq 为预处理后的词频）
+
+        增量排布的结果还取决于上一期的排布，缓存键中加入其哈希；使用预设样式时加入样式名。
+        """
+        options = {'renderer': self.renderer}
+        if previous:
+            options['previous'] = layout_digest(previous)
+        if self.config.get('STYLE'):
+            options['style'] = self.config['STYLE']
+        return render_key(word_freq, self.config, title, **options)
+
+    def render_settings(self):
+        """传给渲染子进程的设置：(配置, 渲染方式, 渲染缓存目录)"""
+        cache_dir = self.render_cache.cache_dir if self.render_cache else None
+        return dict(self.config), self.renderer, cache_dir
+
+    def apply_render_settings(self, settings):
+        """使用其他生成器的渲染设置（见 render_settings），只在与当前不同时切换"""
+        config, renderer, cache_dir = settings
+        if config != self.config:
+            if config.get('font_path') != self.config.get('font_path'):
+                self._title_fonts.clear()
+            self.config = dict(config)
+        self.renderer = renderer
+        current = self.render_cache.cache_dir if self.render_cache else None
+        if cache_dir != current:
+            self.render_cache = RenderCache(cache_dir, self.config['CACHE_MAX_BYTES']) if cache_dir else None
+
+    def is_cached(self, keywords, title, panel=False):
+        """该词频和标题的渲染结果（panel为True时为对比词云面板）是否已在缓存中
+
+        词频无法生成缓存键（如包含非数值）时返回False，由渲染时报告错误。
+        """
+        word_freq = self.word_frequencies(keywords)
+        if self.render_cache is None or not word_freq:
+            return False
+        try:
+            if panel:
+                key = self.panel_key(self.prepare_frequencies(word_freq, COMPARISON_PANEL['max_words'])[0], title)
+            else:
+                key = self.render_key(self.prepare_frequencies(word_freq)[0], title)
+        except (TypeError, ValueError):
+            return False
+        return self.render_cache.contains(key)
+
+    def run_renders(self, jobs, progress=None):
+        """按输入顺序逐个产出 (名称, 结果)
+
+        jobs: [(名称, 生成器方法名, 参数元组, 是否在本进程执行), ...]
+        不在本进程执行的任务有2个以上且 WORDCLOUD_CONFIG['RENDER_WORKERS'] 大于1时提交到进程池并行渲染，
+        本进程执行的任务（如已缓存的项）在等待进程池结果的同时按顺序完成。
+        单项失败只记录日志、结果为None，不影响其他项；中途退出（如任务被取消）时放弃尚未开始的渲染。
+        子进程异常退出（崩溃、被杀）时进程池中未完成的任务会全部失败：换新进程池，把这些任务逐个重新提交，
+        再次使进程池崩溃的只能是正在渲染的那一项，只有它失败。
+        已在任务进程池（TASK_CONFIG['PROCESS_WORKERS']）的子进程中时全部在本进程按顺序渲染，
+        不再嵌套创建渲染进程池，进程总数由任务进程池的进程数决定。
+        """
+        workers = self.config.get('RENDER_WORKERS') or min(4, os.cpu_count() or 1)
+        if process_pool.in_child():
+            workers = 1
+        remote = [i for i, job in enumerate(jobs) if not job[3]]
+        settings = self.render_settings()
+        # 任务序号 -> (进程池, future)
+        submitted = {}
+        # 进程池崩溃后改为逐个提交的任务
+        isolated = set()
+
+        def submit(i):
+            pool = get_render_pool(workers)
+            submitted[i] = (pool, pool.submit(_render_in_worker, jobs[i][1], settings, *jobs[i][2]))
+
+        def pooled_result(i):
+            if i in isolated:
+                submit(i)
+            pool, future = submitted[i]
+            try:
+                return future.result()
+            except BrokenProcessPool:
+                _discard_render_pool(pool)
+                if i in isolated:
+                    raise
+                isolated.update(j for j, (_, f) in submitted.items()
+                                if j >= i and (not f.done() or f.cancelled() or f.exception() is not None))
+                return pooled_result(i)
+
+        if len(remote) >= 2 and workers >= 2:
+            for i in remote:
+                submit(i)
+
+        try:
+            for i, (name, method, args, _) in enumerate(jobs):
+                try:
+                    if i in submitted:
+                        result, deltas = pooled_result(i)
+                        metrics.registry.merge(deltas)
+                    else:
+                        result = getattr(self, method)(*args)
+                except Exception as e:
+                    self.logger.error(f"渲染{name}词云失败: {e}")
+                    result = None
+                if progress:
+                    progress.update(message=f"已生成{name}词云")
+                yield name, result
+        except BaseException:
+            for _, future in submitted.values():
+                future.cancel()
+            raise
+
+    def render_batch(self, items, progress=None):
+        """批量渲染词云
+
+        items: [(名称, 关键词, 标题, 保存路径), ...]
+        未命中缓存的项在进程池中并行渲染（见 run_renders），已缓存的项直接在本进程读取。
+        返回按输入顺序排列的 {名称: 结果}，只包含成功的项。
+        """
+        jobs = []
+        for name, keywords, title, save_path in items:
+            if keywords:
+                jobs.append((name, 'generate_wordcloud', (keywords, title, save_path), self.is_cached(keywords, title)))
+            elif progress:
+                progress.update(message=f"已生成{name}词云")
+        rendered = dict(self.run_renders(jobs, progress))
 
         results = {}
+        for name, _, _, _ in items:
+            result = rendered.get(name)
+            if result:
+                results[name] = result
+                self.logger.info(f"生成{name}词云图成功")
+            elif name in rendered:
+                self.logger.warning(f"生成{name}词云图失败")
+        return results
 
-        for category, keywords in category_data.items():
-            if keywords:
-                title = f"{category}相关词云"
-                save_path = os.path.join(save_dir, f"{category}_wordcloud.png")
+    def layout_wordcloud(self, word_freq, previous=None, style=None, **overrides):
+        """只排布词语（不绘图），返回排布好的词云对象
+
+        previous: 上一期的排布元数据，给出时沿用其中词语的位置（时间趋势词云）
+        style: 预设样式名（见 utils.wordcloud_styles），未给出且没有 overrides 时使用配置中的 STYLE
+        overrides: 覆盖 width/height/max_words/background_color/colormap 等配置
+        颜色映射、取色函数和形状遮罩取自样式注册表，不随每次渲染重新构建。
+        """
+        config, mask, contour = self.layout_config(style, **overrides)
+        with WORDCLOUD_RENDER_SECONDS.time(phase='layout'):
+            wordcloud = IncrementalWordCloud(
+                width=config['width'],
+                height=config['height'],
+                font_path=self.layout_font(word_freq),
+                max_words=config['max_words'],
+                background_color=config['background_color'],
+                color_func=style_registry.color_func(config['colormap']),
+                relative_scaling=config.get('relative_scaling', 0.5),
+                mask=mask.mask if mask is not None else None,
+                random_state=42,
+                **contour
+            )
+            wordcloud.mask_entry = mask
+            return wordcloud.generate_from_frequencies(word_freq, previous=previous)
+
+    def layout_config(self, style=None, **overrides):
+        """排布使用的 (配置, MaskEntry或None, 轮廓参数)，参数含义同 layout_wordcloud"""
+        if style is None and not overrides:
+            style = self.config.get('STYLE')
+        config = dict(self.config)
+        mask, contour = None, {}
+        if style:
+            preset, _, mask, contour = style_registry.style(style)
+            config.update(preset)
+        config.update(overrides)
+        return config, mask, contour
+
+    def layout_document(self, wordcloud, title=None):
+        """排布结果转为紧凑的布局JSON（供浏览器绘制）
+
+        words 中每项为 [词语, x, y, 字号, 旋转角度, 颜色]，(x, y) 为文字左上角的像素坐标，
+        旋转角度为90时文字逆时针旋转、从下往上书写，(x, y) 仍为旋转后文字区域的左上角。
+        """
+        return self._document(wordcloud.width, wordcloud.height, wordcloud.background_color, title, [
+            [word, int(position[1]), int(position[0]), int(font_size), 0 if orientation is None else 90, color]
+            for (word, _), font_size, position, orientation, color in wordcloud.layout_
+        ])
+
+    def metadata_document(self, layout, title=None):
+        """排布元数据（layout_metadata 格式，如渲染缓存中保存的）转为布局JSON，与 layout_document 的结果一致
+
+        尺寸和背景色取自当前配置和样式，只适用于按当前配置排布的结果。
+        """
+        config, _, _ = self.layout_config()
+        return self._document(config['width'], config['height'], config['background_color'], title, [
+            [item['word'], item['position'][1], item['position'][0], item['font_size'],
+             0 if item['orientation'] is None else 90, item['color']]
+            for item in layout
+        ])
+
+    def _document(self, width, height, background, title, words):
+        return {
+            'width': width,
+            'height': height,
+            'background': background,
+            'font_family': self.font_family(),
+            'title': title,
+            'fields': ['word', 'x', 'y', 'size', 'rotation', 'color'],
+            'words': words
+        }
 
-                result = self.generate_wordcloud(
-                    keywords=keywords,
-                    title=title,
-                    save_path=save_path
-                )
+    def font_family(self):
+        """SVG/浏览器使用的字体名（取自字体文件），末尾附通用字体作为后备"""
+        if not self.config['font_path']:
+            return 'sans-serif'
+        family = self.title_font(16).getname()[0]
+        return f"'{family}', sans-serif" if family else 'sans-serif'
+
+    def render_svg(self, document):
+        """按布局JSON生成SVG（矢量文字，不做栅格化），标题栏与PNG输出一致"""
+        width, height = document['width'], document['height']
+        header = max(16, width // 32) * 2 if document.get('title') else 0
+        parts = [
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height + header}" '
+            f'viewBox="0 0 {width} {height + header}">',
+            # 词语的 (x, y) 为文字顶部，对应PIL按上升线定位的绘制方式
+            '<style>g text{dominant-baseline:text-before-edge}</style>',
+            f'<rect width="100%" height="100%" fill={quoteattr(document["background"] or "white")}/>'
+        ]
+        font_family = document['font_family']
+        if self.config.get('SVG_EMBED_FONT') and self.config['font_path']:
+            # 内嵌只含图中字符的WOFF子集字体，浏览器不依赖本机字体
+            text = (document.get('title') or '') + ''.join(item[0] for item in document['words'])
+            source = self.font_service.embed(self.config['font_path'], text)
+            if source:
+                parts.append(f"<style>@font-face{{font-family:'wordcloud';src:url({source})}}</style>")
+                font_family = f"'wordcloud', {font_family}"
+        if header:
+            background = ImageColor.getrgb(document['background'] or 'white')[:3]
+            luminance = 0.299 * background[0] + 0.587 * background[1] + 0.114 * background[2]
+            parts.append(
+                f'<text x="{width / 2:g}" y="{header / 2:g}" font-family={quoteattr(font_family)} '
+                f'font-size="{header // 2}" text-anchor="middle" '
+                f'dominant-baseline="central" fill="{"#000" if luminance > 128 else "#fff"}">'
+                f'{escape(document["title"])}</text>'
+            )
+        parts.append(f'<g font-family={quoteattr(font_family)}>')
+        for word, x, y, size, rotation, color in document['words']:
+            if rotation:
+                # 旋转后文字末端在区域顶部：以左上角为原点逆时针旋转，文字向下延伸
+                parts.append(f'<text transform="translate({x},{y + header}) rotate(-90)" text-anchor="end" '
+                             f'font-size="{size}" fill={quoteattr(color)}>{escape(word)}</text>')
+            else:
+                parts.append(f'<text x="{x}" y="{y + header}" font-size="{size}" '
+                             f'fill={quoteattr(color)}>{escape(word)}</text>')
+        parts.append('</g></svg>')
+        return ''.join(parts)
+
+    def render_wordcloud(self, word_freq, title, renderer=None, previous=None):
+        """排布并绘制词云，返回 (PNG字节, 排布元数据)
+
+        previous: 上一期的排布元数据，给出时沿用其中词语的位置（时间趋势词云）
+        """
+        wordcloud = self.layout_wordcloud(word_freq, previous=previous)
+
+        if (renderer or self.renderer) == 'pil':
+            with WORDCLOUD_RENDER_SECONDS.time(phase='encode'):
+                image = self.add_title(wordcloud.to_image(), title, wordcloud.background_color)
+                image_bytes = self.encode_png(image)
+            return image_bytes, layout_metadata(wordcloud)
+
+        def draw(figure):
+            ax = figure.subplots()
+            ax.imshow(wordcloud, interpolation='bilinear')
+            ax.axis('off')
+            ax.set_title(title, fontsize=16, pad=20)
+            figure.tight_layout(pad=0)
+
+        with WORDCLOUD_RENDER_SECONDS.time(phase='encode'):
+            # 池化的Agg画布绘图（不经过pyplot，可在多个工作线程中同时渲染），只编码一次PNG
+            image_bytes = chart_renderer.render_png(draw, (12, 8), dpi=300)
+
+        return image_bytes, layout_metadata(wordcloud)
+
+    def title_font(self, size):
+        """标题字体（按字号缓存）"""
+        font = self._title_fonts.get(size)
+        if font is None:
+            try:
+                font = ImageFont.truetype(self.config['font_path'], size) if self.config['font_path'] \
+                    else ImageFont.load_default(size)
+            except OSError:
+                font = ImageFont.load_default(size)
+            self._title_fonts[size] = font
+        return font
+
+    def add_title(self, image, title, background_color=None):
+        """在图片上方加标题栏（PIL绘制，不经过matplotlib）"""
+        if not title:
+            return image
+        background = ImageColor.getrgb(background_color or self.config['background_color'] or 'white')[:3]
+        # 按背景亮度选择黑色或白色文字
+        luminance = 0.299 * background[0] + 0.587 * background[1] + 0.114 * background[2]
+        text_color = (0, 0, 0) if luminance > 128 else (255, 255, 255)
+
+        font_size = max(16, image.width // 32)
+        header = font_size * 2
+        canvas = Image.new('RGB', (image.width, image.height + header), background)
+        canvas.paste(image.convert('RGB'), (0, header))
+        draw = ImageDraw.Draw(canvas)
+        draw.text((image.width / 2, header / 2), title, fill=text_color, font=self.title_font(font_size), anchor='mm')
+        return canvas
 
-                if result:
-                    results[category] = result
-                    self.logger.info(f"生成{category}词云图成功")
-                else:
-                    self.logger.warning(f"生成{category}词云图失败")
+    @staticmethod
+    def encode_png(image):
+        """编码PNG（只编码一次，保存文件和base64共用）"""
+        buffer = io.BytesIO()
+        image.save(buffer, format='PNG', compress_level=6)
+        return buffer.getvalue()
+
+    def generate_category_wordclouds(self, category_data, save_dir="wordclouds", progress=None):
+        """生成分类词云图（并行渲染，结果按分类顺序返回）"""
+        if not os.path.exists(save_dir):
+            os.makedirs(save_dir)
 
-        return results
+        return self.render_batch([
+            (category, keywords, f"{category}相关词云", os.path.join(save_dir, f"{category}_wordcloud.png"))
+            for category, keywords in category_data.items()
+        ], progress=progress)
+
+    def generate_interactive_wordcloud(self, keywords, title="交互式词云", formats=None, layout=None):
+        """生成交互式词云数据（用于前端展示）
 
-    def generate_interactive_wordcloud(self, keywords, title="交互式词云"):
-        """生成交互式词云数据（用于前端展示）"""
+        formats: 附带的矢量输出，可包含 'layout'（布局JSON）和 'svg'，
+        默认取 WORDCLOUD_CONFIG['INTERACTIVE_FORMATS']。只排布一次，不栅格化。
+        layout: 同一份关键词的PNG词云的排布元数据（见 generate_wordcloud_with_layout），给出时直接使用，不再排布。
+        data 只包含预处理后权重最高的 max_words 个词（按值降序），wordCount、maxValue 和 minValue 为输入的词数和最大/最小值。
+        """
         if not keywords:
             return None
 
-        # 准备数据
-        if isinstance(keywords, list):
-            word_data = [{'name': word, 'value': int(score * 1000)} for word, score in keywords]
-        elif isinstance(keywords, dict):
-            word_data = [{'name': word, 'value': int(score * 1000)} for word, score in keywords.items()]
-        else:
+        # 准备数据（预处理已按权重降序选出前 max_words 个词，不再对完整词表排序）
+        word_freq = self.word_frequencies(keywords)
+        if word_freq is None:
             return None
+        top, stats = prepare_frequencies(word_freq, self.prepare_max_words(),
+                                         merge=self.config.get('MERGE_VARIANTS', True))
+        word_data = [{'name': word, 'value': int(score * 1000)} for word, score in top.items()]
 
-        # 按值排序
-        word_data.sort(key=lambda x: x['value'], reverse=True)
-
-        return {
+        result = {
             'title': title,
             'data': word_data,
-            'maxValue': max([item['value'] for item in word_data]) if word_data else 0,
-            'minValue': min([item['value'] for item in word_data]) if word_data else 0
+            'maxValue': int(stats['max'] * 1000),
+            'minValue': int(stats['min'] * 1000),
+            'wordCount': stats['count']
         }
 
-    def create_comparison_wordcloud(self, data_sets, titles, save_path=None):
-        """创建对比词云图"""
+        if formats is None:
+            formats = self.config.get('INTERACTIVE_FORMATS', ())
+        if formats and word_data:
+            try:
+                if layout:
+                    document = self.metadata_document(layout, title)
+                else:
+                    word_freq = quantize_frequencies(top, self.config.get('FREQUENCY_BUCKETS'))
+                    document = self.layout_document(self.layout_wordcloud(word_freq), title)
+                if 'layout' in formats:
+                    result['layout'] = document
+                if 'svg' in formats:
+                    result['svg'] = self.render_svg(document)
+            except Exception as e:
+                self.logger.error(f"生成词云布局失败: {e}")
+
+        return result
+
+    def panel_key(self, word_freq, title):
+        """对比词云面板的渲染缓存键"""
+        return render_key(word_freq, dict(self.config, **COMPARISON_PANEL), title, renderer='panel')
+
+    def render_panel(self, keywords, title):
+        """渲染对比词云的单个面板（COMPARISON_PANEL 尺寸，带标题），返回PNG字节，关键词为空时返回None"""
+        word_freq = self.word_frequencies(keywords)
+        if not word_freq:
+            return None
+        word_count = len(word_freq)
+        word_freq, _ = self.prepare_frequencies(word_freq, COMPARISON_PANEL['max_words'])
+
+        cache_key = None
+        if self.render_cache is not None:
+            cache_key = self.panel_key(word_freq, title)
+            cached = self.render_cache.get(cache_key)
+            if cached is not None:
+                return cached[0]
+
+        wordcloud = self.layout_wordcloud(word_freq, **COMPARISON_PANEL)
+        with WORDCLOUD_RENDER_SECONDS.time(phase='encode'):
+            image = self.add_title(wordcloud.to_image(), title, COMPARISON_PANEL['background_color'])
+            image_bytes = self.encode_png(image)
+        WORDCLOUD_IMAGE_BYTES.observe(len(image_bytes))
+        if cache_key is not None:
+            self.render_cache.put(cache_key, image_bytes, {
+                'title': title,
+                'width': COMPARISON_PANEL['width'],
+                'height': COMPARISON_PANEL['height'],
+                'word_count': word_count,
+                'layout': layout_metadata(wordcloud)
+            })
+        return image_bytes
+
+    def create_comparison_wordcloud(self, data_sets, titles, save_path=None, columns=None, tiles_dir=None,
+                                    progress=None):
+        """创建对比词云图
+
+        每个数据集独立渲染为一个面板（见 run_renders，可在进程池中并行），再按顺序拼成网格图片；
+        某个数据集渲染失败时只留空该面板。主进程只保留网格画布和当前拼接的一个面板，
+        面板数量多（如上百家门店）时内存按面板数线性增长而不是整张matplotlib大图。
+
+        columns: 网格列数，默认4个以内横排一行，更多时接近正方形
+        tiles_dir: 给出时每个面板另存为 <tiles_dir>/panel_<序号>.png；此时只有指定 save_path 才生成网格图
+        """
         if len(data_sets) != len(titles):
             self.logger.error("数据集数量与标题数量不匹配")
             return None
 
         try:
-            fig, axes = plt.subplots(1, len(data_sets), figsize=(6 * len(data_sets), 6))
-
-            if len(data_sets) == 1:
-                axes = [axes]
-
             results = []
-
+            jobs = []
+            slots = []
             for i, (keywords, title) in enumerate(zip(data_sets, titles)):
-                if isinstance(keywords, list):
-                    word_freq = {word: score for word, score in keywords}
-                elif isinstance(keywords, dict):
-                    word_freq = keywords
-                else:
-                    continue
-
+                word_freq = self.word_frequencies(keywords)
                 if not word_freq:
                     continue
-
-                # 生成词云
-                wordcloud = WordCloud(
-                    width=400,
-                    height=400,
-                    font_path=self.config['font_path'],
-                    max_words=100,
-                    background_color='white',
-                    colormap=plt.cm.Set3,
-                    relative_scaling=0.5,
-                    random_state=42
-                ).generate_from_frequencies(word_freq)
-
-                # 绘制
-                axes[i].imshow(wordcloud, interpolation='bilinear')
-                axes[i].set_title(title, fontsize=14)
-                axes[i].axis('off')
-
+                jobs.append((title, 'render_panel', (word_freq, title), self.is_cached(word_freq, title, panel=True)))
+                slots.append(i)
                 results.append({
                     'title': title,
                     'word_count': len(word_freq)
                 })
 
-            plt.tight_layout()
+            count = max(len(data_sets), 1)
+            columns = max(1, min(columns or (count if count <= 4 else math.ceil(math.sqrt(count))), count))
+            rows = math.ceil(count / columns)
+            panel_width = COMPARISON_PANEL['width']
+            panel_height = COMPARISON_PANEL['height'] + max(16, panel_width // 32) * 2
+
+            composite = tiles_dir is None or save_path is not None
+            canvas = Image.new('RGB', (panel_width * columns, panel_height * rows),
+                               COMPARISON_PANEL['background_color']) if composite else None
+            if tiles_dir:
+                os.makedirs(tiles_dir, exist_ok=True)
+
+            # 按顺序逐个拼接，拼接后立即释放面板数据
+            for (i, result), (_, image_bytes) in zip(zip(slots, results), self.run_renders(jobs, progress)):
+                if not image_bytes:
+                    result['error'] = '渲染失败'
+                    continue
+                if tiles_dir:
+                    result['save_path'] = os.path.join(tiles_dir, f"panel_{i:03d}.png")
+                    with storage.atomic_write(result['save_path'], codec='raw') as f:
+                        f.write(image_bytes)
+                if canvas is not None:
+                    with Image.open(io.BytesIO(image_bytes)) as panel:
+                        canvas.paste(panel.convert('RGB'), (panel_width * (i % columns), panel_height * (i // columns)))
+
+            if canvas is None:
+                return {'save_path': None, 'results': results, 'columns': columns, 'rows': rows}
+
+            with WORDCLOUD_RENDER_SECONDS.time(phase='encode'):
+                image_bytes = self.encode_png(canvas)
+            canvas.close()
 
             # 保存
             if save_path:
-                plt.savefig(save_path, dpi=300, bbox_inches='tight')
+                with storage.atomic_write(save_path, codec='raw') as f:
+                    f.write(image_bytes)
                 self.logger.info(f"对比词云图已保存到: {save_path}")
 
             # 转换为base64
-            buffer = io.BytesIO()
-            plt.savefig(buffer, format='png', dpi=300, bbox_inches='tight')
-            buffer.seek(0)
-            image_base64 = base64.b64encode(buffer.read()).decode()
-            buffer.close()
-
-            plt.close()
+            image_base64 = base64.b64encode(image_bytes).decode()
 
             return {
                 'image_base64': image_base64,
                 'save_path': save_path,
-                'results': results
+                'results': results,
+                'columns': columns,
+                'rows': rows
             }
 
         except Exception as e:
             self.logger.error(f"生成对比词云图失败: {e}")
             return None
 
-    def generate_trend_wordcloud(self, time_keywords, save_dir="trend_wordclouds"):
-        """生成时间趋势词云"""
+    def generate_trend_wordcloud(self, time_keywords, save_dir="trend_wordclouds", progress=None):
+        """生成时间趋势词云
+
+        TREND_LAYOUT 为 'incremental' 时按时间顺序逐期生成，每期以上一期的排布为起点，
+        只重新排布新出现或字号变化较大的词；为 'independent' 时各期独立排布，在进程池中并行渲染。
+        """
         if not os.path.exists(save_dir):
             os.makedirs(save_dir)
 
-        results = {}
+        items = [
+            (time_period, keywords, f"{time_period} 词云趋势", os.path.join(save_dir, f"trend_{time_period}.png"))
+            for time_period, keywords in time_keywords.items()
+        ]
+        if self.config.get('TREND_LAYOUT', 'incremental') != 'incremental':
+            return self.render_batch(items, progress=progress)
 
-        for time_period, keywords in time_keywords.items():
+        results = {}
+        previous = None
+        for time_period, keywords, title, save_path in items:
             if keywords:
-                title = f"{time_period} 词云趋势"
-                save_path = os.path.join(save_dir, f"trend_{time_period}.png")
-
-                result = self.generate_wordcloud(
-                    keywords=keywords,
-                    title=title,
-                    save_path=save_path
-                )
-
+                result, layout = self._generate_wordcloud(keywords, title, save_path, previous=previous)
                 if result:
                     results[time_period] = result
+                    self.logger.info(f"生成{time_period}词云图成功")
+                else:
+                    self.logger.warning(f"生成{time_period}词云图失败")
+                if layout:
+                    previous = layout
+
+            if progress:
+                progress.update(message=f"已生成{time_period}词云")
 
         return results
 
     def save_wordcloud_data(self, data, filename):
         """保存词云数据"""
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            storage.dump_json(data, filename)
             self.logger.info(f"词云数据已保存到: {filename}")
         except Exception as e:
             self.logger.error(f"保存词云数据失败: {e}")
 
 
 class WordCloudStyler:
-    """词云样式定制器"""
+    """词云样式定制器（颜色映射和预设由样式注册表缓存，见 utils.wordcloud_styles）"""
 
     @staticmethod
     def get_color_schemes():
         """获取可用的颜色方案"""
-        return {
-            'default': 'viridis',
-            'warm': 'Reds',
-            'cool': 'Blues',
-            'forest': 'Greens',
-            'sunset': 'Oranges',
-            'ocean': 'Blues',
-            'rainbow': 'rainbow',
-            'pastel': 'Pastel1',
-            'dark': 'Dark2'
-        }
+        return dict(style_registry.color_schemes)
 
     @staticmethod
     def create_custom_colormap(colors):
-        """创建自定义颜色映射"""
-        from matplotlib.colors import LinearSegmentedColormap
-        return LinearSegmentedColormap.from_list("custom", colors)
+        """创建自定义颜色映射（注册表缓存对象的副本，调用方可以修改，如 set_bad/set_over）"""
+        return style_registry.colormap(tuple(colors)).copy()
 
     @staticmethod
     def get_preset_configs():
-        """获取预设配置"""
+        """获取预设配置（可直接作为 WordCloud 的参数）
+
+        形状和轮廓（mask、contour_width、contour_color）由样式注册表解析，不在此返回，
+        使用形状请通过配置中的 STYLE 或 layout_wordcloud(style=...)。
+        """
         return {
-            'business': {
-                'width': 1200,
-                'height': 800,
-                'max_words': 200,
-                'background_color': 'white',
-                'colormap': 'Blues',
-                'relative_scaling': 0.5
-            },
-            'artistic': {
-                'width': 800,
-                'height': 600,
-                'max_words': 150,
-                'background_color': 'black',
-                'colormap': 'plasma',
-                'relative_scaling': 0.6
-            },
-            'minimal': {
-                'width': 600,
-                'height': 400,
-                'max_words': 100,
-                'background_color': 'white',
-                'colormap': 'Greys',
-                'relative_scaling': 0.3
+            name: {k: v for k, v in preset.items() if k not in STYLE_ONLY_KEYS}
+            for name, preset in style_registry.presets.items()
+        }
+
+    @staticmethod
+    def get_mask_shapes():
+        """获取可用的词云形状"""
+        return list(SHAPES)
+
+
+def benchmark(renders=3, words=200):
+    """PIL单次编码与matplotlib（dpi=300）两种输出方式的耗时、内存峰值和图片大小对比"""
+    import time
+    import random
+    import tracemalloc
+
+    vocabulary = [f"词{i}" for i in range(words)]
+    keywords = [[word, random.random()] for word in vocabulary]
+
+    results = {}
+    for renderer in ('matplotlib', 'pil'):
+        generator = WordCloudGenerator()
+        generator.render_cache = None
+        generator.renderer = renderer
+        word_freq = dict(keywords)
+        generator.render_wordcloud(word_freq, '基准测试')  # 预热（字体、导入）
+
+        elapsed = []
+        tracemalloc.start()
+        for _ in range(renders):
+            start = time.perf_counter()
+            image_bytes, _ = generator.render_wordcloud(word_freq, '基准测试')
+            elapsed.append(time.perf_counter() - start)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            size = image.size
+        results[renderer] = {
+            'mean_ms': sum(elapsed) / len(elapsed) * 1e3,
+            'peak_mb': peak / 1024 / 1024,
+            'png_kb': len(image_bytes) / 1024,
+            'image_size': size
+        }
+    return results
+
+
+def batch_benchmark(items=8, words=100):
+    """分类/趋势词云批量渲染：逐个渲染与进程池并行渲染的耗时对比（不使用渲染缓存）"""
+    import time
+    import random
+    import tempfile
+
+    vocabulary = [f"词{i}" for i in range(words)]
+    categories = {f"分类{i}": [[word, random.random()] for word in vocabulary] for i in range(items)}
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        generator = WordCloudGenerator()
+        generator.render_cache = None
+        generator.render_wordcloud({'预热': 1}, '预热')
+
+        for mode, workers in (('sequential', 1), ('pool', generator.config.get('RENDER_WORKERS') or 4)):
+            generator.config = dict(generator.config, RENDER_WORKERS=workers)
+            if workers > 1:
+                # 进程池启动和子进程预热单独计时
+                start = time.perf_counter()
+                list(get_render_pool(workers).map(int, range(workers)))
+                results['pool_startup_ms'] = (time.perf_counter() - start) * 1e3
+            start = time.perf_counter()
+            rendered = generator.generate_category_wordclouds(categories, save_dir=os.path.join(tmp_dir, mode))
+            results[mode] = {
+                'total_ms': (time.perf_counter() - start) * 1e3,
+                'rendered': len(rendered),
+                'ordered': list(rendered) == list(categories)
             }
+        shutdown_render_pool()
+    results['cpus'] = os.cpu_count()
+    return results
+
+
+def vector_benchmark(words=200):
+    """同一份词频的栅格输出（base64）与SVG、布局JSON的生成耗时和传输体积对比"""
+    import time
+    import random
+
+    vocabulary = [f"词{i}" for i in range(words)]
+    word_freq = {word: random.random() for word in vocabulary}
+    generator = WordCloudGenerator()
+    generator.render_cache = None
+    generator.render_wordcloud(word_freq, '预热')
+
+    results = {}
+    for renderer in ('matplotlib', 'pil'):
+        start = time.perf_counter()
+        image_bytes, _ = generator.render_wordcloud(word_freq, '基准测试', renderer=renderer)
+        results[f"png ({renderer})"] = {
+            'ms': (time.perf_counter() - start) * 1e3,
+            'kb': len(base64.b64encode(image_bytes)) / 1024
+        }
+    for output in ('svg', 'layout'):
+        start = time.perf_counter()
+        result = generator.generate_vector_wordcloud(word_freq, '基准测试', output=output)
+        payload = result['svg'] if output == 'svg' else json.dumps(result['layout'], ensure_ascii=False)
+        results[output] = {
+            'ms': (time.perf_counter() - start) * 1e3,
+            'kb': len(payload.encode('utf-8')) / 1024
         }
+    return results
+
+
+def comparison_benchmark(outlets=(4, 32, 120), words=60):
+    """多门店对比词云：面板数与总耗时、网格画布大小、网格图片大小（不使用渲染缓存）"""
+    import time
+    import random
+
+    vocabulary = [f"词{i}" for i in range(words * 3)]
+    generator = WordCloudGenerator()
+    generator.render_cache = None
+    generator.render_panel({'预热': 1}, '预热')
+
+    results = {}
+    for count in outlets:
+        data_sets = [{word: random.random() for word in random.sample(vocabulary, words)} for _ in range(count)]
+        titles = [f"门店{i + 1}" for i in range(count)]
+        start = time.perf_counter()
+        result = generator.create_comparison_wordcloud(data_sets, titles)
+        elapsed = time.perf_counter() - start
+        panel_height = COMPARISON_PANEL['height'] + max(16, COMPARISON_PANEL['width'] // 32) * 2
+        results[count] = {
+            'total_ms': elapsed * 1e3,
+            'panel_ms': elapsed / count * 1e3,
+            # 主进程中除网格画布外只同时保留一个面板
+            'canvas_mb': result['columns'] * result['rows'] * COMPARISON_PANEL['width'] * panel_height * 3 / 1024 / 1024,
+            'grid': f"{result['columns']}x{result['rows']}",
+            'png_kb': len(result['image_base64']) * 3 / 4 / 1024
+        }
+    shutdown_render_pool()
+    return results
 
 
 if __name__ == "__main__":
@@ -344,4 +998,22 @@ if __name__ == "__main__":
         print(f"图片路径: {result['save_path']}")
         print(f"词汇数量: {result['word_count']}")
     else:
-        print("词云生成失败")
\ No newline at end of file
+        print("词云生成失败")
+
+    # 基准测试
+    for renderer, stats in benchmark().items():
+        print(f"{renderer:<11} {stats['mean_ms']:.0f} ms/次  内存峰值 {stats['peak_mb']:.1f} MB  "
+              f"PNG {stats['png_kb']:.0f} KB  {stats['image_size'][0]}x{stats['image_size'][1]}")
+
+    stats = batch_benchmark()
+    print(f"批量渲染（{stats['cpus']}核，进程池启动 {stats['pool_startup_ms']:.0f} ms）:")
+    for mode in ('sequential', 'pool'):
+        print(f"{mode:<11} {stats[mode]['total_ms']:.0f} ms  成功 {stats[mode]['rendered']}  "
+              f"顺序一致 {stats[mode]['ordered']}")
+
+    for output, stats in vector_benchmark().items():
+        print(f"{output:<18} {stats['ms']:.0f} ms  {stats['kb']:.1f} KB")
+
+    for count, stats in comparison_benchmark().items():
+        print(f"对比词云 {count:>3} 家门店（{stats['grid']}）: {stats['total_ms']:.0f} ms，"
+              f"每面板 {stats['panel_ms']:.0f} ms，网格画布 {stats['canvas_mb']:.1f} MB，PNG {stats['png_kb']:.0f} KB")
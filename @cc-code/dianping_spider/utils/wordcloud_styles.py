@@ -0,0 +1,293 @@
+import os
+import threading
+
+import numpy as np
+from PIL import Image, ImageFilter
+from wordcloud import get_single_color_func
+from wordcloud.wordcloud import colormap_color_func
+
+
+# 颜色方案名 -> matplotlib颜色映射
+COLOR_SCHEMES = {
+    'default': 'viridis',
+    'warm': 'Reds',
+    'cool': 'Blues',
+    'forest': 'Greens',
+    'sunset': 'Oranges',
+    'ocean': 'Blues',
+    'rainbow': 'rainbow',
+    'pastel': 'Pastel1',
+    'dark': 'Dark2'
+}
+
+# 预设中只由注册表解析的键（形状名和轮廓），不能直接作为 WordCloud 的参数
+STYLE_ONLY_KEYS = ('mask', 'contour_width', 'contour_color')
+
+# 预设样式：词云配置，mask 为形状名（SHAPES 或 register_mask 注册的图片形状）
+PRESETS = {
+    'business': {
+        'width': 1200,
+        'height': 800,
+        'max_words': 200,
+        'background_color': 'white',
+        'colormap': 'Blues',
+        'relative_scaling': 0.5
+    },
+    'artistic': {
+        'width': 800,
+        'height': 600,
+        'max_words': 150,
+        'background_color': 'black',
+        'colormap': 'plasma',
+        'relative_scaling': 0.6
+    },
+    'minimal': {
+        'width': 600,
+        'height': 400,
+        'max_words': 100,
+        'background_color': 'white',
+        'colormap': 'Greys',
+        'relative_scaling': 0.3
+    },
+    'badge': {
+        'width': 600,
+        'height': 600,
+        'max_words': 150,
+        'background_color': 'white',
+        'colormap': 'Reds',
+        'relative_scaling': 0.5,
+        'mask': 'circle',
+        'contour_width': 3,
+        'contour_color': '#c0392b'
+    },
+    'heart': {
+        'width': 700,
+        'height': 600,
+        'max_words': 150,
+        'background_color': 'white',
+        'colormap': 'RdPu',
+        'relative_scaling': 0.5,
+        'mask': 'heart'
+    }
+}
+
+
+def _circle(x, y):
+    return x ** 2 + y ** 2 <= 1
+
+
+def _ellipse(x, y):
+    return x ** 2 + (y / 0.7) ** 2 <= 1
+
+
+def _heart(x, y):
+    # 心形线 (x²+y²-1)³ - x²y³ <= 0，y轴向上
+    x, y = x * 1.25, -y * 1.25 + 0.15
+    return (x ** 2 + y ** 2 - 1) ** 3 - x ** 2 * y ** 3 <= 0
+
+
+def _rounded(x, y, radius=0.3):
+    dx = np.maximum(np.abs(x) - (1 - radius), 0)
+    dy = np.maximum(np.abs(y) - (1 - radius), 0)
+    return dx ** 2 + dy ** 2 <= radius ** 2
+
+
+# 内置形状：在 [-1, 1] 坐标系中返回可绘制区域
+SHAPES = {
+    'circle': _circle,
+    'ellipse': _ellipse,
+    'heart': _heart,
+    'rounded': _rounded,
+}
+
+
+class MaskEntry:
+    """预先计算好的遮罩
+
+    mask 为 WordCloud 使用的 uint8 数组（255表示不可绘制），boolean 为不可绘制区域，
+    integral 为遮罩的积分图（排布时的初始占用图，每次排布复制一份），
+    轮廓按输出尺寸和线宽缓存。
+    """
+
+    __slots__ = ('mask', 'boolean', 'integral', '_contours', '_lock')
+
+    def __init__(self, mask):
+        self.mask = mask
+        self.boolean = mask == 255
+        # 与 wordcloud 的 IntegralOccupancyMap 一致的累加顺序
+        self.integral = np.cumsum(np.cumsum(255 * self.boolean, axis=1), axis=0).astype(np.uint32)
+        self._contours = {}
+        self._lock = threading.Lock()
+
+    def contour(self, size, width):
+        """遮罩轮廓（与 WordCloud._draw_contour 相同的算法），返回 HxWx3 布尔数组"""
+        key = (size, width)
+        contour = self._contours.get(key)
+        if contour is None:
+            image = Image.fromarray((self.boolean * 255).astype(np.uint8)).resize(size)
+            edges = np.array(image.filter(ImageFilter.FIND_EDGES))
+            edges[[0, -1], :] = 0
+            edges[:, [0, -1]] = 0
+            blurred = Image.fromarray(edges).filter(ImageFilter.GaussianBlur(radius=width / 10))
+            contour = np.array(blurred) > 0
+            contour = np.dstack((contour, contour, contour))
+            with self._lock:
+                self._contours[key] = contour
+        return contour
+
+
+class StyleRegistry:
+    """词云样式注册表
+
+    颜色映射、取色函数和遮罩（含积分图和轮廓）按预设和尺寸只构建一次，之后的渲染直接复用；
+    preload() 在渲染子进程初始化时预先构建全部预设。
+    """
+
+    def __init__(self, presets=None, color_schemes=None):
+        self.presets = dict(PRESETS if presets is None else presets)
+        self.color_schemes = dict(COLOR_SCHEMES if color_schemes is None else color_schemes)
+        self._lock = threading.Lock()
+        self._colormaps = {}
+        self._color_funcs = {}
+        self._masks = {}
+        self._mask_images = {}
+
+    def _cached(self, cache, key, factory):
+        value = cache.get(key)
+        if value is None:
+            value = factory()
+            with self._lock:
+                value = cache.setdefault(key, value)
+        return value
+
+    def colormap(self, spec):
+        """颜色映射：名称（或颜色方案名）或颜色列表（自定义线性渐变）"""
+        if isinstance(spec, (list, tuple)):
+            key = tuple(spec)
+
+            def factory():
+                from matplotlib.colors import LinearSegmentedColormap
+                return LinearSegmentedColormap.from_list('custom', list(key))
+        else:
+            key = self.color_schemes.get(spec, spec)
+
+            def factory():
+                import matplotlib
+                return matplotlib.colormaps[key]
+        return self._cached(self._colormaps, key, factory)
+
+    def color_func(self, spec):
+        """按颜色映射随机取色的函数（WordCloud 的 color_func）"""
+        key = tuple(spec) if isinstance(spec, (list, tuple)) else self.color_schemes.get(spec, spec)
+        return self._cached(self._color_funcs, ('colormap', key), lambda: colormap_color_func(self.colormap(spec)))
+
+    def single_color_func(self, color):
+        """同一色相、随机明度的取色函数"""
+        return self._cached(self._color_funcs, ('single', color), lambda: get_single_color_func(color))
+
+    def register_mask(self, name, path):
+        """注册图片形状：深色（非白色）区域为可绘制区域，按使用的尺寸缩放"""
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        with self._lock:
+            self._mask_images[name] = path
+            for key in [key for key in self._masks if key[0] == name]:
+                del self._masks[key]
+
+    def mask(self, name, width, height):
+        """指定形状和尺寸的遮罩（MaskEntry）"""
+        return self._cached(self._masks, (name, width, height), lambda: MaskEntry(self._build_mask(name, width, height)))
+
+    def _build_mask(self, name, width, height):
+        path = self._mask_images.get(name)
+        if path is not None:
+            with Image.open(path) as image:
+                gray = np.array(image.convert('L').resize((width, height)))
+            return np.where(gray > 200, 255, 0).astype(np.uint8)
+
+        shape = SHAPES.get(name)
+        if shape is None:
+            raise ValueError(f"未知的词云形状: {name}，可选: {', '.join(list(SHAPES) + list(self._mask_images))}")
+        # 按短边等比例放置形状，保持形状不变形
+        scale = min(width, height) / 2
+        y, x = np.ogrid[:height, :width]
+        inside = shape((x - width / 2 + 0.5) / scale, (y - height / 2 + 0.5) / scale)
+        return np.where(inside, 0, 255).astype(np.uint8)
+
+    def style(self, name):
+        """预设样式解析结果：(配置覆盖项, color_func, MaskEntry或None, 轮廓参数)"""
+        preset = self.presets.get(name)
+        if preset is None:
+            raise ValueError(f"未知的词云样式: {name}，可选: {', '.join(self.presets)}")
+        config = {k: v for k, v in preset.items() if k not in STYLE_ONLY_KEYS}
+        color_func = self.color_func(preset.get('colormap', 'viridis'))
+        mask = self.mask(preset['mask'], preset['width'], preset['height']) if preset.get('mask') else None
+        contour = {'contour_width': preset.get('contour_width', 0), 'contour_color': preset.get('contour_color', 'black')}
+        return config, color_func, mask, contour
+
+    def preload(self, names=None):
+        """预先构建预设用到的颜色映射、取色函数和遮罩，返回构建的预设数"""
+        names = list(self.presets) if names is None else names
+        for name in names:
+            self.style(name)
+        return len(names)
+
+
+# 全局样式注册表
+registry = StyleRegistry()
+
+
+def benchmark(renders=5, words=120):
+    """带形状的预设：每次重新构建颜色映射、遮罩和轮廓的WordCloud与复用注册表对象的渲染耗时对比"""
+    import time
+    import random
+
+    from wordcloud import WordCloud
+
+    from utils.incremental_layout import IncrementalWordCloud
+    from utils.wordcloud_generator import WordCloudGenerator
+
+    font_path = WordCloudGenerator().config['font_path']
+    word_freq = {f"词{i}": random.random() for i in range(words)}
+    preset = PRESETS['badge']
+    results = {}
+
+    start = time.perf_counter()
+    fresh = StyleRegistry()
+    fresh.preload()
+    results['preload_ms'] = (time.perf_counter() - start) * 1e3
+
+    def rebuilt():
+        mask = StyleRegistry()._build_mask(preset['mask'], preset['width'], preset['height'])
+        wordcloud = WordCloud(width=preset['width'], height=preset['height'], font_path=font_path,
+                              max_words=preset['max_words'], background_color=preset['background_color'],
+                              colormap=preset['colormap'], relative_scaling=preset['relative_scaling'], mask=mask,
+                              contour_width=preset['contour_width'], contour_color=preset['contour_color'],
+                              random_state=42)
+        return wordcloud.generate_from_frequencies(word_freq).to_image()
+
+    def cached():
+        config, color_func, mask, contour = registry.style('badge')
+        wordcloud = IncrementalWordCloud(font_path=font_path, color_func=color_func, random_state=42,
+                                         mask=mask.mask, **config, **contour)
+        wordcloud.mask_entry = mask
+        return wordcloud.generate_from_frequencies(word_freq).to_image()
+
+    for name, render in (('rebuilt', rebuilt), ('registry', cached)):
+        render()
+        start = time.perf_counter()
+        for _ in range(renders):
+            image = render()
+        results[f"{name}_ms"] = (time.perf_counter() - start) / renders * 1e3
+        results[f"{name}_pixels"] = np.asarray(image)
+    results['identical'] = bool(np.array_equal(results.pop('rebuilt_pixels'), results.pop('registry_pixels')))
+    return results
+
+
+if __name__ == "__main__":
+    # 基准测试
+    stats = benchmark()
+    print(f"预加载全部预设: {stats['preload_ms']:.1f} ms")
+    print(f"每次重新构建: {stats['rebuilt_ms']:.0f} ms/次")
+    print(f"复用注册表:   {stats['registry_ms']:.0f} ms/次")
+    print(f"输出图片一致: {stats['identical']}")
@@ -1,15 +1,26 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, Response, render_template, request, jsonify, send_file, send_from_directory, stream_with_context
+import io
 import json
 import os
-from datetime import datetime
+import hashlib
+import time
 import threading
-import queue
+import mimetypes
+from datetime import datetime
 
-from config import WEB_CONFIG
-from spiders.dianping_spider import DianpingSpider
-from utils.text_analyzer import CommentAnalyzer
-from utils.wordcloud_generator import WordCloudGenerator
-from utils.data_utils import DataManager, Logger
+from config import WEB_CONFIG, TASK_CONFIG, WORDCLOUD_CONFIG
+from utils.data_utils import DataManager, Logger, ProgressReporter
+from utils.task_pool import TaskPool, TaskCancelled, TaskTimeout
+from utils.process_pool import ProcessTaskPool
+from utils.task_store import TaskStore, FINAL_STATUSES
+from utils.single_flight import SingleFlight, flight_key, new_task_id
+from utils.response_cache import ResponseCache
+from utils.render_cache import RenderCache
+from utils.event_broker import EventBroker
+from utils.analysis_view import AnalysisDocument, CursorExpired
+from utils import analysis_view
+from utils import metrics
+from web import tasks
 
 
 app = Flask(__name__)
@@ -17,83 +28,245 @@ logger = Logger.setup(__name__)
 
 # 全局变量
 data_manager = DataManager()
-analyzer = CommentAnalyzer()
-wordcloud_gen = WordCloudGenerator()
 
-# 任务队列
-task_queue = queue.Queue()
-task_results = {}
+# 任务状态
+task_store = TaskStore(
+    TASK_CONFIG['STORE_DIR'],
+    max_entries=TASK_CONFIG['MAX_MEMORY_ENTRIES'],
+    memory_ttl=TASK_CONFIG['MEMORY_TTL'],
+    retention_seconds=TASK_CONFIG['RETENTION_SECONDS']
+)
+
+# 任务事件推送（SSE）：每个任务一个主题，另有全局主题
+event_broker = EventBroker(buffer_size=WEB_CONFIG['EVENT_BUFFER'])
+GLOBAL_EVENTS_TOPIC = 'tasks'
+
+
+def publish_task_event(task_id, record):
+    """任务状态变化时推送事件：进入终态为done，其余为progress"""
+    event = 'done' if record.get('status') in FINAL_STATUSES else 'progress'
+    record['task_id'] = task_id
+    event_broker.publish([f"task:{task_id}", GLOBAL_EVENTS_TOPIC], event, record)
+
+
+task_store.add_listener(publish_task_event)
+
+# 相同任务合并执行
+single_flight = SingleFlight(result_ttl=TASK_CONFIG['DEDUP_RESULT_TTL'])
+
+# 分析结果/下载文件的响应缓存（按路径和mtime失效）
+response_cache = ResponseCache(WEB_CONFIG['CACHE_MAX_BYTES'])
+
+# 词云渲染缓存（由任务子进程读写，这里只用于统计）
+render_cache = RenderCache(WORDCLOUD_CONFIG['CACHE_DIR'], WORDCLOUD_CONFIG['CACHE_MAX_BYTES']) \
+    if WORDCLOUD_CONFIG.get('CACHE_DIR') else None
+
+# 运行指标（/metrics）
+TASKS_SUBMITTED = metrics.counter(
+    'tasks_submitted_total', '提交的任务数（state: queued新任务/attached关联执行中任务/cached复用结果）',
+    ['type', 'state']
+)
+TASKS_COMPLETED = metrics.counter('tasks_completed_total', '结束的任务数', ['type', 'status'])
+TASK_DURATION = metrics.histogram('task_duration_seconds', '任务执行耗时（秒，不含排队）', ['type', 'status'])
+TASK_QUEUE_WAIT = metrics.histogram('task_queue_wait_seconds', '任务排队等待时间（秒）', ['type'])
+RESPONSE_BYTES = metrics.histogram(
+    'http_response_bytes', 'HTTP响应体大小（字节，流式响应不计）', ['endpoint'], buckets=metrics.SIZE_BUCKETS
+)
+
+SUBMIT_MESSAGES = {
+    'queued': '任务已加入队列',
+    'attached': '相同任务正在执行，已关联到该任务',
+    'cached': '相同任务已完成，直接返回结果',
+}
+
+# 提交任务的接口：任务类型、名称、参数及默认值、输入文件参数、是否复用已完成的结果
+API_TASKS = {
+    'crawl': {
+        'type': 'crawl_comments',
+        'label': '爬取',
+        'params': {'restaurant_name': '', 'city': '北京', 'months': 3},
+        'input': None,
+        # 爬取结果随时间变化，只合并正在执行的相同任务
+        'reuse_result': False
+    },
+    'analyze': {
+        'type': 'analyze_comments',
+        'label': '分析',
+        'params': {'filename': ''},
+        'input': 'filename',
+        'reuse_result': True
+    },
+    'wordcloud': {
+        'type': 'generate_wordcloud',
+        'label': '词云生成',
+        'params': {'analysis_filename': ''},
+        'input': 'analysis_filename',
+        'reuse_result': True
+    },
+}
 
 
 class TaskRunner:
-    """后台任务运行器"""
+    """后台任务运行器
+
+    按任务类型分配工作线程（TASK_CONFIG['WORKERS']），工作线程阻塞等待任务，
+    支持优先级、超时和协作式取消。分析、词云等CPU密集型任务交给进程池执行，
+    工作线程只等待结果，不与请求处理争用GIL。
+    """
 
     def __init__(self):
-        self.running = False
-        self.thread = None
+        self.pool = TaskPool(
+            self.execute_task,
+            workers=TASK_CONFIG['WORKERS'],
+            timeouts=TASK_CONFIG['TIMEOUTS']
+        )
+
+        self.process_pool = None
+        if TASK_CONFIG['PROCESS_WORKERS']:
+            self.process_pool = ProcessTaskPool(
+                workers=TASK_CONFIG['PROCESS_WORKERS'],
+                # 每个等待结果的工作线程最多占用一个位置
+                slots=sum(TASK_CONFIG['WORKERS'].get(t, 1) for t in TASK_CONFIG['PROCESS_TASK_TYPES']),
+                initializer=tasks.init_worker,
+                name='task-process'
+            )
+
+    @property
+    def running(self):
+        return self.pool.running
 
     def start(self):
         """启动后台任务处理"""
         if not self.running:
-            self.running = True
-            self.thread = threading.Thread(target=self.process_tasks)
-            self.thread.daemon = True
-            self.thread.start()
+            task_store.recover()
+            if self.process_pool is not None:
+                self.process_pool.start()
+            self.pool.start()
             logger.info("后台任务处理器已启动")
 
     def stop(self):
         """停止后台任务处理"""
-        self.running = False
-        if self.thread:
-            self.thread.join()
+        self.pool.stop()
+        if self.process_pool is not None:
+            self.process_pool.stop()
         logger.info("后台任务处理器已停止")
 
-    def process_tasks(self):
-        """处理任务队列"""
-        while self.running:
-            try:
-                if not task_queue.empty():
-                    task = task_queue.get(timeout=1)
-                    self.execute_task(task)
-            except queue.Empty:
-                continue
-            except Exception as e:
-                logger.error(f"处理任务失败: {e}")
-
-    def execute_task(self, task):
+    def submit(self, task, priority='normal', input_file=None, reuse_result=True):
+        """提交任务，返回 (任务ID, 状态)
+
+        按 (任务类型, 输入文件内容哈希, 参数) 合并相同任务：执行中的任务直接关联，
+        reuse_result 为真时已完成的任务直接复用结果。
+        """
+        content_hash = None
+        if input_file:
+            entry = data_manager.catalog.get(input_file)
+            content_hash = entry['content_hash'] if entry else None
+        key = flight_key(task['type'], content_hash, task['params'])
+
+        task_id, state = single_flight.acquire(key, task['id'], reuse_result, is_valid=self.has_result)
+        if state != 'new':
+            logger.info(f"合并重复任务: {task['id']} -> {task_id} ({state})")
+            TASKS_SUBMITTED.inc(type=task['type'], state=state)
+            return task_id, state
+
+        task['flight_key'] = key
+        task['submitted_at'] = time.monotonic()
+        task_store.set(task_id, {'status': 'queued', 'progress': 0, 'type': task['type']})
+        self.pool.submit(task, priority)
+        TASKS_SUBMITTED.inc(type=task['type'], state='queued')
+        return task_id, 'queued'
+
+    @staticmethod
+    def has_result(task_id):
+        """已完成任务的结果是否仍可用"""
+        record = task_store.get(task_id, include_result=False)
+        return record is not None and record.get('status') == 'completed'
+
+    def cancel(self, task_id):
+        """取消任务"""
+        return self.pool.cancel(task_id)
+
+    @staticmethod
+    def publish_progress(task_id, snapshot):
+        """写入任务进度（进度推送频繁，只更新内存；状态变化时再持久化）"""
+        task_store.update(task_id, snapshot, persist=False)
+
+    def create_reporter(self, task_id, token):
+        """创建写入任务状态的进度上报器，每次推送时检查取消/超时"""
+        def publish(snapshot):
+            self.publish_progress(task_id, snapshot)
+
+        return ProgressReporter(interval=WEB_CONFIG.get('PROGRESS_INTERVAL', 0.5), sinks=[publish, token.check])
+
+    def run_cpu_task(self, task_id, func, params, progress, token):
+        """执行CPU密集型任务，结果为文件引用
+
+        有进程池时在子进程中执行，进度由子进程回传；否则在当前工作线程中执行。
+        """
+        if self.process_pool is None:
+            result = func(params, progress)
+        else:
+            result = self.process_pool.run(
+                func, (params,), task_id, token,
+                on_progress=lambda snapshot: self.publish_progress(task_id, snapshot),
+                interval=WEB_CONFIG.get('PROGRESS_INTERVAL', 0.5)
+            )
+        task_store.set_result(task_id, result)
+
+    def execute_task(self, task, token):
         """执行具体任务"""
         task_id = task['id']
         task_type = task['type']
+        success = False
+        status = 'failed'
+        started = time.monotonic()
+        if 'submitted_at' in task:
+            TASK_QUEUE_WAIT.observe(started - task['submitted_at'], type=task_type)
 
         try:
-            task_results[task_id] = {'status': 'running', 'progress': 0}
+            token.check()
+            task_store.set(task_id, {'status': 'running', 'progress': 0, 'type': task_type})
+            progress = self.create_reporter(task_id, token)
 
             if task_type == 'crawl_comments':
-                self.crawl_comments_task(task_id, task['params'])
+                self.crawl_comments_task(task_id, task['params'], progress)
             elif task_type == 'analyze_comments':
-                self.analyze_comments_task(task_id, task['params'])
+                self.run_cpu_task(task_id, tasks.analyze_comments, task['params'], progress, token)
             elif task_type == 'generate_wordcloud':
-                self.generate_wordcloud_task(task_id, task['params'])
+                self.run_cpu_task(task_id, tasks.generate_wordcloud, task['params'], progress, token)
 
-            task_results[task_id]['status'] = 'completed'
-            task_results[task_id]['progress'] = 100
+            task_store.update(task_id, {'status': 'completed', 'progress': 100})
+            success = True
+            status = 'completed'
+
+        except TaskCancelled as e:
+            logger.warning(f"任务已停止: {task_id}, {e}")
+            status = 'timeout' if isinstance(e, TaskTimeout) else 'cancelled'
+            task_store.update(task_id, {'status': status, 'error': str(e)})
 
         except Exception as e:
             logger.error(f"任务执行失败: {task_id}, {e}")
-            task_results[task_id] = {
+            task_store.set(task_id, {
                 'status': 'failed',
                 'error': str(e),
-                'progress': 0
-            }
+                'progress': 0,
+                'type': task_type
+            })
+
+        finally:
+            single_flight.complete(task.get('flight_key'), task_id, success)
+            TASKS_COMPLETED.inc(type=task_type, status=status)
+            TASK_DURATION.observe(time.monotonic() - started, type=task_type, status=status)
 
-    def crawl_comments_task(self, task_id, params):
+    def crawl_comments_task(self, task_id, params, progress):
         """爬取评论任务"""
-        spider = DianpingSpider()
+        # 爬虫依赖selenium、pandas等较重的模块，用到时才导入（预热时会提前导入）
+        from spiders.dianping_spider import DianpingSpider
 
-        task_results[task_id]['progress'] = 20
-        task_results[task_id]['message'] = '正在搜索餐厅...'
+        spider = DianpingSpider()
 
         # 搜索餐厅
+        progress.stage(0, 10, message='正在搜索餐厅...')
         restaurants = spider.search_restaurant(
             params['restaurant_name'],
             params.get('city', '北京')
@@ -102,109 +275,78 @@ class TaskRunner:
         if not restaurants:
             raise Exception("未找到目标餐厅")
 
-        task_results[task_id]['progress'] = 40
-        task_results[task_id]['message'] = '正在获取评论...'
-
         # 获取评论
         comments = spider.get_restaurant_comments(
             restaurants[0]['url'],
-            params.get('months', 3)
+            params.get('months', 3),
+            progress=progress.stage(10, 95, message='正在获取评论...')
         )
 
-        task_results[task_id]['progress'] = 80
-        task_results[task_id]['message'] = '正在保存数据...'
-
         # 保存数据
+        progress.stage(95, 100, message='正在保存数据...')
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f"comments_{params['restaurant_name']}_{timestamp}.json"
         filepath = data_manager.save_json(comments, filename)
 
-        task_results[task_id]['result'] = {
-            'filename': filename,
+        task_store.set_result(task_id, {
+            'filename': os.path.basename(filepath),
             'filepath': filepath,
             'comment_count': len(comments)
-        }
-        task_results[task_id]['message'] = f'成功获取{len(comments)}条评论'
-
-    def analyze_comments_task(self, task_id, params):
-        """分析评论任务"""
-        filename = params['filename']
-
-        task_results[task_id]['progress'] = 20
-        task_results[task_id]['message'] = '正在加载评论数据...'
-
-        # 加载评论数据
-        comments = data_manager.load_json(filename)
-        if not comments:
-            raise Exception("评论数据加载失败")
-
-        task_results[task_id]['progress'] = 60
-        task_results[task_id]['message'] = '正在分析评论...'
-
-        # 分析评论
-        analysis_results = analyzer.analyze_comments(comments)
-
-        task_results[task_id]['progress'] = 90
-        task_results[task_id]['message'] = '正在保存分析结果...'
-
-        # 保存分析结果
-        analysis_filename = filename.replace('.json', '_analysis.json')
-        analysis_filepath = data_manager.save_json(analysis_results, analysis_filename)
-
-        task_results[task_id]['result'] = {
-            'analysis_filename': analysis_filename,
-            'analysis_filepath': analysis_filepath,
-            'analysis_results': analysis_results
-        }
-        task_results[task_id]['message'] = '评论分析完成'
-
-    def generate_wordcloud_task(self, task_id, params):
-        """生成词云任务"""
-        analysis_filename = params['analysis_filename']
-
-        task_results[task_id]['progress'] = 20
-        task_results[task_id]['message'] = '正在加载分析数据...'
-
-        # 加载分析数据
-        analysis_results = data_manager.load_json(analysis_filename)
-        if not analysis_results:
-            raise Exception("分析数据加载失败")
-
-        task_results[task_id]['progress'] = 60
-        task_results[task_id]['message'] = '正在生成词云图...'
-
-        # 生成总体词云
-        keywords = analysis_results.get('keywords', [])
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-
-        overall_wordcloud = wordcloud_gen.generate_wordcloud(
-            keywords=keywords,
-            title="评论关键词云图",
-            save_path=f"data/wordcloud_overall_{timestamp}.png"
-        )
-
-        task_results[task_id]['progress'] = 80
-        task_results[task_id]['message'] = '正在生成分类词云...'
-
-        # 生成分类词云
-        category_keywords = analysis_results.get('labels', {}).get('category_keywords', {})
-        category_wordclouds = wordcloud_gen.generate_category_wordclouds(
-            category_keywords,
-            save_dir=f"data/category_wordclouds_{timestamp}"
-        )
-
-        task_results[task_id]['result'] = {
-            'overall_wordcloud': overall_wordcloud,
-            'category_wordclouds': category_wordclouds,
-            'interactive_data': wordcloud_gen.generate_interactive_wordcloud(keywords)
-        }
-        task_results[task_id]['message'] = '词云图生成完成'
+        })
+        progress.finish(f'成功获取{len(comments)}条评论')
 
 
 # 创建任务运行器
 task_runner = TaskRunner()
 
 
+def _pool_gauge(field):
+    """按任务类型读取线程池状态的采集函数"""
+    return lambda: {(task_type,): stats[field] for task_type, stats in task_runner.pool.stats().items()}
+
+
+def _process_pool_gauge(field):
+    """读取进程池状态的采集函数（未启用进程池时为0）"""
+    def collect():
+        if task_runner.process_pool is None:
+            return 0
+        return task_runner.process_pool.stats()[field]
+    return collect
+
+
+metrics.gauge('task_queue_depth', '排队中的任务数', ['type']).set_function(_pool_gauge('queued'))
+metrics.gauge('task_workers', '工作线程数', ['type']).set_function(_pool_gauge('workers'))
+metrics.gauge('task_workers_busy', '忙碌的工作线程数', ['type']).set_function(_pool_gauge('busy'))
+metrics.gauge('process_pool_workers', '任务子进程数').set_function(_process_pool_gauge('workers'))
+metrics.gauge('process_pool_workers_busy', '忙碌的任务子进程数').set_function(_process_pool_gauge('busy'))
+metrics.gauge('process_pool_queue_depth', '等待子进程的任务数').set_function(_process_pool_gauge('queued'))
+metrics.gauge('response_cache_bytes', '响应缓存占用内存（字节）').set_function(
+    lambda: response_cache.stats()['bytes']
+)
+metrics.gauge('response_cache_entries', '响应缓存项数').set_function(
+    lambda: response_cache.stats()['entries']
+)
+if render_cache is not None:
+    metrics.gauge('wordcloud_render_cache_bytes', '词云渲染缓存磁盘占用（字节）').set_function(
+        lambda: render_cache.stats()['bytes']
+    )
+    metrics.gauge('wordcloud_render_cache_entries', '词云渲染缓存项数').set_function(
+        lambda: render_cache.stats()['entries']
+    )
+metrics.gauge('sse_subscribers', 'SSE订阅连接数').set_function(
+    lambda: event_broker.stats()['subscribers']
+)
+
+
+@app.after_request
+def record_response_size(response):
+    """记录响应体大小（按路由规则汇总，避免文件名等造成标签爆炸）"""
+    if response.content_length is not None:
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        RESPONSE_BYTES.observe(response.content_length, endpoint=endpoint)
+    return response
+
+
 @app.route('/')
 def index():
     """首页"""
@@ -215,8 +357,8 @@ def index():
 def dashboard():
     """仪表板"""
     # 获取可用的数据文件
-    comment_files = [f for f in data_manager.list_files('.json') if 'comments_' in f and '_analysis' not in f]
-    analysis_files = [f for f in data_manager.list_files('.json') if '_analysis.json' in f]
+    comment_files = data_manager.catalog.names('comments', '.json')
+    analysis_files = data_manager.catalog.names('analysis', '.json')
 
     return render_template('dashboard.html', {
         'comment_files': comment_files,
@@ -224,31 +366,35 @@ def dashboard():
     })
 
 
+def submit_api_task(kind, data):
+    """按接口参数创建并提交任务，返回响应内容（Flask与ASGI接口共用）"""
+    spec = API_TASKS[kind]
+    data = data or {}
+    task = {
+        'id': new_task_id(kind),
+        'type': spec['type'],
+        'params': {name: data.get(name, default) for name, default in spec['params'].items()}
+    }
+
+    task_id, state = task_runner.submit(
+        task, data.get('priority', 'normal'),
+        input_file=task['params'][spec['input']] if spec['input'] else None,
+        reuse_result=spec['reuse_result']
+    )
+
+    return {
+        'success': True,
+        'task_id': task_id,
+        'deduplicated': state != 'queued',
+        'message': spec['label'] + SUBMIT_MESSAGES[state]
+    }
+
+
 @app.route('/api/crawl', methods=['POST'])
 def api_crawl():
     """API: 开始爬取"""
     try:
-        data = request.get_json()
-        task_id = f"crawl_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-
-        task = {
-            'id': task_id,
-            'type': 'crawl_comments',
-            'params': {
-                'restaurant_name': data.get('restaurant_name', ''),
-                'city': data.get('city', '北京'),
-                'months': data.get('months', 3)
-            }
-        }
-
-        task_queue.put(task)
-        task_results[task_id] = {'status': 'queued', 'progress': 0}
-
-        return jsonify({
-            'success': True,
-            'task_id': task_id,
-            'message': '爬取任务已加入队列'
-        })
+        return jsonify(submit_api_task('crawl', request.get_json()))
 
     except Exception as e:
         logger.error(f"API爬取失败: {e}")
@@ -262,25 +408,7 @@ def api_crawl():
 def api_analyze():
     """API: 开始分析"""
     try:
-        data = request.get_json()
-        task_id = f"analyze_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-
-        task = {
-            'id': task_id,
-            'type': 'analyze_comments',
-            'params': {
-                'filename': data.get('filename', '')
-            }
-        }
-
-        task_queue.put(task)
-        task_results[task_id] = {'status': 'queued', 'progress': 0}
-
-        return jsonify({
-            'success': True,
-            'task_id': task_id,
-            'message': '分析任务已加入队列'
-        })
+        return jsonify(submit_api_task('analyze', request.get_json()))
 
     except Exception as e:
         logger.error(f"API分析失败: {e}")
@@ -294,25 +422,7 @@ def api_analyze():
 def api_wordcloud():
     """API: 生成词云"""
     try:
-        data = request.get_json()
-        task_id = f"wordcloud_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-
-        task = {
-            'id': task_id,
-            'type': 'generate_wordcloud',
-            'params': {
-                'analysis_filename': data.get('analysis_filename', '')
-            }
-        }
-
-        task_queue.put(task)
-        task_results[task_id] = {'status': 'queued', 'progress': 0}
-
-        return jsonify({
-            'success': True,
-            'task_id': task_id,
-            'message': '词云生成任务已加入队列'
-        })
+        return jsonify(submit_api_task('wordcloud', request.get_json()))
 
     except Exception as e:
         logger.error(f"API词云生成失败: {e}")
@@ -325,8 +435,9 @@ def api_wordcloud():
 @app.route('/api/task_status/<task_id>')
 def api_task_status(task_id):
     """API: 获取任务状态"""
-    if task_id in task_results:
-        return jsonify(task_results[task_id])
+    record = task_store.get(task_id)
+    if record is not None:
+        return jsonify(record)
     else:
         return jsonify({
             'status': 'not_found',
@@ -334,18 +445,129 @@ def api_task_status(task_id):
         }), 404
 
 
-@app.route('/api/data_files')
-def api_data_files():
-    """API: 获取数据文件列表"""
+def format_sse(event, data, event_id=None):
+    """格式化一条SSE消息"""
+    lines = [] if event_id is None else [f"id: {event_id}"]
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return '\n'.join(lines) + '\n\n'
+
+
+def last_event_id():
+    """断线重连时浏览器携带的 Last-Event-ID"""
+    value = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
     try:
-        comment_files = [f for f in data_manager.list_files('.json') if 'comments_' in f and '_analysis' not in f]
-        analysis_files = [f for f in data_manager.list_files('.json') if '_analysis.json' in f]
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def stream_events(topic, snapshot=None, until_done=False):
+    """订阅主题并返回SSE响应
+
+    snapshot() 返回连接时先发送的最近状态；until_done 为真时收到done事件后结束。
+    缓冲区中的事件可按 Last-Event-ID 重放，否则先发送最近状态，再推送订阅之后的事件。
+    """
+    event_id = last_event_id()
+    if event_id is not None and not event_broker.replayable(topic, event_id):
+        event_id = None
+    subscription = event_broker.subscribe(topic, event_id, heartbeat=WEB_CONFIG['SSE_HEARTBEAT'])
+    # 先订阅再读取状态，两者之间的变化不会丢失
+    snapshot = snapshot() if snapshot is not None and event_id is None else None
+
+    def generate():
+        yield 'retry: 3000\n\n'
+        if snapshot is not None:
+            event = 'done' if snapshot.get('status') in FINAL_STATUSES else 'progress'
+            yield format_sse(event, snapshot)
+            if until_done and event == 'done':
+                return
+
+        for item in subscription:
+            if item is None:
+                # 心跳：保持连接并及时发现客户端断开
+                yield ': keep-alive\n\n'
+                continue
+            seq, event, data = item
+            yield format_sse(event, data, seq)
+            if until_done and event == 'done':
+                return
+
+    response = app.response_class(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.call_on_close(subscription.close)
+    return response
+
+
+@app.route('/api/task_events/<task_id>')
+def api_task_events(task_id):
+    """API: 任务进度事件流（SSE），连接时先推送最近的任务状态"""
+    if task_id not in task_store:
+        return jsonify({
+            'status': 'not_found',
+            'error': '任务未找到'
+        }), 404
+
+    def snapshot():
+        record = task_store.get(task_id, include_result=False) or {}
+        record['task_id'] = task_id
+        return record
+
+    return stream_events(f"task:{task_id}", snapshot, until_done=True)
 
+
+@app.route('/api/task_events')
+def api_all_task_events():
+    """API: 所有任务的事件流（SSE）"""
+    return stream_events(GLOBAL_EVENTS_TOPIC)
+
+
+@app.route('/api/cancel_task/<task_id>', methods=['POST'])
+def api_cancel_task(task_id):
+    """API: 取消任务"""
+    if task_runner.cancel(task_id):
         return jsonify({
             'success': True,
-            'comment_files': comment_files,
-            'analysis_files': analysis_files
+            'message': '已请求取消任务'
         })
+    else:
+        return jsonify({
+            'success': False,
+            'error': '任务未找到或已结束'
+        }), 404
+
+
+def data_files_payload():
+    """数据文件列表的响应内容（Flask与ASGI接口共用）"""
+    catalog = data_manager.catalog
+    comment_entries = catalog.list('comments', extension='.json')
+    analysis_entries = catalog.list('analysis', extension='.json')
+
+    return {
+        'success': True,
+        'comment_files': [e['filename'] for e in comment_entries],
+        'analysis_files': [e['filename'] for e in analysis_entries],
+        'file_info': {
+            e['filename']: {
+                'kind': e['kind'],
+                'restaurant': e['restaurant'],
+                'record_count': e['record_count'],
+                'size': e['size'],
+                'modified': e['modified'],
+                'time_range': e['time_range'],
+                'content_hash': e['content_hash']
+            }
+            for e in comment_entries + analysis_entries
+        }
+    }
+
+
+@app.route('/api/data_files')
+def api_data_files():
+    """API: 获取数据文件列表"""
+    try:
+        return jsonify(data_files_payload())
 
     except Exception as e:
         logger.error(f"获取文件列表失败: {e}")
@@ -355,22 +577,79 @@ def api_data_files():
         }), 500
 
 
+def negotiate_encoding():
+    """根据Accept-Encoding选择压缩格式（不接受压缩时返回None）"""
+    return request.accept_encodings.best_match(response_cache.encodings())
+
+
+def send_cached(entry, mimetype, encoding=None, **kwargs):
+    """返回缓存项的响应体，支持If-None-Match（304）和Range"""
+    if encoding is None:
+        body, etag = entry.body, entry.etag
+    else:
+        # 每种压缩格式是不同的表示，使用不同的强ETag
+        body, etag = response_cache.encode(entry, encoding), f"{entry.etag}-{encoding}"
+
+    response = send_file(io.BytesIO(body), mimetype=mimetype, etag=etag, conditional=True, **kwargs)
+    if encoding is not None and response.status_code != 304:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def _analysis_body(data):
+    """分析结果接口的响应体"""
+    return json.dumps({'success': True, 'data': data}, ensure_ascii=False).encode('utf-8')
+
+
+def analysis_view_etag(entry, query_string):
+    """投影/分页响应的ETag：文件版本 + 查询参数"""
+    return f"{entry.etag}-{hashlib.sha1(query_string).hexdigest()[:16]}"
+
+
+def send_analysis_view(filepath):
+    """字段投影（?fields=）或逐条数组分页（?items=&cursor=&limit=）的流式响应"""
+    entry = response_cache.parsed(filepath, AnalysisDocument.load)
+    etag = analysis_view_etag(entry, request.query_string)
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        return response
+
+    try:
+        chunks = analysis_view.view(entry.data, request.args, entry.etag)
+    except CursorExpired as e:
+        return jsonify({'success': False, 'error': str(e)}), 410
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    response = app.response_class(chunks, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
 @app.route('/api/analysis_result/<filename>')
 def api_analysis_result(filename):
-    """API: 获取分析结果"""
+    """API: 获取分析结果
+
+    不带参数时返回完整文档；?fields=basic_stats,keywords 只返回指定字段，
+    逐条评论数组（sentiments.details、time_analysis）通过 ?items=名称&cursor=&limit= 分页读取。
+    """
     try:
-        analysis_data = data_manager.load_json(filename)
-        if analysis_data:
-            return jsonify({
-                'success': True,
-                'data': analysis_data
-            })
-        else:
+        filepath = os.path.join(data_manager.data_dir, filename)
+        try:
+            if 'fields' in request.args or 'items' in request.args:
+                return send_analysis_view(filepath)
+            entry = response_cache.document(filepath, _analysis_body)
+        except FileNotFoundError:
             return jsonify({
                 'success': False,
                 'error': '文件未找到'
             }), 404
 
+        return send_cached(entry, 'application/json', negotiate_encoding())
+
     except Exception as e:
         logger.error(f"获取分析结果失败: {e}")
         return jsonify({
@@ -384,20 +663,75 @@ def download_file(filename):
     """下载文件"""
     try:
         filepath = os.path.join(data_manager.data_dir, filename)
-        if os.path.exists(filepath):
-            return send_file(filepath, as_attachment=True)
-        else:
+        if not os.path.isfile(filepath):
             return "文件未找到", 404
 
+        entry = response_cache.file(filepath)
+        compressible = response_cache.compressible(filepath)
+        # Range请求按原始字节返回，压缩只用于完整下载
+        encoding = negotiate_encoding() if compressible and 'Range' not in request.headers else None
+        if encoding is not None:
+            mimetype = mimetypes.guess_type(filepath)[0] or 'application/octet-stream'
+            return send_cached(entry, mimetype, encoding, as_attachment=True, download_name=filename)
+
+        response = send_file(os.path.abspath(filepath), as_attachment=True, conditional=True, etag=entry.etag)
+        if compressible:
+            response.vary.add('Accept-Encoding')
+        return response
+
     except Exception as e:
         logger.error(f"下载文件失败: {e}")
         return "下载失败", 500
 
 
-def create_app():
-    """创建应用"""
+@app.route('/images/<path:filename>')
+def data_image(filename):
+    """数据目录中的图片（词云图）"""
+    if not filename.endswith('.png'):
+        return "文件未找到", 404
+    return send_from_directory(os.path.abspath(data_manager.data_dir), filename, conditional=True)
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus指标"""
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
+
+def warmup():
+    """预热任务组件，返回耗时（秒）
+
+    启用进程池时分析、词云组件由子进程初始化函数预热，这里只导入爬虫模块；
+    否则在本进程中创建分析器和词云生成器，避免第一个任务承担初始化开销。
+    """
+    started = time.perf_counter()
+    try:
+        if task_runner.process_pool is None:
+            tasks.warmup()
+        import spiders.dianping_spider  # noqa: F401
+    except Exception as e:
+        logger.error(f"预热失败: {e}")
+    elapsed = time.perf_counter() - started
+    logger.info(f"预热完成，耗时 {elapsed:.2f}s")
+    return elapsed
+
+
+def start_warmup():
+    """在后台线程中预热，不阻塞服务启动和请求处理"""
+    thread = threading.Thread(target=warmup, name='warmup', daemon=True)
+    thread.start()
+    return thread
+
+
+def create_app(start_warmup_thread=True):
+    """创建应用
+
+    start_warmup_thread: 是否在后台线程中预热任务组件（服务随后即可开始监听，不等待预热完成）
+    """
     # 启动后台任务处理器
     task_runner.start()
+    if start_warmup_thread:
+        start_warmup()
 
     # 确保必要目录存在
     os.makedirs('data', exist_ok=True)
@@ -417,4 +751,5 @@ if __name__ == '__main__':
             debug=WEB_CONFIG['debug']
         )
     finally:
+        event_broker.close()
         task_runner.stop()
\ No newline at end of file
@@ -0,0 +1,329 @@
+import os
+import re
+import json
+import asyncio
+import mimetypes
+from urllib.parse import quote, parse_qs
+
+from werkzeug.http import parse_accept_header, parse_etags, parse_range_header
+
+from config import WEB_CONFIG
+from utils import metrics, analysis_view
+from utils.analysis_view import AnalysisDocument, CursorExpired
+from utils.data_utils import Logger
+from web.app import (
+    data_manager, task_store, task_runner, response_cache,
+    submit_api_task, data_files_payload, _analysis_body, analysis_view_etag, API_TASKS, start_warmup
+)
+
+
+logger = Logger.setup(__name__)
+
+# 下载文件每次读取的块大小
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+
+class Request:
+    """ASGI请求的简单封装"""
+
+    def __init__(self, scope, receive):
+        self.scope = scope
+        self.receive = receive
+        self.method = scope['method']
+        self.path = scope['path']
+        self.query = parse_qs(scope.get('query_string', b'').decode('latin-1'), keep_blank_values=True)
+        self.headers = {
+            name.decode('latin-1').lower(): value.decode('latin-1')
+            for name, value in scope.get('headers', [])
+        }
+
+    async def body(self):
+        chunks = []
+        while True:
+            message = await self.receive()
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                return b''.join(chunks)
+
+    async def json(self):
+        body = await self.body()
+        return json.loads(body) if body else None
+
+
+async def send_response(send, status, body=b'', content_type=None, headers=None):
+    """发送完整响应"""
+    raw_headers = [(b'content-length', str(len(body)).encode())]
+    if content_type:
+        raw_headers.append((b'content-type', content_type.encode()))
+    for name, value in (headers or {}).items():
+        raw_headers.append((name.lower().encode(), value.encode('latin-1')))
+    await send({'type': 'http.response.start', 'status': status, 'headers': raw_headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def send_json(send, payload, status=200):
+    """发送JSON响应（与Flask接口的JSON结构一致）"""
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    await send_response(send, status, body, 'application/json')
+
+
+def negotiate_encoding(request):
+    """根据Accept-Encoding选择压缩格式"""
+    accept = parse_accept_header(request.headers.get('accept-encoding'))
+    return accept.best_match(response_cache.encodings())
+
+
+def not_modified(request, etag):
+    """If-None-Match 是否命中"""
+    return parse_etags(request.headers.get('if-none-match')).contains_weak(etag)
+
+
+def content_disposition(filename):
+    """附件下载头（非ASCII文件名按RFC 5987编码）"""
+    try:
+        filename.encode('ascii')
+        return f'attachment; filename="{filename}"'
+    except UnicodeEncodeError:
+        fallback = filename.encode('ascii', 'ignore').decode() or 'download'
+        return f"attachment; filename=\"{fallback}\"; filename*=UTF-8''{quote(filename)}"
+
+
+async def send_cached(request, send, entry, content_type, encoding=None, headers=None):
+    """发送缓存项的响应体（支持304）"""
+    etag = entry.etag if encoding is None else f"{entry.etag}-{encoding}"
+    headers = dict(headers or {}, **{'ETag': f'"{etag}"', 'Vary': 'Accept-Encoding', 'Cache-Control': 'no-cache'})
+    if not_modified(request, etag):
+        await send_response(send, 304, headers=headers)
+        return
+
+    if encoding is None:
+        body = entry.body
+    else:
+        body = await asyncio.to_thread(response_cache.encode, entry, encoding)
+        headers['Content-Encoding'] = encoding
+    await send_response(send, 200, body, content_type, headers)
+
+
+async def stream_file(send, path, start, length, status, headers):
+    """分块读取文件并发送，读取在线程池中完成，不阻塞事件循环"""
+    raw_headers = [(b'content-length', str(length).encode())]
+    for name, value in headers.items():
+        raw_headers.append((name.lower().encode(), value.encode('latin-1')))
+    await send({'type': 'http.response.start', 'status': status, 'headers': raw_headers})
+
+    f = await asyncio.to_thread(open, path, 'rb')
+    try:
+        await asyncio.to_thread(f.seek, start)
+        remaining = length
+        while remaining > 0:
+            chunk = await asyncio.to_thread(f.read, min(DOWNLOAD_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': remaining > 0})
+        if remaining > 0:
+            await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        await asyncio.to_thread(f.close)
+
+
+class AsgiApp:
+    """Web API的ASGI版本
+
+    与 web/app.py 的Flask应用共用任务运行器、任务状态、数据目录索引和响应缓存，
+    接口路径和JSON结构保持一致。阻塞操作（SQLite、目录扫描、文件读取、压缩）
+    放到线程池中执行，等待中的连接只占用协程，不占用工作线程。
+    """
+
+    def __init__(self):
+        self.routes = []
+        for kind in API_TASKS:
+            self.route('POST', f'/api/{kind}', self.submit_handler(kind))
+        self.route('GET', r'/api/task_status/(?P<task_id>[^/]+)', self.task_status)
+        self.route('GET', r'/api/data_files', self.data_files)
+        self.route('GET', r'/api/analysis_result/(?P<filename>[^/]+)', self.analysis_result)
+        self.route('GET', r'/download/(?P<filename>[^/]+)', self.download)
+        self.route('GET', r'/metrics', self.metrics_endpoint)
+
+    def route(self, method, pattern, handler):
+        self.routes.append((method, re.compile(pattern), handler))
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+
+        request = Request(scope, receive)
+        path_matched = False
+        for method, pattern, handler in self.routes:
+            match = pattern.fullmatch(request.path)
+            if match is None:
+                continue
+            path_matched = True
+            if method == request.method:
+                await handler(request, send, **match.groupdict())
+                return
+
+        if path_matched:
+            await send_json(send, {'success': False, 'error': '不支持的请求方法'}, 405)
+        else:
+            await send_json(send, {'success': False, 'error': '接口不存在'}, 404)
+
+    async def lifespan(self, receive, send):
+        """服务启动/停止时启动/停止后台任务处理"""
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await asyncio.to_thread(task_runner.start)
+                os.makedirs(data_manager.data_dir, exist_ok=True)
+                await send({'type': 'lifespan.startup.complete'})
+                # 启动完成后服务器才开始监听，预热在后台线程中进行
+                start_warmup()
+            elif message['type'] == 'lifespan.shutdown':
+                await asyncio.to_thread(task_runner.stop)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def submit_handler(self, kind):
+        """提交任务的接口"""
+        label = API_TASKS[kind]['label']
+
+        async def handler(request, send):
+            try:
+                data = await request.json()
+                payload = await asyncio.to_thread(submit_api_task, kind, data)
+                await send_json(send, payload)
+            except Exception as e:
+                logger.error(f"API{label}失败: {e}")
+                await send_json(send, {'success': False, 'error': str(e)}, 500)
+
+        return handler
+
+    async def task_status(self, request, send, task_id):
+        """API: 获取任务状态"""
+        record = await asyncio.to_thread(task_store.get, task_id)
+        if record is not None:
+            await send_json(send, record)
+        else:
+            await send_json(send, {'status': 'not_found', 'error': '任务未找到'}, 404)
+
+    async def data_files(self, request, send):
+        """API: 获取数据文件列表"""
+        try:
+            await send_json(send, await asyncio.to_thread(data_files_payload))
+        except Exception as e:
+            logger.error(f"获取文件列表失败: {e}")
+            await send_json(send, {'success': False, 'error': str(e)}, 500)
+
+    async def analysis_result(self, request, send, filename):
+        """API: 获取分析结果（支持 ?fields= 字段投影和 ?items= 分页，与Flask版本一致）"""
+        try:
+            filepath = os.path.join(data_manager.data_dir, filename)
+            try:
+                if 'fields' in request.query or 'items' in request.query:
+                    await self.analysis_view(request, send, filepath)
+                    return
+                entry = await asyncio.to_thread(response_cache.document, filepath, _analysis_body)
+            except FileNotFoundError:
+                await send_json(send, {'success': False, 'error': '文件未找到'}, 404)
+                return
+
+            await send_cached(request, send, entry, 'application/json', negotiate_encoding(request))
+
+        except Exception as e:
+            logger.error(f"获取分析结果失败: {e}")
+            await send_json(send, {'success': False, 'error': str(e)}, 500)
+
+    async def analysis_view(self, request, send, filepath):
+        """字段投影/分页的流式响应"""
+        entry = await asyncio.to_thread(response_cache.parsed, filepath, AnalysisDocument.load)
+        etag = analysis_view_etag(entry, request.scope.get('query_string', b''))
+        headers = {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'}
+        if not_modified(request, etag):
+            await send_response(send, 304, headers=headers)
+            return
+
+        args = {name: values[0] for name, values in request.query.items()}
+        try:
+            chunks = analysis_view.view(entry.data, args, entry.etag)
+        except CursorExpired as e:
+            await send_json(send, {'success': False, 'error': str(e)}, 410)
+            return
+        except ValueError as e:
+            await send_json(send, {'success': False, 'error': str(e)}, 400)
+            return
+
+        raw_headers = [(b'content-type', b'application/json')]
+        raw_headers += [(name.lower().encode(), value.encode('latin-1')) for name, value in headers.items()]
+        await send({'type': 'http.response.start', 'status': 200, 'headers': raw_headers})
+        for chunk in chunks:
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def download(self, request, send, filename):
+        """下载文件（支持ETag、Range和压缩传输）"""
+        try:
+            filepath = os.path.join(data_manager.data_dir, filename)
+            if not await asyncio.to_thread(os.path.isfile, filepath):
+                await send_response(send, 404, '文件未找到'.encode('utf-8'), 'text/plain; charset=utf-8')
+                return
+
+            entry = await asyncio.to_thread(response_cache.file, filepath)
+            compressible = response_cache.compressible(filepath)
+            mimetype = mimetypes.guess_type(filepath)[0] or 'application/octet-stream'
+            headers = {'Content-Disposition': content_disposition(filename)}
+            range_header = request.headers.get('range')
+
+            # Range请求按原始字节返回，压缩只用于完整下载
+            encoding = negotiate_encoding(request) if compressible and not range_header else None
+            if encoding is not None:
+                await send_cached(request, send, entry, mimetype, encoding, headers)
+                return
+
+            headers.update({
+                'ETag': f'"{entry.etag}"',
+                'Accept-Ranges': 'bytes',
+                'Cache-Control': 'no-cache',
+                'Content-Type': mimetype
+            })
+            if compressible:
+                headers['Vary'] = 'Accept-Encoding'
+            if not_modified(request, entry.etag):
+                await send_response(send, 304, headers=headers)
+                return
+
+            start, length, status = 0, entry.size, 200
+            file_range = parse_range_header(range_header)
+            if file_range is not None:
+                span = file_range.range_for_length(entry.size)
+                if span is None:
+                    headers['Content-Range'] = f"bytes */{entry.size}"
+                    await send_response(send, 416, headers=headers)
+                    return
+                start, length, status = span[0], span[1] - span[0], 206
+                headers['Content-Range'] = f"bytes {span[0]}-{span[1] - 1}/{entry.size}"
+
+            await stream_file(send, filepath, start, length, status, headers)
+
+        except Exception as e:
+            logger.error(f"下载文件失败: {e}")
+            await send_response(send, 500, '下载失败'.encode('utf-8'), 'text/plain; charset=utf-8')
+
+    async def metrics_endpoint(self, request, send):
+        """Prometheus指标（与Flask版本共用注册表）"""
+        body = await asyncio.to_thread(metrics.registry.render)
+        await send_response(send, 200, body.encode('utf-8'), metrics.CONTENT_TYPE)
+
+
+app = AsgiApp()
+
+
+if __name__ == '__main__':
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("运行ASGI版本需要安装ASGI服务器: pip install uvicorn")
+
+    uvicorn.run('web.asgi_app:app', host=WEB_CONFIG['host'], port=WEB_CONFIG['ASGI_PORT'])
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Web API压测工具
+在不同并发数下对比Flask版本与ASGI版本的吞吐量和延迟分位数
+
+用法示例（先分别启动两个服务）:
+    python main.py web                   # Flask, 5000端口
+    python -m web.asgi_app               # ASGI, 8000端口
+    python web/load_test.py --target flask=http://127.0.0.1:5000 \\
+        --target asgi=http://127.0.0.1:8000 --concurrency 1,10,50,200 --hold 20
+"""
+
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+
+import aiohttp
+
+
+DEFAULT_PATHS = ['/api/data_files', '/api/task_status/not_found']
+
+
+def percentile(values, q):
+    """分位数（values已排序）"""
+    if not values:
+        return float('nan')
+    index = min(len(values) - 1, max(0, int(round(q / 100 * len(values))) - 1))
+    return values[index]
+
+
+async def discover_paths(session, base_url):
+    """根据文件列表补充分析结果和下载接口"""
+    paths = list(DEFAULT_PATHS)
+    try:
+        async with session.get(f"{base_url}/api/data_files") as response:
+            data = await response.json()
+    except (aiohttp.ClientError, ValueError):
+        return paths, None
+
+    if data.get('analysis_files'):
+        paths.append(f"/api/analysis_result/{data['analysis_files'][0]}")
+    large_file = None
+    files = data.get('comment_files', []) + data.get('analysis_files', [])
+    if files:
+        info = data.get('file_info', {})
+        large_file = max(files, key=lambda f: (info.get(f) or {}).get('size') or 0)
+        paths.append(f"/download/{large_file}")
+    return paths, large_file
+
+
+async def hold_connection(session, url, stop, read_delay=0.5):
+    """模拟慢客户端：长时间占用一个连接缓慢读取下载内容"""
+    while not stop.is_set():
+        try:
+            async with session.get(url) as response:
+                while not stop.is_set():
+                    chunk = await response.content.read(16 * 1024)
+                    if not chunk:
+                        break
+                    await asyncio.sleep(read_delay)
+        except aiohttp.ClientError:
+            await asyncio.sleep(read_delay)
+
+
+async def run_level(base_url, paths, concurrency, duration, hold, hold_url, timeout):
+    """在给定并发数下持续发送请求，返回统计结果"""
+    latencies = []
+    errors = 0
+    stop = asyncio.Event()
+
+    connector = aiohttp.TCPConnector(limit=0)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    async with aiohttp.ClientSession(connector=connector, timeout=client_timeout) as session:
+        holders = []
+        if hold and hold_url:
+            holders = [asyncio.create_task(hold_connection(session, hold_url, stop)) for _ in range(hold)]
+            await asyncio.sleep(0.5)
+
+        async def worker(offset):
+            nonlocal errors
+            i = offset
+            while not stop.is_set():
+                url = base_url + paths[i % len(paths)]
+                i += 1
+                start = time.perf_counter()
+                try:
+                    async with session.get(url, headers={'Accept-Encoding': 'gzip'}) as response:
+                        await response.read()
+                        if response.status >= 500:
+                            errors += 1
+                            continue
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - start)
+
+        workers = [asyncio.create_task(worker(i)) for i in range(concurrency)]
+        await asyncio.sleep(duration)
+        stop.set()
+        await asyncio.gather(*workers, return_exceptions=True)
+        for holder in holders:
+            holder.cancel()
+        await asyncio.gather(*holders, return_exceptions=True)
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': len(latencies) / duration,
+        'p50': percentile(latencies, 50) * 1e3,
+        'p90': percentile(latencies, 90) * 1e3,
+        'p99': percentile(latencies, 99) * 1e3,
+        'max': (latencies[-1] if latencies else float('nan')) * 1e3,
+        'mean': (statistics.mean(latencies) if latencies else float('nan')) * 1e3
+    }
+
+
+async def run(targets, levels, duration, hold, timeout, paths=None):
+    results = []
+    for name, base_url in targets:
+        base_url = base_url.rstrip('/')
+        async with aiohttp.ClientSession() as session:
+            discovered, large_file = await discover_paths(session, base_url)
+        target_paths = paths or discovered
+        hold_url = f"{base_url}/download/{large_file}" if large_file else None
+        if hold and not hold_url:
+            print(f"[{name}] 数据目录为空，跳过慢客户端", file=sys.stderr)
+
+        for concurrency in levels:
+            stats = await run_level(base_url, target_paths, concurrency, duration, hold, hold_url, timeout)
+            stats.update({'target': name, 'concurrency': concurrency})
+            results.append(stats)
+            print(f"{name:<8}{concurrency:>6}{stats['rps']:>10.1f}{stats['p50']:>10.1f}{stats['p90']:>10.1f}"
+                  f"{stats['p99']:>10.1f}{stats['max']:>10.1f}{stats['errors']:>8}", flush=True)
+    return results
+
+
+def parse_target(value):
+    name, _, url = value.partition('=')
+    if not url:
+        raise argparse.ArgumentTypeError("格式应为 名称=URL")
+    return name, url
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Web API压测（Flask与ASGI版本对比）')
+    parser.add_argument('--target', type=parse_target, action='append', required=True,
+                        help='压测目标，格式 名称=URL，可重复')
+    parser.add_argument('--concurrency', default='1,10,50,100', help='并发数列表，逗号分隔')
+    parser.add_argument('--duration', type=float, default=10, help='每个并发级别的持续时间（秒）')
+    parser.add_argument('--hold', type=int, default=0, help='同时保持的慢下载连接数')
+    parser.add_argument('--timeout', type=float, default=30, help='单个请求超时（秒）')
+    parser.add_argument('--path', action='append', help='压测路径，默认按数据文件自动选择')
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(',') if level]
+    print(f"{'target':<8}{'conc':>6}{'rps':>10}{'p50(ms)':>10}{'p90(ms)':>10}{'p99(ms)':>10}{'max(ms)':>10}{'errors':>8}")
+    asyncio.run(run(args.target, levels, args.duration, args.hold, args.timeout, args.path))
+
+
+if __name__ == '__main__':
+    main()
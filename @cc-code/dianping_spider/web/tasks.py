@@ -0,0 +1,152 @@
+import os
+import time
+import threading
+from datetime import datetime
+
+from utils.data_utils import DataManager, Logger
+
+
+def _create_analyzer():
+    from utils.text_analyzer import CommentAnalyzer
+    return CommentAnalyzer()
+
+
+def _create_wordcloud_gen():
+    from utils.wordcloud_generator import WordCloudGenerator
+    return WordCloudGenerator()
+
+
+# 任务组件：首次使用时创建，每个进程每种组件只创建一次
+COMPONENT_FACTORIES = {
+    'data_manager': DataManager,
+    'analyzer': _create_analyzer,
+    'wordcloud_gen': _create_wordcloud_gen,
+}
+
+_components = {}
+_component_locks = {name: threading.Lock() for name in COMPONENT_FACTORIES}
+
+
+def get_component(name):
+    """获取任务组件（线程安全的延迟单例）
+
+    评论分析器加载停用词和分词词典，词云生成器导入matplotlib并查找字体，
+    都比较耗时，只在第一次用到时创建；并发的首次调用等待同一次创建完成。
+    """
+    component = _components.get(name)
+    if component is None:
+        with _component_locks[name]:
+            component = _components.get(name)
+            if component is None:
+                component = _components[name] = COMPONENT_FACTORIES[name]()
+    return component
+
+
+def get_components():
+    """获取数据管理器、评论分析器和词云生成器"""
+    return {name: get_component(name) for name in COMPONENT_FACTORIES}
+
+
+def warmup():
+    """预热：加载分词词典并创建全部任务组件，返回耗时（秒）"""
+    import jieba
+
+    logger = Logger.setup(__name__)
+    started = time.perf_counter()
+    jieba.initialize()
+    get_components()
+    elapsed = time.perf_counter() - started
+    logger.info(f"任务组件预热完成: pid={os.getpid()}, 耗时 {elapsed:.2f}s")
+    return elapsed
+
+
+def init_worker():
+    """子进程初始化：在后台线程中预热，子进程可以立即接收任务
+
+    任务用到尚未创建完的组件时等待同一次创建，不会重复加载。
+    """
+    threading.Thread(target=warmup, name='warmup', daemon=True).start()
+
+
+def image_ref(result, data_dir):
+    """词云结果去掉base64图片，改为数据目录中的图片引用"""
+    if not result:
+        return result
+    result = {k: v for k, v in result.items() if k != 'image_base64'}
+    save_path = result.get('save_path')
+    if save_path:
+        result['image_url'] = '/images/' + os.path.relpath(save_path, data_dir).replace(os.sep, '/')
+    return result
+
+
+def analyze_comments(params, progress):
+    """分析评论，结果保存为分析文件，返回文件引用"""
+    data_manager = get_component('data_manager')
+    filename = params['filename']
+
+    # 加载评论数据
+    progress.stage(0, 5, message='正在加载评论数据...')
+    comments = data_manager.load_json(filename)
+    if not comments:
+        raise Exception("评论数据加载失败")
+
+    # 分析评论
+    analysis_results = get_component('analyzer').analyze_comments(
+        comments, progress=progress.stage(5, 95, message='正在分析评论...')
+    )
+
+    # 保存分析结果
+    progress.stage(95, 100, message='正在保存分析结果...')
+    analysis_filename = filename.replace('.json', '_analysis.json')
+    analysis_filepath = data_manager.save_json(analysis_results, analysis_filename)
+    progress.finish('评论分析完成')
+
+    return {
+        'analysis_filename': os.path.basename(analysis_filepath),
+        'analysis_filepath': analysis_filepath
+    }
+
+
+def generate_wordcloud(params, progress):
+    """生成词云图，图片保存到数据目录，返回图片引用"""
+    data_manager = get_component('data_manager')
+    wordcloud_gen = get_component('wordcloud_gen')
+    analysis_filename = params['analysis_filename']
+
+    # 加载分析数据
+    progress.stage(0, 5, message='正在加载分析数据...')
+    analysis_results = data_manager.load_json(analysis_filename)
+    if not analysis_results:
+        raise Exception("分析数据加载失败")
+
+    # 生成总体词云
+    progress.stage(5, 40, message='正在生成词云图...')
+    keywords = analysis_results.get('keywords', [])
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+
+    overall_wordcloud, overall_layout = wordcloud_gen.generate_wordcloud_with_layout(
+        keywords=keywords,
+        title="评论关键词云图",
+        save_path=os.path.join(data_manager.data_dir, f"wordcloud_overall_{timestamp}.png")
+    )
+
+    # 生成分类词云
+    category_keywords = analysis_results.get('labels', {}).get('category_keywords', {})
+    category_wordclouds = wordcloud_gen.generate_category_wordclouds(
+        category_keywords,
+        save_dir=os.path.join(data_manager.data_dir, f"category_wordclouds_{timestamp}"),
+        progress=progress.stage(40, 100, len(category_keywords), '正在生成分类词云...')
+    )
+
+    # 交互式数据直接使用总体词云的排布，不再重新排布
+    interactive_data = wordcloud_gen.generate_interactive_wordcloud(keywords, layout=overall_layout)
+    progress.finish('词云图生成完成')
+
+    return {
+        'overall_wordcloud': image_ref(overall_wordcloud, data_manager.data_dir),
+        'category_wordclouds': {
+            category: image_ref(result, data_manager.data_dir)
+            for category, result in category_wordclouds.items()
+        },
+        'interactive_data': interactive_data
+    }
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+图表渲染服务测试（utils/chart_renderer.py）
+
+可直接运行，也可用 pytest 运行。内存泄漏测试默认渲染1000次，
+设置环境变量 CHART_LEAK_RENDERS=10000 运行完整测试（耗时约为单次渲染耗时 x 10000）。
+"""
+
+import os
+import sys
+import base64
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils import chart_renderer
+from utils.chart_renderer import ChartRenderer, LEAK_GROWTH_MB
+
+LEAK_RENDERS = int(os.environ.get('CHART_LEAK_RENDERS', 1000))
+LEAK_THREADS = 4
+
+
+def _bar_chart(value):
+    def draw(fig):
+        ax = fig.subplots()
+        ax.bar(range(3), [value, value + 1, value + 2], color='#3498db')
+        ax.set_title(f'value {value}')
+    return draw
+
+
+def test_failed_draw_returns_figure():
+    """绘图函数抛出异常时异常原样抛出，Figure 仍回到池中"""
+    renderer = ChartRenderer()
+
+    def broken(fig):
+        fig.subplots().plot([1, 2, 3])
+        raise ZeroDivisionError
+
+    for _ in range(3):
+        try:
+            renderer.render(broken, (3, 2), dpi=50)
+            assert False, '异常未抛出'
+        except ZeroDivisionError:
+            pass
+    assert renderer.stats() == {'created': 1, 'reused': 2, 'idle': 1}
+
+
+def test_reused_figure_is_reset():
+    """复用的 Figure 与新建的 Figure 渲染结果一致（上次的坐标轴、边距、背景色已清除）"""
+    renderer = ChartRenderer()
+    fresh = ChartRenderer().render(_bar_chart(1), (3, 2), dpi=50)
+
+    def dirty(fig):
+        fig.set_facecolor('#000000')
+        fig.subplots(2, 2)
+        fig.subplots_adjust(left=0.4)
+
+    renderer.render(dirty, (3, 2), dpi=50, tight_layout=True)
+    assert renderer.render(_bar_chart(1), (3, 2), dpi=50) == fresh
+    assert renderer.stats()['created'] == 1
+
+
+def test_concurrent_renders_match_serial():
+    """多个线程同时渲染的结果与逐个渲染一致"""
+    renderer = ChartRenderer()
+    serial = [renderer.render(_bar_chart(value), (3, 2), dpi=50) for value in range(8)]
+    with ThreadPoolExecutor(max_workers=LEAK_THREADS) as pool:
+        concurrent = list(pool.map(lambda value: renderer.render(_bar_chart(value), (3, 2), dpi=50), range(8)))
+    assert concurrent == serial
+    assert renderer.stats()['idle'] <= renderer.max_idle
+
+
+def test_module_helpers():
+    """模块级的 render_png / render_base64 使用进程内共用的渲染器"""
+    png = chart_renderer.render_png(_bar_chart(2), (3, 2), dpi=50)
+    assert png.startswith(b'\x89PNG')
+    assert base64.b64decode(chart_renderer.render_base64(_bar_chart(2), (3, 2), dpi=50)) == png
+    assert chart_renderer.get_renderer().stats()['idle'] >= 1
+
+
+def test_no_memory_leak():
+    """多线程渲染 LEAK_RENDERS 次后常驻内存增长不超过 LEAK_GROWTH_MB，Figure 数量不超过线程数"""
+    result = chart_renderer.leak_check(renders=LEAK_RENDERS, threads=LEAK_THREADS, compare_pyplot=False)
+    print(f"渲染 {result['renders']} 次（{result['failures']} 次绘图失败），{result['per_render_ms']:.1f} ms/次，"
+          f"内存增长 {result['growth_mb']:.2f} MB，Figure: {result['stats']}")
+    # 预热的200次中4次、正式渲染的 0..LEAK_RENDERS-1 中每50次1次绘图失败
+    assert result['failures'] == 4 + (LEAK_RENDERS + 49) // 50
+    assert result['growth_mb'] <= LEAK_GROWTH_MB
+    assert result['stats']['created'] <= LEAK_THREADS
+    assert result['stats']['idle'] <= ChartRenderer().max_idle
+
+
+def main():
+    tests = [
+        test_failed_draw_returns_figure,
+        test_reused_figure_is_reset,
+        test_concurrent_renders_match_serial,
+        test_module_helpers,
+        test_no_memory_leak,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"  [OK] {test.__doc__.splitlines()[0]}")
+        except AssertionError as e:
+            failed += 1
+            print(f"  [FAIL] {test.__doc__.splitlines()[0]} {e}")
+    print()
+    print(f"通过 {len(tests) - failed}/{len(tests)}")
+    return failed == 0
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+图表渲染服务
+Chart Renderer
+
+不经过 pyplot，直接用 Agg 画布渲染图表为PNG；Figure 对象按尺寸池化复用，可在多个线程中同时渲染
+"""
+
+import os
+import sys
+import base64
+import threading
+from io import BytesIO
+
+import matplotlib
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+
+class ChartRenderer:
+    """图表渲染器
+
+    pyplot 的当前图表是全局状态，多个线程同时绘图会互相干扰，绘图中途抛出异常跳过
+    plt.close() 时图表一直留在 pyplot 的图表管理器中无法回收。这里每次渲染从池中取出一个
+    Figure（没有空闲的则新建，直接绑定 Agg 画布），由调用方的绘图函数在其上作图，
+    保存为PNG后无论成功与否都清空并放回池中，同一个 Figure 同一时间只在一个线程中使用。
+    每种尺寸最多保留 max_idle 个空闲 Figure。
+    """
+
+    def __init__(self, max_idle=4):
+        self.max_idle = max_idle
+        self._lock = threading.Lock()
+        self._idle = {}
+        self.created = 0
+        self.reused = 0
+
+    def _acquire(self, figsize):
+        with self._lock:
+            idle = self._idle.get(figsize)
+            if idle:
+                self.reused += 1
+                return idle.pop()
+            self.created += 1
+        figure = Figure(figsize=figsize)
+        FigureCanvasAgg(figure)
+        return figure
+
+    def _release(self, figure, figsize):
+        try:
+            # 清除绘图函数留下的所有状态（坐标轴、标题、图例、tight_layout调整过的边距、背景色）
+            figure.clear()
+            figure.subplotpars.reset()
+            figure.set_size_inches(figsize)
+            figure.set_facecolor(matplotlib.rcParams['figure.facecolor'])
+        except Exception:
+            return
+        with self._lock:
+            idle = self._idle.setdefault(figsize, [])
+            if len(idle) < self.max_idle:
+                idle.append(figure)
+
+    def render(self, draw, figsize, dpi=300, tight_layout=False, bbox_inches='tight'):
+        """调用 draw(figure) 作图并返回PNG字节，draw 抛出的异常原样抛出（Figure 仍会回收）"""
+        figsize = tuple(figsize)
+        figure = self._acquire(figsize)
+        try:
+            draw(figure)
+            if tight_layout:
+                figure.tight_layout()
+            buffer = BytesIO()
+            figure.savefig(buffer, format='png', dpi=dpi, bbox_inches=bbox_inches)
+            return buffer.getvalue()
+        finally:
+            self._release(figure, figsize)
+
+    def render_base64(self, draw, figsize, **kwargs):
+        """同 render，返回base64编码的PNG"""
+        return base64.b64encode(self.render(draw, figsize, **kwargs)).decode()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'created': self.created,
+                'reused': self.reused,
+                'idle': sum(len(idle) for idle in self._idle.values())
+            }
+
+    def clear(self):
+        """释放所有空闲的 Figure"""
+        with self._lock:
+            self._idle.clear()
+
+
+# 进程内共用的渲染器
+_renderer = ChartRenderer()
+
+
+def get_renderer():
+    return _renderer
+
+
+def render_png(draw, figsize, **kwargs):
+    return _renderer.render(draw, figsize, **kwargs)
+
+
+def render_base64(draw, figsize, **kwargs):
+    return _renderer.render_base64(draw, figsize, **kwargs)
+
+
+def _rss_bytes():
+    """当前进程的常驻内存（Linux读取/proc，其他平台返回峰值）"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _sample_chart(figure, index):
+    """内存测试用的小图：条形图+标题+图例，每50次在保存前抛出异常
+
+    标题和数值只有100种组合，预热阶段即可填满 matplotlib 的文字度量缓存，之后的内存增长不含缓存。
+    """
+    ax = figure.subplots()
+    values = [(index * 7 + i * 3) % 11 + 1 for i in range(6)]
+    bars = ax.bar(range(6), values, color='#27ae60', label='count')
+    for bar, value in zip(bars, values):
+        ax.text(bar.get_x() + bar.get_width() / 2, value + 0.1, str(value), ha='center', va='bottom')
+    ax.set_title(f'chart {index % 100}')
+    ax.legend()
+    if index % 50 == 0:
+        raise ValueError('模拟绘图失败')
+
+
+# 泄漏判定：预热后首个采样点到最后一个采样点的常驻内存增长上限（MB）
+LEAK_GROWTH_MB = 2
+
+
+def leak_check(renders=10000, threads=4, samples=10, compare_pyplot=True):
+    """多线程渲染 renders 张小图（其中2%绘图失败），按进度采样常驻内存
+
+    预热后的内存增长应只有分配器的波动，与渲染次数无关；
+    compare_pyplot 为True时同时对比 pyplot 写法在绘图失败时留下的未关闭图表数。
+    """
+    import time
+    import gc
+    from concurrent.futures import ThreadPoolExecutor
+
+    renderer = ChartRenderer()
+    failures = 0
+
+    def one(index):
+        try:
+            renderer.render(lambda figure: _sample_chart(figure, index), (4, 3), dpi=50)
+            return 0
+        except ValueError:
+            return 1
+
+    for i in range(1, 201):
+        failures += one(i)
+    gc.collect()
+    baseline = _rss_bytes()
+
+    rss = []
+    start = time.perf_counter()
+    step = max(1, renders // samples)
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for begin in range(0, renders, step):
+            failures += sum(pool.map(one, range(begin, min(begin + step, renders))))
+            gc.collect()
+            rss.append(_rss_bytes())
+    elapsed = time.perf_counter() - start
+
+    leaked_figures = None
+    if compare_pyplot:
+        # pyplot 写法：绘图抛出异常时跳过 plt.close()
+        matplotlib.use('Agg')
+        import warnings
+        import matplotlib.pyplot as plt
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            for index in range(1, 201):
+                try:
+                    fig = plt.figure(figsize=(4, 3))
+                    _sample_chart(fig, index * 25)
+                    fig.savefig(BytesIO(), format='png', dpi=50)
+                    plt.close(fig)
+                except ValueError:
+                    pass
+        leaked_figures = len(plt.get_fignums())
+        plt.close('all')
+
+    return {
+        'renders': renders,
+        'failures': failures,
+        'per_render_ms': elapsed / renders * 1e3,
+        'baseline_mb': baseline / 1024 / 1024,
+        'rss_mb': [value / 1024 / 1024 for value in rss],
+        'growth_mb': (rss[-1] - rss[0]) / 1024 / 1024 if rss else 0.0,
+        'stats': renderer.stats(),
+        'pyplot_leaked_figures': leaked_figures
+    }
+
+
+if __name__ == "__main__":
+    # 内存泄漏测试（约为单次渲染耗时 x 10000，也可用 test_chart_renderer.py 按较少次数运行）
+    result = leak_check()
+    print(f"渲染 {result['renders']} 次（{result['failures']} 次绘图失败），{result['per_render_ms']:.1f} ms/次")
+    print(f"Figure: {result['stats']}")
+    print("常驻内存(MB): 预热后 {:.1f}，".format(result['baseline_mb'])
+          + ' '.join(f"{value:.1f}" for value in result['rss_mb']))
+    print(f"首个采样点之后增长: {result['growth_mb']:.1f} MB")
+    print(f"对比 pyplot（200次，绘图失败时跳过close）: 留下 {result['pyplot_leaked_figures']} 个未关闭的图表")
+    leaked = result['growth_mb'] > LEAK_GROWTH_MB or result['stats']['idle'] > ChartRenderer().max_idle
+    print('结果:', '内存持续增长，可能存在泄漏' if leaked else '未发现泄漏')
+    sys.exit(1 if leaked else 0)
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+字体服务
+Font Service
+
+为独立运行的可视化脚本查找已安装的中文字体
+"""
+
+from functools import lru_cache
+
+import matplotlib
+from matplotlib import font_manager
+
+# 中文字体的优先顺序（按字体族名匹配）
+PREFERRED_FAMILIES = [
+    'Microsoft YaHei', 'SimHei', 'PingFang SC', 'Hiragino Sans GB', 'Noto Sans CJK SC',
+    'Noto Sans SC', 'Source Han Sans SC', 'Source Han Sans CN', 'WenQuanYi Micro Hei',
+    'WenQuanYi Zen Hei', 'Droid Sans Fallback', 'SimSun', 'Arial Unicode MS',
+]
+
+# 没有中文字体时的后备字体
+FALLBACK_FAMILIES = ['DejaVu Sans']
+
+
+@lru_cache(maxsize=1)
+def chinese_font_families():
+    """已安装的中文字体族名（按优先顺序），末尾附后备字体
+
+    字体清单来自 matplotlib 的字体管理器，它在首次导入时扫描系统字体并缓存到本地，
+    之后的进程直接读取缓存；这里只在进程内过滤一次。
+    """
+    installed = {font.name for font in font_manager.fontManager.ttflist}
+    return [name for name in PREFERRED_FAMILIES if name in installed] + FALLBACK_FAMILIES
+
+
+@lru_cache(maxsize=1)
+def chinese_font_path():
+    """首选中文字体的文件路径（供 WordCloud 使用），没有中文字体时返回None"""
+    for name in chinese_font_families():
+        if name in FALLBACK_FAMILIES:
+            break
+        try:
+            return font_manager.findfont(font_manager.FontProperties(family=name), fallback_to_default=False)
+        except ValueError:
+            continue
+    return None
+
+
+def setup_matplotlib():
+    """配置matplotlib中文显示，font.sans-serif 只列出已安装的字体
+
+    列出未安装的字体时，matplotlib 每次绘制文字都要对其重新查找并输出告警。
+    """
+    matplotlib.rcParams['font.sans-serif'] = chinese_font_families()
+    matplotlib.rcParams['axes.unicode_minus'] = False